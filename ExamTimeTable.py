@@ -1,10 +1,27 @@
 from bs4 import BeautifulSoup
 from urllib.parse import quote, urljoin
 import requests
+import asyncio
 import logging
+import os
+import re
+import threading
+import time
+from metrics import SCRAPE_SECONDS
+from portal_client import portal_client
+from singleflight import get_singleflight
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
+TIMETABLE_URL = os.getenv("TIMETABLE_URL", "https://mits.ac.in/ugc-autonomous-exam-portal#ugc-pro3")
+TIMETABLE_TTL = int(os.getenv("TIMETABLE_TTL", "600"))
+# After a failed refresh, wait this long before asking the site again
+TIMETABLE_RETRY_AFTER = 60
+MAX_NOTICES_PER_REGULATION = 5
+
+timetable_flight = get_singleflight("exam_timetable")
+
 def safe_url(u):
     """Safely encode URL with special characters."""
     if " " not in u:
@@ -16,32 +33,241 @@ def safe_url(u):
     path = quote(parts[3])
     return f"{prefix}/{path}"
 
+def parse_timetable(html_text):
+    """Return every (notice text, download link) in the ugc-pro3 block, in page order."""
+    soup = BeautifulSoup(html_text, 'lxml')
+    table = soup.find('div', id='ugc-pro3')
+    if not table:
+        return []
+    exam = table.find('div', class_='container')
+    if not exam:
+        return []
+    notices = []
+    for item in exam.find_all("li"):
+        text = item.text.strip()
+        downlink = item.find("a")
+        if downlink and 'href' in downlink.attrs:
+            notices.append((text, safe_url(downlink['href'])))
+    return notices
+
+def group_by_regulation(notices):
+    """Group notices by every regulation code (R18, R20, ...) their text mentions."""
+    grouped = {}
+    for text, link in notices:
+        for regulation in sorted(set(re.findall(r'R\d{2}', text))):
+            grouped.setdefault(regulation, []).append((text, link))
+    return grouped
+
+class TimetableIndex:
+    """In-memory index of the exam portal notices, shared by all regulations.
+
+    The page is fetched once and grouped by regulation. Once the copy is older
+    than ``ttl`` the next lookup still answers from memory and triggers a
+    background refresh using ETag/Last-Modified, so an unchanged page costs a
+    304. If the site is slow or down the last good copy keeps being served.
+    Async callers use aget()/arefresh(), which fetch through the shared
+    portal client and parse in a worker thread.
+    """
+
+    def __init__(self, url=TIMETABLE_URL, ttl=TIMETABLE_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._refresh_task = None
+        self._notices = []
+        self._by_regulation = {}
+        self._etag = None
+        self._last_modified = None
+        self._loaded = False
+        self._fetched_at = 0.0
+
+        self.fetches = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def refresh(self):
+        """Fetch the page if it changed. Returns True if the index is usable.
+
+        Concurrent callers share one request to the site.
+        """
+        return timetable_flight.do(self.url, self._refresh)
+
+    def _conditional_headers(self):
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
+
+    def _store(self, status_code, text, headers):
+        """Parse and keep a fetched page; a 304 keeps the current copy."""
+        self.fetches += 1
+        if status_code == 304 and self._loaded:
+            self.not_modified += 1
+        else:
+            with SCRAPE_SECONDS.time(source="exam_timetable", phase="parse"), span("exam_timetable.parse"):
+                notices = parse_timetable(text)
+                by_regulation = group_by_regulation(notices)
+            with self._lock:
+                self._notices = notices
+                self._by_regulation = by_regulation
+                self._etag = headers.get('ETag')
+                self._last_modified = headers.get('Last-Modified')
+                self._loaded = True
+        self._fetched_at = time.monotonic()
+
+    def _failed(self, error):
+        self.errors += 1
+        logger.error(f"Error fetching exam timetable: {error}")
+        # Serve the last good copy and retry after a short pause
+        self._fetched_at = time.monotonic() - self.ttl + TIMETABLE_RETRY_AFTER
+
+    def _refresh(self):
+        try:
+            with SCRAPE_SECONDS.time(source="exam_timetable", phase="fetch"), span("exam_timetable.fetch") as current:
+                response = self._session.get(self.url, headers=self._conditional_headers(), timeout=10)
+                if current:
+                    current.set("status", response.status_code)
+            if not (response.status_code == 304 and self._loaded):
+                response.raise_for_status()
+            self._store(response.status_code, response.text, response.headers)
+        except Exception as e:
+            self._failed(e)
+        return self._loaded
+
+    async def _arefresh(self):
+        try:
+            with SCRAPE_SECONDS.time(source="exam_timetable", phase="fetch"), span("exam_timetable.fetch") as current:
+                response = await portal_client.get(self.url, headers=self._conditional_headers(), timeout=10)
+                if current:
+                    current.set("status", response.status_code)
+            if not (response.status_code == 304 and self._loaded):
+                response.raise_for_status()
+            await asyncio.to_thread(self._store, response.status_code, response.text, response.headers)
+        except Exception as e:
+            self._failed(e)
+        return self._loaded
+
+    def _refresh_task_for_loop(self):
+        """Return the running async refresh, starting one if there is none."""
+        loop = asyncio.get_running_loop()
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._refresh_task = loop.create_task(self._arefresh())
+        return task
+
+    async def arefresh(self):
+        """Async refresh; concurrent callers await the same fetch."""
+        return await asyncio.shield(self._refresh_task_for_loop())
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="timetable-refresh", daemon=True).start()
+
+    def is_stale(self):
+        return time.monotonic() - self._fetched_at >= self.ttl
+
+    def get(self, regulation):
+        """Return the (text, link) notices for a regulation, newest first."""
+        if not self._loaded:
+            if self.is_stale():
+                self.refresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+        with self._lock:
+            return list(self._by_regulation.get(regulation, []))
+
+    async def aget(self, regulation):
+        """Async get(): never blocks the event loop on the network or lxml."""
+        if not self._loaded:
+            if self.is_stale():
+                await self.arefresh()
+        elif self.is_stale():
+            self._refresh_task_for_loop()
+        with self._lock:
+            return list(self._by_regulation.get(regulation, []))
+
+    def export_state(self):
+        """Return the notices and validators for a snapshot, or None if not loaded."""
+        with self._lock:
+            if not self._loaded:
+                return None
+            return {
+                "url": self.url,
+                "notices": [list(notice) for notice in self._notices],
+                "etag": self._etag,
+                "last_modified": self._last_modified,
+            }
+
+    def restore_state(self, state):
+        """Serve a snapshot's notices until the first refresh; returns True if applied.
+
+        The restored copy counts as stale; its ETag/Last-Modified make the
+        revalidation a 304 when the page has not changed.
+        """
+        if state.get("url") != self.url:
+            return False
+        notices = [tuple(notice) for notice in state["notices"]]
+        by_regulation = group_by_regulation(notices)
+        with self._lock:
+            if self._loaded:
+                return False
+            self._notices = notices
+            self._by_regulation = by_regulation
+            self._etag = state.get("etag")
+            self._last_modified = state.get("last_modified")
+            self._fetched_at = time.monotonic() - self.ttl
+            self._loaded = True
+        logger.info(f"Exam timetable restored from snapshot: {len(notices)} notices")
+        return True
+
+    def stats(self):
+        return {
+            "notices": len(self._notices),
+            "regulations": sorted(self._by_regulation),
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._loaded else None,
+            "fetches": self.fetches,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+        }
+
+timetable_index = TimetableIndex()
+
+def _flatten(notices):
+    b = []
+    for text, link in notices[:MAX_NOTICES_PER_REGULATION]:
+        b.append(text)
+        b.append(link)
+    return b
+
 def exam_timetable(regulation):
     """Fetch exam timetables for a given regulation."""
     try:
-        html_text = requests.get("https://mits.ac.in/ugc-autonomous-exam-portal#ugc-pro3", timeout=10).text
-        soup = BeautifulSoup(html_text, 'lxml')
-        n = 0
-        b = []
-        table = soup.find('div', id='ugc-pro3')
-        if not table:
-            return []
-        exam = table.find('div', class_='container')
-        if not exam:
-            return []
-        exam1 = exam.find_all("li")
-        for index, exam2 in enumerate(exam1):
-            if n == 5:
-                break
-            a = exam2.text.strip()
-            downlink = exam2.find("a")
-            if downlink and 'href' in downlink.attrs:
-                downloadlink = safe_url(downlink['href'])
-                if regulation in a:
-                    b.append(a)
-                    b.append(downloadlink)
-                    n = n + 1
-        return b
+        with span("exam_timetable.get", regulation=regulation):
+            return _flatten(timetable_index.get(regulation))
+    except Exception as e:
+        logger.error(f"Error fetching exam timetable: {e}")
+        return []
+
+async def exam_timetable_async(regulation):
+    """exam_timetable() for async handlers."""
+    try:
+        with span("exam_timetable.get", regulation=regulation):
+            return _flatten(await timetable_index.aget(regulation))
     except Exception as e:
         logger.error(f"Error fetching exam timetable: {e}")
         return []
@@ -1,3 +1,9 @@
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import hmac
 import os
 import logging
 import sys
@@ -7,9 +13,15 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from telegram import Update
 from telegram.ext import Application
 from bot_handlers import setup_handlers
+from conversation_state import get_conversation_persistence, process_update
+from inline_reply import WEBHOOK_INLINE_REPLY, InlineReplyRequest, inline_reply_scope
+from snapshot import restore_in_background
+from tracing import TRACING_ENABLED, TracedRequest
+from update_processor import UpdateProcessor
 
 # Configure logging
 logging.basicConfig(
@@ -23,31 +35,88 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 if not TOKEN:
     logger.error("TELEGRAM_BOT_TOKEN is not set")
 
+# "sync" processes each update before answering Telegram; "background" acks
+# right away and processes updates on this instance's event loop
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "sync").lower()
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+# /warmup launches the browser and runs the result watcher, so it needs a
+# token; without WARMUP_TOKEN or TELEGRAM_WEBHOOK_SECRET it is refused
+WARMUP_TOKEN = os.getenv("WARMUP_TOKEN", "") or WEBHOOK_SECRET
+
+# Cold-start budget for importing this module and building the Application
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
 # Build application and register handlers
-application = Application.builder().token(TOKEN).build()
+builder = Application.builder().token(TOKEN)
+# Point at a local Bot API server or stand-in, e.g. http://localhost:8081/bot
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+if TELEGRAM_API_BASE_URL:
+    builder = builder.base_url(TELEGRAM_API_BASE_URL)
+# Answer with one Bot API call in the webhook response (sync mode only, since
+# background mode acknowledges before the update is processed)
+INLINE_REPLY = WEBHOOK_INLINE_REPLY and WEBHOOK_MODE != "background"
+if INLINE_REPLY:
+    builder = builder.request(InlineReplyRequest(connection_pool_size=256))
+elif WEBHOOK_INLINE_REPLY:
+    logger.warning("WEBHOOK_INLINE_REPLY is ignored in background mode")
+if TRACING_ENABLED and not INLINE_REPLY:
+    # Record each outbound Bot API call as a span of the update's trace
+    builder = builder.request(TracedRequest(connection_pool_size=256))
+# Conversation state shared across instances (CONVERSATION_STATE=sqlite|redis)
+persistence = get_conversation_persistence()
+if persistence is not None:
+    builder = builder.persistence(persistence)
+application = builder.build()
 setup_handlers(application)
+update_processor = UpdateProcessor(application) if WEBHOOK_MODE == "background" else None
+
+IMPORT_TIME_MS = round((time.perf_counter() - _import_started) * 1000, 1)
+if IMPORT_TIME_MS > IMPORT_BUDGET_MS:
+    logger.warning(f"Webhook import took {IMPORT_TIME_MS} ms (budget {IMPORT_BUDGET_MS} ms)")
+else:
+    logger.info(f"Webhook import took {IMPORT_TIME_MS} ms")
 
 _app_started = False
+# Concurrent first updates must not initialize and start the Application twice
+_start_lock = asyncio.Lock()
 
 async def _ensure_started():
     global _app_started
-    if not _app_started:
-        await application.initialize()
-        await application.start()
-        _app_started = True
-        logger.info("Telegram application initialized and started")
+    if _app_started:
+        return
+    async with _start_lock:
+        if not _app_started:
+            await application.initialize()
+            await application.start()
+            _app_started = True
+            # Serve the listing and timetable from the last snapshot while
+            # they are re-scraped, instead of making the first lookup wait
+            restore_in_background()
+            logger.info("Telegram application initialized and started")
 
 # Expose ASGI app for Vercel (@vercel/python detects FastAPI/ASGI apps)
 app = FastAPI()
 
 @app.post("/")
 async def telegram_webhook(request: Request):
+    if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        return JSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
     try:
         await _ensure_started()
         data = await request.json()
         update = Update.de_json(data, application.bot)
         if update:
-            await application.process_update(update)
+            if update_processor is None and INLINE_REPLY:
+                async with inline_reply_scope() as slot:
+                    await process_update(application, update)
+                reply = slot.take()
+                if reply:
+                    return reply
+            elif update_processor is None:
+                await process_update(application, update)
+            elif not update_processor.enqueue(update):
+                # Let Telegram redeliver once the backlog has drained
+                return JSONResponse({"ok": False, "error": "busy"}, status_code=503)
         return {"ok": True}
     except Exception as e:
         logger.error(f"Error in telegram_webhook: {e}", exc_info=True)
@@ -56,3 +125,74 @@ async def telegram_webhook(request: Request):
 @app.get("/")
 async def health():
     return {"ok": True}
+
+@app.get("/warmup")
+async def warmup(request: Request, browser: bool = False, token: str = ""):
+    """Pre-initialize the Application, HTTP pools and indices for a cron ping."""
+    token = request.headers.get("X-Warmup-Token") or token
+    if not WARMUP_TOKEN or not hmac.compare_digest(token.encode(), WARMUP_TOKEN.encode()):
+        return JSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
+    from warmup import warm_up
+    started = time.perf_counter()
+    await _ensure_started()
+    timings = {"application": round((time.perf_counter() - started) * 1000, 1)}
+    timings.update(await asyncio.to_thread(warm_up, browser))
+
+    # Serverless instances may be frozen between job-queue runs, so let the
+    # cron ping drive the new-result watcher as well
+    from result_watcher import result_watcher
+    started = time.perf_counter()
+    new_entries = await result_watcher.check(bot=application.bot)
+    timings["result_watcher"] = round((time.perf_counter() - started) * 1000, 1)
+    return {
+        "ok": True,
+        "import_ms": IMPORT_TIME_MS,
+        "import_budget_ms": IMPORT_BUDGET_MS,
+        "timings_ms": timings,
+        "new_results": [text for text, _link, _parts in new_entries],
+    }
+
+@app.get("/stats")
+async def stats():
+    import bot_handlers
+    from browser_pool import get_browser_pool
+    from ExamTimeTable import timetable_index
+    from portal_health import portal_health
+    from portal_client import portal_client
+    from result_jobs import get_result_jobs
+    from result_store import get_result_store
+    from result_watcher import result_watcher
+    from screenshots import screenshot_stats
+    from singleflight import singleflight_stats
+    from inline_reply import inline_reply_stats
+    from snapshot import snapshot_stats
+    from tracing import trace_stats
+    from subscriptions import get_subscription_store
+    from telegram_files import file_id_cache
+    store = get_result_store()
+    return {
+        "browser_pool": get_browser_pool().stats(),
+        "result_jobs": get_result_jobs().stats(),
+        "result_store": store.stats() if store else None,
+        "file_id_cache": file_id_cache.stats(),
+        "screenshots": screenshot_stats.stats(),
+        "timetable_index": timetable_index.stats(),
+        "results_index": bot_handlers.a.stats() if bot_handlers.a else None,
+        "result_watcher": result_watcher.stats(),
+        "subscriptions": get_subscription_store().stats(),
+        "singleflight": singleflight_stats(),
+        "portal_health": portal_health.stats(),
+        "portal_client": portal_client.stats(),
+        "conversation_state": persistence.stats() if persistence else None,
+        "inline_reply": inline_reply_stats.stats(),
+        "snapshot": snapshot_stats.stats(),
+        "tracing": trace_stats.stats(),
+        "import_ms": IMPORT_TIME_MS,
+        "updates": update_processor.stats() if update_processor else None,
+    }
+
+@app.get("/metrics")
+async def metrics():
+    import metrics as bot_metrics
+    await asyncio.to_thread(bot_metrics.collect_runtime, update_processor)
+    return PlainTextResponse(bot_metrics.render(), media_type="text/plain; version=0.0.4")
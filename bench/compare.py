@@ -0,0 +1,80 @@
+"""Compare two bench/run.py reports flow by flow and step by step.
+
+Usage:
+    python bench/compare.py bench/results/base.json bench/results/head.json --threshold 10
+
+Exits with status 1 when throughput drops, or p50/p99 latency grows, by
+more than ``--threshold`` percent on any flow.
+"""
+import argparse
+import json
+import sys
+
+
+def _delta(base, head):
+    if not base:
+        return None
+    return (head - base) / base * 100
+
+
+def _fmt(delta):
+    return "   n/a" if delta is None else f"{delta:+6.1f}%"
+
+
+def compare(base, head, threshold):
+    """Print a comparison table and return the list of regressions."""
+    print(f"base {base.get('commit')} ({base.get('created_at')})  vs  head {head.get('commit')} ({head.get('created_at')})")
+    if base.get("config") != head.get("config"):
+        print("warning: the reports were taken with different settings")
+
+    regressions = []
+    for flow, head_flow in head["flows"].items():
+        base_flow = base["flows"].get(flow)
+        if base_flow is None:
+            print(f"\n{flow}: not in base report")
+            continue
+
+        throughput = _delta(base_flow["throughput_per_s"], head_flow["throughput_per_s"])
+        print(f"\n{flow}")
+        print(f"  {'throughput/s':<15} {base_flow['throughput_per_s']:>10} {head_flow['throughput_per_s']:>10} {_fmt(throughput)}")
+        if throughput is not None and throughput < -threshold:
+            regressions.append(f"{flow} throughput {throughput:+.1f}%")
+
+        for key in ("p50", "p90", "p99", "max"):
+            before, after = base_flow["latency_ms"][key], head_flow["latency_ms"][key]
+            delta = _delta(before, after)
+            print(f"  {key + ' ms':<15} {before:>10} {after:>10} {_fmt(delta)}")
+            if key in ("p50", "p99") and delta is not None and delta > threshold:
+                regressions.append(f"{flow} {key} {delta:+.1f}%")
+
+        for step, head_step in head_flow["steps"].items():
+            base_step = base_flow["steps"].get(step)
+            if base_step is None:
+                continue
+            print(f"  {step:<15} p50 {_fmt(_delta(base_step['p50'], head_step['p50']))}"
+                  f"  p99 {_fmt(_delta(base_step['p99'], head_step['p99']))}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    regressions = compare(base, head, args.threshold)
+    if regressions:
+        print("\nRegressions over threshold: " + "; ".join(regressions))
+        return 1
+    print("\nNo regressions over threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
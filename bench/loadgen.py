@@ -0,0 +1,315 @@
+"""Webhook load generator: N simulated users walking the bot's conversations.
+
+Each user repeatedly walks /resultscheck (every state, sometimes answering
+"No" to a confirmation) or /examtimetable, pausing a random think time
+between steps, and posts each Update to the webhook. By default the
+webhook's ASGI app runs in this process against the portal and Bot API
+stand-ins; --url posts to a running webhook instead.
+
+Usage:
+    python bench/loadgen.py --users 200 --duration 60 --think 1,4
+    python bench/loadgen.py --url http://localhost:8000/ --users 50 --duration 30
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import math
+import platform
+import random
+import sys
+import time
+
+import httpx
+
+from run import BENCH_TOKEN, DOB, classify, configure_bot, git_commit, summarize, write_report
+from standins import BotApiStandIn, PortalStandIn
+import updates
+
+# Departments the portal stand-in offers in its form
+DEPARTMENTS = ("CE", "EEE", "ME", "ECE", "CSE", "IT")
+REGULATIONS = ("R18", "R20", "R23")
+
+
+class LoadStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latency = {}
+        self.errors = {}
+        self.sent = 0
+        self.failed = 0
+        self.per_second = {}
+        self.flows = {}
+        self.flows_note = None
+        # Final flow of each user, judged after the queue drains in background mode
+        self.last_flow = {}
+        # When the first user stopped sending; the ramp-down starts here
+        self.first_stopped = None
+
+    def record(self, step, elapsed_ms, error=None):
+        self.sent += 1
+        self.latency.setdefault(step, []).append(elapsed_ms)
+        second = int(time.perf_counter() - self.started)
+        self.per_second[second] = self.per_second.get(second, 0) + 1
+        if error:
+            self.failed += 1
+            counts = self.errors.setdefault(step, {})
+            counts[error] = counts.get(error, 0) + 1
+
+    def user_stopped(self):
+        if self.first_stopped is None:
+            self.first_stopped = time.perf_counter() - self.started
+
+    def flow_done(self, flow, outcome):
+        counts = self.flows.setdefault(flow, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def response_error(response):
+    """Return an error label for a webhook response, or None if it succeeded."""
+    if response.status_code == 503:
+        return "busy"
+    if response.status_code != 200:
+        return f"http_{response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return "bad_body"
+    # An inline Bot API call (WEBHOOK_INLINE_REPLY) also means success
+    return None if body.get("ok") or "method" in body else "handler_error"
+
+
+def user_flows(user_id, rng, args):
+    """Yield (flow, steps) forever, picking flows by --timetable-share."""
+    while True:
+        if rng.random() < args.timetable_share:
+            yield "examtimetable", updates.examtimetable_flow(user_id, regulation=rng.choice(REGULATIONS))
+            continue
+        roll = f"2{rng.randint(0, 3)}691A{rng.choice(('05', '04', '02'))}{rng.randint(0, 99):02d}"
+        if args.not_found_rate and rng.random() < args.not_found_rate:
+            roll = roll[:-1] + "X"
+        yield "resultscheck", updates.resultscheck_flow(
+            user_id, roll=roll, dob=DOB,
+            regulation=rng.choice(REGULATIONS), year=str(rng.randint(1, 4)), sem=str(rng.randint(1, 2)),
+            department=rng.choice(DEPARTMENTS),
+            redo_roll=rng.random() < args.redo_rate, redo_dob=rng.random() < args.redo_rate,
+        )
+
+
+async def forward_inline_reply(api_client, response):
+    """Run a Bot API call returned in the webhook response, as Telegram does."""
+    try:
+        body = response.json()
+    except ValueError:
+        return
+    if isinstance(body, dict) and "method" in body:
+        params = dict(body)
+        await api_client.post(f"/bot{BENCH_TOKEN}/{params.pop('method')}", json=params)
+
+
+async def simulate_user(client, user_id, args, stats, deadline, api=None, api_client=None):
+    rng = random.Random(args.seed * 100003 + user_id)
+    think_min, think_max = args.think
+    # Spread arrivals over the ramp-up instead of starting everyone at once
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    for iteration, (flow, steps) in enumerate(user_flows(user_id, rng, args)):
+        if time.perf_counter() >= deadline or (args.iterations and iteration >= args.iterations):
+            stats.user_stopped()
+            return
+        for step, update in steps:
+            started = time.perf_counter()
+            try:
+                response = await client.post(args.url, json=update, headers=headers)
+                error = response_error(response)
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            stats.record(step, (time.perf_counter() - started) * 1000, error)
+            if api_client is not None and not error:
+                await forward_inline_reply(api_client, response)
+            await asyncio.sleep(rng.uniform(think_min, think_max))
+        # In background mode the reply is sent after the webhook answers, so
+        # only sync mode can judge the outcome right away
+        if api is not None and args.webhook_mode == "sync":
+            stats.flow_done(flow, classify(flow, api.last_text.get(str(user_id))))
+        stats.last_flow[user_id] = flow
+
+
+async def drain(webhook, timeout=120):
+    """In background mode, wait for queued updates to finish processing."""
+    processor = getattr(webhook, "update_processor", None)
+    deadline = time.perf_counter() + timeout
+    while processor is not None and time.perf_counter() < deadline:
+        state = processor.stats()
+        if not state["queue_depth"] and not state["in_flight"]:
+            return
+        await asyncio.sleep(0.1)
+
+
+async def generate(args, api=None):
+    webhook = None
+    if args.in_process:
+        webhook = importlib.import_module("api.webhook")
+        transport = httpx.ASGITransport(app=webhook.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://webhook", timeout=args.timeout)
+    else:
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        client = httpx.AsyncClient(timeout=args.timeout, limits=limits)
+
+    api_client = httpx.AsyncClient(base_url=api.url, timeout=args.timeout) if api is not None else None
+    stats = LoadStats()
+    deadline = stats.started + args.duration if args.duration else float("inf")
+    async with client:
+        await asyncio.gather(*(
+            simulate_user(client, 300000 + i, args, stats, deadline, api, api_client) for i in range(args.users)
+        ))
+        wall = time.perf_counter() - stats.started
+        if webhook is not None:
+            await drain(webhook)
+            components = (await client.get("/stats")).json()
+            if api is not None and args.webhook_mode == "background":
+                # The stand-in only keeps each chat's last reply, so only the
+                # final flow of every user can be judged
+                for user_id, flow in stats.last_flow.items():
+                    stats.flow_done(flow, classify(flow, api.last_text.get(str(user_id))))
+                stats.flows_note = "background mode: outcome of each user's final flow only"
+        else:
+            components = None
+    if api_client is not None:
+        await api_client.aclose()
+    if webhook is not None and webhook.application.running:
+        await webhook.application.stop()
+        await webhook.application.shutdown()
+    return stats, wall, components
+
+
+def build_report(args, stats, wall, components, standins):
+    seconds = [stats.per_second.get(s, 0) for s in range(int(wall))]
+    # Judge the sustained rate only over whole seconds when every user is
+    # active: after the warm-up (nothing answered yet, e.g. a cold import)
+    # and the ramp-up, and before the first user stops
+    warmup = next((s for s, count in enumerate(seconds) if count), len(seconds)) + 1
+    start = max(warmup, math.ceil(args.ramp))
+    end = min(len(seconds), int(stats.first_stopped if stats.first_stopped is not None else wall))
+    steady = seconds[start:end]
+    steps = {}
+    for step, samples in stats.latency.items():
+        errors = stats.errors.get(step, {})
+        failed = sum(errors.values())
+        steps[step] = dict(summarize(samples), errors=errors, error_rate=round(failed / len(samples), 4))
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "verbose", "secret")}
+    return {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": config,
+        "updates": stats.sent,
+        "failed": stats.failed,
+        "error_rate": round(stats.failed / stats.sent, 4) if stats.sent else 0.0,
+        "wall_seconds": round(wall, 3),
+        "updates_per_s": round(stats.sent / wall, 2) if wall else 0.0,
+        # The rate held for 90% of the steady-state seconds; None when the
+        # run was too short to have any
+        "sustained_updates_per_s": sorted(steady)[len(steady) // 10] if steady else None,
+        "steady_seconds": [start, end] if steady else None,
+        "per_second": seconds,
+        "latency_ms": summarize([v for samples in stats.latency.values() for v in samples]),
+        "steps": steps,
+        "flows": stats.flows,
+        "flows_note": stats.flows_note,
+        "standins": standins,
+        "components": components,
+    }
+
+
+def print_summary(report):
+    sustained = report["sustained_updates_per_s"]
+    sustained = f"{sustained}/s" if sustained is not None else "n/a, run too short for a steady state"
+    print(f"\n{report['updates']} updates in {report['wall_seconds']} s: "
+          f"{report['updates_per_s']} updates/s (sustained {sustained}), "
+          f"error rate {report['error_rate']:.2%}")
+    latency = report["latency_ms"]
+    print(f"  all             p50={latency['p50']}ms p99={latency['p99']}ms max={latency['max']}ms")
+    for step, data in report["steps"].items():
+        errors = f" errors={data['errors']}" if data["errors"] else ""
+        print(f"  {step:<15} n={data['count']:<6} p50={data['p50']}ms p99={data['p99']}ms max={data['max']}ms{errors}")
+    if report["flows"]:
+        note = f" ({report['flows_note']})" if report["flows_note"] else ""
+        print(f"  outcomes: {report['flows']}{note}")
+
+
+def _think(value):
+    low, _, high = value.partition(",")
+    return float(low), float(high or low)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the webhook with simulated Telegram users")
+    parser.add_argument("--url", help="Webhook URL to post to; runs api/webhook.py in process when omitted")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to keep users walking flows (0: no limit)")
+    parser.add_argument("--iterations", type=int, default=0, help="Flows per user (0: until --duration)")
+    parser.add_argument("--think", type=_think, default=(0.5, 2.0), help="Think time range in seconds, e.g. 1,4")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds over which users arrive")
+    parser.add_argument("--timetable-share", type=float, default=0.2, help="Share of flows that are /examtimetable")
+    parser.add_argument("--redo-rate", type=float, default=0.1, help="Chance of answering No to a confirmation")
+    parser.add_argument("--not-found-rate", type=float, default=0.05, help="Share of lookups with unknown rolls")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--secret", default="", help="Webhook secret token to send")
+    parser.add_argument("--webhook-mode", choices=("sync", "background"), default="sync", help="In-process only")
+    parser.add_argument("--state", choices=("memory", "sqlite"), default="memory", help="In-process only")
+    parser.add_argument("--inline-reply", action="store_true", help="Set WEBHOOK_INLINE_REPLY; in-process only")
+    parser.add_argument("--portal-latency", type=float, default=0.3, help="In-process only")
+    parser.add_argument("--portal-jitter", type=float, default=0.2, help="In-process only")
+    parser.add_argument("--portal-failure-rate", type=float, default=0.0, help="In-process only")
+    parser.add_argument("--api-latency", type=float, default=0.03, help="In-process only")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Report path (default bench/results/load-<time>-<commit>.json)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.duration and not args.iterations:
+        parser.error("set --duration or --iterations")
+    args.in_process = not args.url
+    if args.in_process:
+        args.url = "/"
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO if args.verbose else logging.CRITICAL,
+    )
+
+    portal = api = None
+    if args.in_process:
+        portal = PortalStandIn(latency=args.portal_latency, jitter=args.portal_jitter,
+                               failure_rate=args.portal_failure_rate, seed=args.seed).start()
+        api = BotApiStandIn(latency=args.api_latency, seed=args.seed).start()
+        configure_bot(
+            portal, state=args.state,
+            TELEGRAM_BOT_TOKEN=BENCH_TOKEN,
+            TELEGRAM_API_BASE_URL=f"{api.url}/bot",
+            TELEGRAM_WEBHOOK_SECRET=args.secret,
+            WEBHOOK_MODE=args.webhook_mode,
+            WEBHOOK_INLINE_REPLY="1" if args.inline_reply else "",
+        )
+
+    try:
+        stats, wall, components = asyncio.run(generate(args, api))
+    finally:
+        for standin in (portal, api):
+            if standin is not None:
+                standin.stop()
+
+    standins = {"portal": portal.stats(), "bot_api": api.stats()} if portal else None
+    report = build_report(args, stats, wall, components, standins)
+    output = write_report(report, args.output, prefix="load-")
+    print_summary(report)
+    print(f"\nReport written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""In-memory Redis-protocol stand-in for exercising the conversation state backend.
+
+Supports the handful of commands RedisStateBackend uses (PING, AUTH, SELECT,
+GET, SET with EX, DEL, EXISTS, FLUSHALL). Not for production use.
+
+Usage:
+    python bench/resp_standin.py --port 6379
+    CONVERSATION_STATE=redis CONVERSATION_STATE_URL=redis://localhost:6379/0 ...
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, e.g. from telnet
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, Exception):
+            self.wfile.write(b"-ERR %s\r\n" % str(value).encode())
+        elif value == "OK" or value == "PONG":
+            self.wfile.write(b"+%s\r\n" % value.encode())
+        else:
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self._read_command()
+            if not args:
+                return
+            name = args[0].decode().upper()
+            with server.lock:
+                server.commands += 1
+                self._reply(server.execute(name, args[1:]))
+            self.wfile.flush()
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=6379):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.commands = 0
+
+    def _get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def execute(self, name, args):
+        if name == "PING":
+            return "PONG"
+        if name in ("AUTH", "SELECT", "FLUSHALL"):
+            if name == "FLUSHALL":
+                self.data.clear()
+            return "OK"
+        if name == "GET":
+            return self._get(args[0])
+        if name == "SET":
+            expires_at = None
+            if len(args) >= 4 and args[2].upper() == b"EX":
+                expires_at = time.monotonic() + int(args[3])
+            self.data[args[0]] = (args[1], expires_at)
+            return "OK"
+        if name == "DEL":
+            return sum(self.data.pop(key, None) is not None for key in args)
+        if name == "EXISTS":
+            return sum(self._get(key) is not None for key in args)
+        return ValueError(f"unknown command '{name}'")
+
+    def start(self):
+        """Serve from a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, name="resp-standin", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    server = RespStandIn(args.host, args.port)
+    print(f"RESP stand-in listening on {args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
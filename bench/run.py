@@ -0,0 +1,289 @@
+"""Offline end-to-end benchmark of the /resultscheck, /examtimetable and /cgpa flows.
+
+Starts the portal and Bot API stand-ins, points the bot at them through
+RESULTS_PORTAL_BASE, TIMETABLE_URL and the Application's base_url, then
+drives every conversation step for N simulated users through the same
+process_update path the webhook uses. Writes a JSON report that
+bench/compare.py can diff across commits.
+
+Usage:
+    python bench/run.py --users 50 --concurrency 10 --portal-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from standins import PORTAL_PATH, TIMETABLE_PATH, BotApiStandIn, PortalStandIn  # noqa: E402
+import updates  # noqa: E402
+
+BENCH_TOKEN = "123456:bench"
+DOB = "2003-05-17"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples), 2) if samples else 0.0,
+        "p50": round(percentile(samples, 50), 2),
+        "p90": round(percentile(samples, 90), 2),
+        "p99": round(percentile(samples, 99), 2),
+        "max": round(max(samples), 2) if samples else 0.0,
+    }
+
+
+def configure_bot(portal, state="memory", result_card=False, **extra):
+    """Point the bot's environment at ``portal`` and a fresh temp directory.
+
+    Bot modules read their configuration at import time, so call this
+    before importing any of them.
+    """
+    workdir = tempfile.mkdtemp(prefix="mitsbot-bench-")
+    os.environ.update({
+        "RESULTS_PORTAL_BASE": f"{portal.url}{PORTAL_PATH}",
+        "TIMETABLE_URL": f"{portal.url}{TIMETABLE_PATH}#ugc-pro3",
+        "RESULT_STORE_PATH": os.path.join(workdir, "results.sqlite3"),
+        "SUBSCRIPTIONS_PATH": os.path.join(workdir, "subscriptions.sqlite3"),
+        "RESULT_WATCH_STATE": os.path.join(workdir, "watcher.json"),
+        "RESULT_WATCH_INTERVAL": "0",
+        "INDEX_SNAPSHOT_PATH": os.path.join(workdir, "snapshot.json.gz"),
+        "CONVERSATION_STATE": "" if state == "memory" else state,
+        "CONVERSATION_STATE_PATH": os.path.join(workdir, "state.sqlite3"),
+        "RESULT_CARD_IMAGE": "1" if result_card else "",
+    })
+    os.environ.update(extra)
+    return workdir
+
+
+def write_report(report, output, prefix=""):
+    """Write ``report`` as JSON, by default to bench/results/<prefix><time>-<commit>.json."""
+    if not output:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = ROOT / "bench" / "results" / f"{prefix}{stamp}-{report['commit'] or 'nogit'}.json"
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str))
+    return output
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def classify(flow, reply):
+    """Map the last thing the stand-in saw for a chat to ok/not_found/error."""
+    reply = reply or ""
+    if flow in ("resultscheck", "cgpa"):
+        if reply == "[photo]" or "Results Found" in reply or "CGPA:" in reply:
+            return "ok"
+        if "Results Not Found" in reply:
+            return "not_found"
+        return "error"
+    if not reply or "error occurred" in reply or "No timetable" in reply:
+        return "error"
+    return "ok"
+
+
+class Recorder:
+    def __init__(self):
+        self.flows = {}
+        self.steps = {}
+        self.outcomes = {}
+
+    def step(self, flow, step, elapsed_ms):
+        self.steps.setdefault(flow, {}).setdefault(step, []).append(elapsed_ms)
+
+    def flow(self, flow, elapsed_ms, outcome):
+        self.flows.setdefault(flow, []).append(elapsed_ms)
+        counts = self.outcomes.setdefault(flow, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+
+async def run_user(application, api, recorder, flow, steps, think_time, failures):
+    from conversation_state import process_update
+    from telegram import Update
+
+    chat_id = None
+    started = time.perf_counter()
+    for step, data in steps:
+        update = Update.de_json(data, application.bot)
+        chat_id = update.effective_chat.id
+        step_started = time.perf_counter()
+        try:
+            await process_update(application, update)
+        except Exception as e:
+            failures.append(f"{flow}/{step}: {e!r}")
+        recorder.step(flow, step, (time.perf_counter() - step_started) * 1000)
+        if think_time:
+            await asyncio.sleep(think_time)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    recorder.flow(flow, elapsed_ms, classify(flow, api.last_text.get(str(chat_id))))
+
+
+async def run_flow(application, api, recorder, flow, users, concurrency, think_time, not_found_every):
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+
+    def steps_for(user_id):
+        if flow == "examtimetable":
+            return updates.examtimetable_flow(user_id, regulation=("R18", "R20", "R23")[user_id % 3])
+        roll = f"20691A{user_id % 10000:04d}"
+        if not_found_every and user_id % not_found_every == 0:
+            # Rolls ending in X are answered with the portal's not-found page
+            roll = roll[:-1] + "X"
+        if flow == "cgpa":
+            return updates.cgpa_flow(user_id, roll=roll, dob=DOB)
+        return updates.resultscheck_flow(user_id, roll=roll, dob=DOB)
+
+    async def guarded(user_id):
+        async with semaphore:
+            await run_user(application, api, recorder, flow, steps_for(user_id), think_time, failures)
+
+    started = time.perf_counter()
+    # Chat ids are offset per flow so replies never mix between flows
+    base = {"resultscheck": 100000, "examtimetable": 200000}.get(flow, 300000)
+    await asyncio.gather(*(guarded(base + i) for i in range(users)))
+    wall = time.perf_counter() - started
+    return wall, failures
+
+
+async def benchmark(args, portal, api):
+    from telegram.ext import Application
+    from bot_handlers import setup_handlers
+    from conversation_state import get_conversation_persistence
+
+    builder = Application.builder().token(BENCH_TOKEN).base_url(f"{api.url}/bot")
+    persistence = get_conversation_persistence()
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    application = builder.build()
+    setup_handlers(application)
+    await application.initialize()
+    await application.start()
+
+    recorder = Recorder()
+    report_flows = {}
+    try:
+        for flow in args.flows:
+            wall, failures = await run_flow(
+                application, api, recorder, flow, args.users, args.concurrency, args.think_time, args.not_found_every,
+            )
+            outcomes = recorder.outcomes.get(flow, {})
+            report_flows[flow] = {
+                "users": args.users,
+                "wall_seconds": round(wall, 3),
+                "throughput_per_s": round(args.users / wall, 2) if wall else 0.0,
+                "outcomes": outcomes,
+                "exceptions": failures[:20],
+                "latency_ms": summarize(recorder.flows.get(flow, [])),
+                "steps": {step: summarize(samples) for step, samples in recorder.steps.get(flow, {}).items()},
+            }
+    finally:
+        await application.stop()
+        await application.shutdown()
+
+    from portal_health import portal_health
+    from result_jobs import get_result_jobs
+    return report_flows, {
+        "portal_health": portal_health.stats(),
+        "result_jobs": get_result_jobs().stats(),
+    }
+
+
+def print_summary(report):
+    for flow, data in report["flows"].items():
+        latency = data["latency_ms"]
+        print(f"\n{flow}: {data['users']} users in {data['wall_seconds']} s "
+              f"({data['throughput_per_s']} flows/s) outcomes={data['outcomes']}")
+        print(f"  flow  p50={latency['p50']}ms p90={latency['p90']}ms p99={latency['p99']}ms max={latency['max']}ms")
+        for step, steps in data["steps"].items():
+            print(f"  {step:<15} p50={steps['p50']}ms p99={steps['p99']}ms max={steps['max']}ms")
+        for failure in data["exceptions"]:
+            print(f"  ! {failure}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the bot's conversation flows")
+    parser.add_argument("--users", type=int, default=20, help="Simulated users per flow")
+    parser.add_argument("--concurrency", type=int, default=10, help="Users walking a flow at the same time")
+    parser.add_argument("--flows", default="resultscheck,examtimetable", type=lambda s: [f for f in s.split(",") if f])
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a user's steps")
+    parser.add_argument("--portal-latency", type=float, default=0.05, help="Seconds added to each portal response")
+    parser.add_argument("--portal-jitter", type=float, default=0.0, help="Extra random portal latency, up to this")
+    parser.add_argument("--portal-failure-rate", type=float, default=0.0, help="Share of portal requests answered 503")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds added to each Bot API response")
+    parser.add_argument("--not-found-every", type=int, default=0, help="Every Nth user enters an unknown roll")
+    parser.add_argument("--state", choices=("memory", "sqlite"), default="memory", help="Conversation state backend")
+    parser.add_argument("--result-card", action="store_true", help="Reply with result card images (RESULT_CARD_IMAGE)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Report path (default bench/results/<time>-<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own logging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO if args.verbose else logging.CRITICAL,
+    )
+
+    portal = PortalStandIn(latency=args.portal_latency, jitter=args.portal_jitter,
+                           failure_rate=args.portal_failure_rate, seed=args.seed).start()
+    api = BotApiStandIn(latency=args.api_latency, seed=args.seed).start()
+
+    configure_bot(portal, state=args.state, result_card=args.result_card)
+
+    started = time.time()
+    try:
+        flows, component_stats = asyncio.run(benchmark(args, portal, api))
+    finally:
+        portal.stop()
+        api.stop()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "verbose")}
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "python": platform.python_version(),
+        "config": config,
+        "flows": flows,
+        "standins": {"portal": portal.stats(), "bot_api": api.stats()},
+        "components": component_stats,
+    }
+
+    output = write_report(report, args.output)
+    print_summary(report)
+    print(f"\nReport written to {output}")
+    # Error replies are expected under failure injection; unhandled exceptions are not
+    return 1 if any(data["exceptions"] for data in flows.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
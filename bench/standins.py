@@ -0,0 +1,274 @@
+"""Local stand-ins for the results portal, the MITS exam page and the Bot API.
+
+Both servers run in daemon threads on ephemeral ports, answer with pages
+shaped like the real ones and take latency and failure settings that can be
+changed while they run.
+"""
+import email.parser
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PORTAL_PATH = "/mitsresults/resultug"
+TIMETABLE_PATH = "/ugc-autonomous-exam-portal"
+
+LISTING = [
+    "B.Tech-IV-II-R20-Regular-May-2025",
+    "B.Tech-III-I-R20-Regular-December-2024",
+    "B.Tech-II-II-R23-Regular-May-2025",
+    "B.Tech-I-I-R23-Supplementary-March-2025",
+    "B.Tech-IV-I-R18-Regular-December-2023",
+]
+SUBJECTS = [
+    ("20CSE301", "Design and Analysis of Algorithms"),
+    ("20CSE302", "Operating Systems"),
+    ("20CSE303", "Computer Networks"),
+    ("20CSE304", "Database Management Systems"),
+    ("20CSE305", "Software Engineering"),
+    ("20CSE306", "Operating Systems Laboratory"),
+]
+GRADES = ["O", "A+", "A", "B+", "B", "C"]
+GRADE_POINTS = {"O": 10, "A+": 9, "A": 8, "B+": 7, "B": 6, "C": 5}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StandIn:
+    """Base for a threaded stand-in HTTP server with injectable faults."""
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.failures = 0
+        self.connections = 0
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; don't let Nagle hold the body
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with standin._lock:
+                    standin.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                standin._dispatch(self, "GET")
+
+            def do_POST(self):
+                standin._dispatch(self, "POST")
+
+        self._server = _Server((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _inject(self):
+        """Sleep for the configured latency; returns True if this request should fail."""
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _dispatch(self, handler, method):
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        with self._lock:
+            self.requests[f"{method} {parsed.path}"] += 1
+        if self._inject():
+            with self._lock:
+                self.failures += 1
+            return self._send(handler, 503, b"Service Unavailable", "text/plain")
+        status, payload, content_type, headers = self.handle(method, parsed, handler.headers, body)
+        self._send(handler, status, payload, content_type, headers)
+
+    def _send(self, handler, status, payload, content_type, headers=None):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def handle(self, method, parsed, headers, body):
+        raise NotImplementedError
+
+    def stats(self):
+        with self._lock:
+            return {"requests": dict(self.requests), "failures": self.failures, "connections": self.connections}
+
+
+class PortalStandIn(StandIn):
+    """Mimics resultug (listing), myresultug (form and results) and ugc-pro3.
+
+    Rolls ending in 'X' get the portal's 'invalid details' page; every other
+    roll gets a deterministic set of grades.
+    """
+
+    def handle(self, method, parsed, headers, body):
+        if parsed.path == PORTAL_PATH:
+            return 200, self._listing(), "text/html", {}
+        if parsed.path == f"{PORTAL_PATH}/myresultug":
+            result_id = parse_qs(parsed.query).get("resultid", [""])[0]
+            if method == "POST":
+                form = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                return 200, self._result(result_id, form), "text/html", {}
+            return 200, self._form(result_id), "text/html", {}
+        if parsed.path == TIMETABLE_PATH:
+            page = self._timetable()
+            etag = '"%s"' % hashlib.sha1(page.encode()).hexdigest()[:16]
+            if headers.get("If-None-Match") == etag:
+                return 304, b"", "text/html", {"ETag": etag}
+            return 200, page, "text/html", {"ETag": etag}
+        return 404, "Not Found", "text/plain", {}
+
+    def _listing(self):
+        links = "".join(
+            f'<a href="{PORTAL_PATH}/myresultug?resultid={name}">{name}</a><br>' for name in LISTING
+        )
+        return f"<html><body><div class='wrapper'>{links}</div></body></html>"
+
+    def _form(self, result_id):
+        options = "".join(f"<option value='{code}'>{code}</option>" for code in ("CE", "EEE", "ME", "ECE", "CSE", "IT"))
+        return (
+            "<html><body>"
+            f"<form method='post' action='myresultug?resultid={html.escape(result_id)}'>"
+            f"<input type='hidden' name='resultid' value='{html.escape(result_id)}'>"
+            f"<select name='department1'>{options}</select>"
+            "<input type='text' name='usn'><input type='text' name='dateofbirth'>"
+            "<input type='submit' name='submit' value='Get Result'>"
+            "</form></body></html>"
+        )
+
+    def _result(self, result_id, form):
+        roll = form.get("usn", "")
+        if not roll or roll.upper().endswith("X"):
+            return "<html><body><h3>Invalid Roll Number or Date of Birth. Result not found.</h3></body></html>"
+        seed = int(hashlib.sha1(f"{result_id}|{roll}".encode()).hexdigest(), 16)
+        rows, points = [], 0
+        for i, (code, name) in enumerate(SUBJECTS):
+            grade = GRADES[(seed >> (i * 3)) % len(GRADES)]
+            points += GRADE_POINTS[grade]
+            rows.append(f"<tr><td>{code}</td><td>{name}</td><td>{grade}</td><td>3</td><td>P</td></tr>")
+        sgpa = points / len(SUBJECTS)
+        return (
+            "<html><body>"
+            f"<table><tr><td>Name</td><td>Student {html.escape(roll)}</td></tr>"
+            f"<tr><td>Branch</td><td>{html.escape(form.get('department1', ''))}</td></tr></table>"
+            "<table><tr><th>Code</th><th>Subject</th><th>Grade</th><th>Credits</th><th>Result</th></tr>"
+            + "".join(rows) +
+            f"</table><p>SGPA : {sgpa:.2f}</p></body></html>"
+        )
+
+    def _timetable(self):
+        items = "".join(
+            f"<li><a href='/downloads/{reg}-timetable-{n}.pdf'>B.Tech {reg} Exam Time Table notice {n}</a></li>"
+            for reg in ("R18", "R20", "R23") for n in range(1, 4)
+        )
+        return f"<html><body><div id='ugc-pro3'><div class='container'><ul>{items}</ul></div></div></body></html>"
+
+
+class BotApiStandIn(StandIn):
+    """Mimics the Telegram Bot API methods the bot calls.
+
+    Every request is answered with a plausible result; the last text sent to
+    each chat is kept so a benchmark can check what the user would see.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._message_id = 0
+        self.last_text = {}
+        self.photos = Counter()
+
+    @staticmethod
+    def _params(headers, body):
+        content_type = headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser().parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            params = {}
+            for part in message.get_payload():
+                name = part.get_param("name", header="content-disposition")
+                if part.get_filename() is None:
+                    params[name] = part.get_payload(decode=True).decode(errors="replace")
+            return params
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        return {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+    def _message(self, params, **extra):
+        with self._lock:
+            self._message_id += 1
+            message_id = self._message_id
+        chat_id = int(params.get("chat_id") or 0)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+        }
+        message.update(extra)
+        return message
+
+    def handle(self, method, parsed, headers, body):
+        # Path is /bot<token>/<method>
+        api_method = parsed.path.rsplit("/", 1)[-1]
+        params = self._params(headers, body)
+        chat_id = params.get("chat_id")
+
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif api_method in ("sendMessage", "editMessageText"):
+            with self._lock:
+                self.last_text[str(chat_id)] = params.get("text", "")
+            result = self._message(params, text=params.get("text", ""))
+        elif api_method == "sendPhoto":
+            with self._lock:
+                self.photos[str(chat_id)] += 1
+                self.last_text[str(chat_id)] = "[photo]"
+            message_id = self._message_id + 1
+            result = self._message(params, photo=[{
+                "file_id": f"photo-{message_id}", "file_unique_id": f"u-{message_id}", "width": 320, "height": 240,
+            }])
+        elif api_method == "sendDocument":
+            result = self._message(params, document={"file_id": "doc", "file_unique_id": "doc"})
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}), "application/json", {}
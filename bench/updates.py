@@ -0,0 +1,95 @@
+"""Build Telegram Update JSON the way the Bot API delivers it to the webhook."""
+import itertools
+import time
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+
+def _message(user_id, text, entities=None, from_bot=False):
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+        "from": {"id": 1, "is_bot": True, "first_name": "Bench"} if from_bot else _user(user_id),
+        "text": text,
+    }
+    if entities:
+        message["entities"] = entities
+    return message
+
+
+def command(user_id, name):
+    """A private-chat message carrying ``/name``."""
+    text = f"/{name}"
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": next(_update_ids), "message": _message(user_id, text, entities)}
+
+
+def text(user_id, value):
+    """A plain text reply, e.g. a roll number or date of birth."""
+    return {"update_id": next(_update_ids), "message": _message(user_id, value)}
+
+
+def callback(user_id, data):
+    """An inline keyboard press on a message the bot sent earlier."""
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": _message(user_id, "Choose an option", from_bot=True),
+        },
+    }
+
+
+def resultscheck_flow(user_id, roll, dob, regulation="R20", year="3", sem="1", department="CSE",
+                      redo_roll=False, redo_dob=False):
+    """(step, update) pairs for every state of /resultscheck, in order.
+
+    ``redo_roll``/``redo_dob`` answer "No" to that confirmation once and
+    enter the value again, as users who mistype do.
+    """
+    steps = [
+        ("resultscheck", command(user_id, "resultscheck")),
+        ("get_regulation", callback(user_id, f"reg_{regulation}")),
+        ("get_year", callback(user_id, year)),
+        ("get_sem", callback(user_id, sem)),
+        ("get_option", callback(user_id, department)),
+        ("get_roll", text(user_id, roll)),
+    ]
+    if redo_roll:
+        steps += [("confirm_roll", callback(user_id, "roll_no")), ("get_roll", text(user_id, roll))]
+    steps += [
+        ("confirm_roll", callback(user_id, "roll_ok")),
+        ("get_dob", text(user_id, dob)),
+    ]
+    if redo_dob:
+        steps += [("confirm_dob", callback(user_id, "dob_no")), ("get_dob", text(user_id, dob))]
+    steps.append(("confirm_dob", callback(user_id, f"dob_ok:{dob}")))
+    return steps
+
+
+def examtimetable_flow(user_id, regulation="R20"):
+    """(step, update) pairs for /examtimetable and its regulation button."""
+    return [
+        ("examtimetable", command(user_id, "examtimetable")),
+        ("button", callback(user_id, regulation)),
+    ]
+
+
+def cgpa_flow(user_id, roll, dob, regulation="R20", department="CSE"):
+    """(step, update) pairs for every state of /cgpa, in order."""
+    return [
+        ("cgpa", command(user_id, "cgpa")),
+        ("cgpa_regulation", callback(user_id, f"cgpa_reg_{regulation}")),
+        ("cgpa_department", callback(user_id, f"cgpa_dept_{department}")),
+        ("cgpa_roll", text(user_id, roll)),
+        ("cgpa_dob", text(user_id, dob)),
+    ]
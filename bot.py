@@ -1,6 +1,5 @@
 import logging
 from ExamTimeTable import results_checking, exam_timetable
-from resutbot import bot_work
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
@@ -370,14 +369,15 @@ async def confirm_dob(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         )
         
         try:
-            # Final call to the bot_work function
+            # Final call to the bot_work function (imported here to keep startup light)
+            from resutbot import bot_work
             results = bot_work(all_collected_data)
             
-            if isinstance(results, str) and results.endswith('.png'):
-                logger.info(f"Sending photo: {results}")
+            if isinstance(results, bytes):
+                logger.info("Sending result photo")
                 await context.bot.send_photo(
                     chat_id=update.effective_chat.id,
-                    photo=open(results, 'rb'),
+                    photo=results,
                     caption="Here is your result."
                 )
             else:
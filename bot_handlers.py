@@ -1,6 +1,12 @@
+import asyncio
+import html
 import logging
-from ExamTimeTable import exam_timetable
-from results_helper import ResultsChecking
+import os
+import re
+from metrics import BOT_WORK_STAGE, timed_handler
+from portal_health import portal_health
+from result_jobs import get_result_jobs, QueueFullError
+from telegram_files import send_document_cached, send_photo_cached
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
@@ -25,17 +31,72 @@ from telegram.ext import (
     CONFIRM_DOB,
 ) = range(8)
 
+# States for the /cgpa ConversationHandler
+CGPA_REGULATION, CGPA_DEPARTMENT, CGPA_ROLL, CGPA_DOB = range(8, 12)
+
+# Department codes offered after the semester; also the GET_OPTION callback data
+DEPARTMENTS = {
+    'CE': 'Civil Engineering (CE)',
+    'EEE': 'Electrical & Electronics Engineering (EEE)',
+    'ME': 'Mechanical Engineering (MECH)',
+    'ECE': 'Electronics & Communication Engineering (ECE)',
+    'CSE': 'Computer Science & Engineering (CSE)',
+    'CSE-AI': 'Computer Science & Engineering - Artificial Intelligence (CSE-AI)',
+    'CSE-DS': 'Computer Science & Engineering - Data Science (CSE-DS)',
+    'CSE-CS': 'Computer Science & Engineering - Cyber Security (CSE-CS)',
+    'CSE-NW': 'Computer Science & Engineering - Networks (CSE-Networks)',
+    'CSE-AI&ML': 'Computer Science & Engineering - Artificial Intelligence & Machine Learning (CSE-AI & ML)',
+    'CSE-IOT': 'Computer Science & Engineering - IOT (CSE-IOT)',
+    'CST': 'Computer Science & Technology (CST)',
+    'CST-IT': 'Computer Science & Information Technology (CS-IT)',
+    'IT': 'Information Technology (IT)'
+}
+
 MAX_TIMETABLE_ENTRIES = 10
+# Telegram rejects photo captions longer than this
+MAX_CAPTION_LENGTH = 1024
+# Telegram's limit for inline button callback data, in bytes
+MAX_CALLBACK_DATA = 64
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)
 
 # --- Global Class Instance ---
-try:
-    a = ResultsChecking()
-except Exception as e:
-    logger.critical(f"Failed to instantiate ResultsChecking class: {e}")
-    a = None
+# Scraper modules pull in requests/bs4/lxml, so they are imported on first use
+# rather than when the webhook cold-starts.
+a = None
+
+
+def get_results_checker():
+    """Return the shared ResultsChecking instance, creating it on first use."""
+    global a
+    if a is None:
+        try:
+            from results_helper import ResultsChecking
+            a = ResultsChecking()
+        except Exception as e:
+            logger.critical(f"Failed to instantiate ResultsChecking class: {e}")
+            a = None
+    return a
+
+
+async def find_result_link(regulation, year, sem):
+    """Return the listing link for these selections, preferring regular exams.
+
+    None when the listing has no match or cannot be fetched; bot_work then
+    builds the form URL from the selections.
+    """
+    checker = get_results_checker()
+    if checker is None:
+        return None
+    try:
+        matches = await checker.alookup(regulation, year, sem)
+    except Exception as e:
+        logger.warning(f"Results listing lookup failed: {e}")
+        return None
+    regular = [link for _text, link, parts in matches if len(parts) > 4 and parts[4].lower() == "regular"]
+    links = regular or [link for _text, link, _parts in matches]
+    return links[0] if links else None
 
 
 # --- 1. Simple Command Handlers ---
@@ -46,7 +107,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         chat_id=update.effective_chat.id,
         text="Hi! I'm a bot. You can use:\n"
              "/examtimetable - To check exam timetables\n"
-             "/resultscheck - To get your results"
+             "/resultscheck - To get your results\n"
+             "/cgpa - To get your CGPA across all semesters\n"
+             "/history <roll> <dob> - To list your stored results\n"
+             "/subscribe <reg> <year> <sem> - To be told when results are out\n"
+             "/bulk - To export a whole section's results (CRs)"
     )
 
 
@@ -72,7 +137,8 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     regulation = query.data
     
     try:
-        notice = exam_timetable(regulation)
+        from ExamTimeTable import exam_timetable_async
+        notice = await exam_timetable_async(regulation)
         # Show only the top entries
         msg = "\n\n".join(notice[:MAX_TIMETABLE_ENTRIES])
         if not msg:
@@ -88,11 +154,18 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def resultscheck(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Starts the /resultscheck conversation."""
-    if a is None:
+    if get_results_checker() is None:
         await update.message.reply_text("Sorry, the bot is not configured correctly. Please contact the admin.")
         return ConversationHandler.END
         
     context.user_data.clear()
+    retry_after = portal_health.retry_after()
+    if retry_after:
+        # Let the user know before they type their details in
+        await update.message.reply_text(
+            f"⚠️ The college results server is down right now. "
+            f"Lookups will resume in about {retry_after} seconds."
+        )
     keyboard = [
         [
             InlineKeyboardButton("R18", callback_data="reg_R18"),
@@ -172,24 +245,7 @@ async def get_sem(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     reg = context.user_data['regulation']
     year = context.user_data['year']
     
-    departments = {
-        'CE': 'Civil Engineering (CE)',
-        'EEE': 'Electrical & Electronics Engineering (EEE)',
-        'ME': 'Mechanical Engineering (MECH)',
-        'ECE': 'Electronics & Communication Engineering (ECE)',
-        'CSE': 'Computer Science & Engineering (CSE)',
-        'CSE-AI': 'Computer Science & Engineering - Artificial Intelligence (CSE-AI)',
-        'CSE-DS': 'Computer Science & Engineering - Data Science (CSE-DS)',
-        'CSE-CS': 'Computer Science & Engineering - Cyber Security (CSE-CS)',
-        'CSE-NW': 'Computer Science & Engineering - Networks (CSE-Networks)',
-        'CSE-AI&ML': 'Computer Science & Engineering - Artificial Intelligence & Machine Learning (CSE-AI & ML)',
-        'CSE-IOT': 'Computer Science & Engineering - IOT (CSE-IOT)',
-        'CST': 'Computer Science & Technology (CST)',
-        'CST-IT': 'Computer Science & Information Technology (CS-IT)',
-        'IT': 'Information Technology (IT)'
-    }
-    
-    keyboard = [[InlineKeyboardButton(v, callback_data=k)] for k, v in departments.items()]
+    keyboard = [[InlineKeyboardButton(v, callback_data=k)] for k, v in DEPARTMENTS.items()]
         
     reply_markup = InlineKeyboardMarkup(keyboard)
     
@@ -259,13 +315,17 @@ async def confirm_roll(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 
 async def get_dob(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Stores the Date of Birth and asks for confirmation."""
+    """Asks to confirm the Date of Birth."""
     dob = update.message.text.strip()
-    context.user_data["dob"] = dob
+    # The DOB rides in the Yes button rather than user_data, so it is never
+    # written to the conversation state store
+    if len(f"dob_ok:{dob}".encode()) > MAX_CALLBACK_DATA:
+        await update.message.reply_text("Please enter your Date of Birth as YYYY-MM-DD:")
+        return GET_DOB
     
     keyboard = [
         [
-            InlineKeyboardButton("Yes", callback_data="dob_ok"),
+            InlineKeyboardButton("Yes", callback_data=f"dob_ok:{dob}"),
             InlineKeyboardButton("No", callback_data="dob_no"),
         ]
     ]
@@ -283,20 +343,17 @@ async def confirm_dob(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     query = update.callback_query
     await query.answer()
     
-    if query.data == "dob_ok":
-        await query.edit_message_text(text=f"Date of Birth {context.user_data['dob']} confirmed.")
+    action, _, dob = query.data.partition(":")
+    if action == "dob_ok":
+        await query.edit_message_text(text=f"Date of Birth {dob} confirmed.")
         
         # Get all the data collected and stored in context
         roll = context.user_data.get("roll")
-        dob = context.user_data.get("dob")
         department_code = context.user_data.get("department_code")
         regulation = context.user_data.get("regulation")
         year = context.user_data.get("year")
         sem = context.user_data.get("sem")
 
-        # Final data list to pass to the processing function
-        all_collected_data = [None, roll, dob, department_code, regulation, year, sem]
-        
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text="✅ **All data collected!**\n\n"
@@ -304,28 +361,44 @@ async def confirm_dob(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
                  "Please wait...",
             parse_mode="Markdown"
         )
+
+        # Final data list to pass to the processing function
+        link = await find_result_link(regulation, year, sem)
+        all_collected_data = [link, roll, dob, department_code, regulation, year, sem]
         
         try:
-            # Import bot_work only when needed to avoid circular imports
-            from resutbot import bot_work
-            
-            results = bot_work(all_collected_data)
-            
-            if isinstance(results, str) and results.endswith('.png'):
-                logger.info(f"Sending photo: {results}")
-                await context.bot.send_photo(
-                    chat_id=update.effective_chat.id,
-                    photo=open(results, 'rb'),
-                    caption="Here is your result."
-                )
-            else:
-                logger.info(f"Sending text result: {results}")
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=results,
-                    parse_mode="HTML"
-                )
+            # bot_work runs in a worker thread so other updates keep flowing
+            results = await get_result_jobs().run(all_collected_data)
+
+            with BOT_WORK_STAGE.time(stage="telegram_send"):
+                if isinstance(results, bytes):
+                    logger.info("Sending result photo")
+                    await send_photo_cached(
+                        context.bot,
+                        update.effective_chat.id,
+                        results,
+                        caption="Here is your result."
+                    )
+                else:
+                    logger.info(f"Sending text result: {results}")
+                    await context.bot.send_message(
+                        chat_id=update.effective_chat.id,
+                        text=results,
+                        parse_mode="HTML"
+                    )
                 
+        except QueueFullError:
+            logger.warning("Result queue is full, rejecting request")
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="The results service is busy right now. Please try /resultscheck again in a minute."
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Result job timed out for roll {roll}")
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="The results portal is taking too long to respond. Please try again later."
+            )
         except Exception as e:
             logger.error(f"Error in bot_work function: {e}", exc_info=True)
             await context.bot.send_message(
@@ -341,6 +414,287 @@ async def confirm_dob(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         return GET_DOB
 
 
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lists the semesters stored for a student: /history <roll> <dob>."""
+    if len(context.args) != 2:
+        await update.message.reply_text(
+            "Usage: /history <roll number> <date of birth>\n"
+            "Lists the results already fetched for you."
+        )
+        return
+
+    roll, dob = context.args
+    from result_store import get_result_store
+    store = get_result_store()
+    stored = await asyncio.to_thread(store.history, roll, dob) if store else []
+    if not stored:
+        await update.message.reply_text(
+            "No stored results for those details yet. Use /resultscheck to fetch them."
+        )
+        return
+
+    lines = [f"📚 <b>Stored results for</b> <code>{html.escape(roll)}</code>", ""]
+    for result in stored:
+        lines.append(f"├ {html.escape(result.result_id)}: SGPA <b>{html.escape(result.sgpa or 'N/A')}</b>")
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+
+# --- 3. ConversationHandler for /cgpa ---
+
+async def cgpa(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Starts the /cgpa conversation: regulation, department, roll and DOB once."""
+    if get_results_checker() is None:
+        await update.message.reply_text("Sorry, the bot is not configured correctly. Please contact the admin.")
+        return ConversationHandler.END
+
+    context.user_data.clear()
+    retry_after = portal_health.retry_after()
+    if retry_after:
+        await update.message.reply_text(
+            f"⚠️ The college results server is down right now. "
+            f"Lookups will resume in about {retry_after} seconds."
+        )
+    keyboard = [[
+        InlineKeyboardButton(reg, callback_data=f"cgpa_reg_{reg}") for reg in ("R18", "R20", "R23")
+    ]]
+    await update.message.reply_text(
+        "Let's work out your CGPA from every semester's results.\n\n"
+        "Please select your Regulation:",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return CGPA_REGULATION
+
+
+async def cgpa_regulation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Stores Regulation and asks for the department."""
+    query = update.callback_query
+    await query.answer()
+    regulation = query.data.split('_')[2]
+    context.user_data["regulation"] = regulation
+
+    keyboard = [[InlineKeyboardButton(v, callback_data=f"cgpa_dept_{k}")] for k, v in DEPARTMENTS.items()]
+    await query.edit_message_text(
+        text=f"Regulation: {regulation}\n\nPlease choose your department:",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return CGPA_DEPARTMENT
+
+
+async def cgpa_department(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Stores the department and asks for Roll Number."""
+    query = update.callback_query
+    await query.answer()
+    department_code = query.data[len("cgpa_dept_"):]
+    context.user_data["department_code"] = department_code
+
+    await query.edit_message_text(text=f"You selected: {department_code}")
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text="Please enter your Roll Number:"
+    )
+    return CGPA_ROLL
+
+
+async def cgpa_roll(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Stores the roll number and asks for Date of Birth."""
+    context.user_data["roll"] = update.message.text.strip()
+    await update.message.reply_text("Now enter your Date of Birth (YYYY-MM-DD):")
+    return CGPA_DOB
+
+
+async def cgpa_dob(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Fetches every semester at once and replies with the CGPA card."""
+    dob = update.message.text.strip()
+    roll = context.user_data.get("roll")
+    department_code = context.user_data.get("department_code")
+    regulation = context.user_data.get("regulation")
+    context.user_data.clear()
+
+    await update.message.reply_text(
+        f"Fetching all {regulation} semesters for {roll}. Please wait..."
+    )
+    try:
+        from cgpa import cgpa_report, regular_result_links
+        checker = get_results_checker()
+        semesters = regular_result_links(await checker.alookup(regulation))
+        if not semesters:
+            if await checker.aentries():
+                text = f"No {regulation} results are published on the portal yet."
+            else:
+                # An empty index means the listing could not be scraped
+                text = "The results portal could not be reached. Please try /cgpa again later."
+            await update.message.reply_text(text)
+            return ConversationHandler.END
+
+        # Shares the result job slots, so a burst of /cgpa requests queues up
+        # behind /resultscheck lookups instead of flooding the portal
+        card, text = await get_result_jobs().run(regulation, semesters, roll, dob, department_code, fn=cgpa_report)
+        with BOT_WORK_STAGE.time(stage="telegram_send"):
+            if card and len(text) <= MAX_CAPTION_LENGTH:
+                # Card and per-semester summary go out as one photo reply
+                await send_photo_cached(
+                    context.bot,
+                    update.effective_chat.id,
+                    card,
+                    caption=text,
+                    parse_mode="HTML"
+                )
+            elif card:
+                # Too many semesters for a caption: headline on the card, summary after it
+                await send_photo_cached(
+                    context.bot,
+                    update.effective_chat.id,
+                    card,
+                    caption=text.split("\n", 1)[0],
+                    parse_mode="HTML"
+                )
+                await update.message.reply_text(text, parse_mode="HTML")
+            else:
+                await update.message.reply_text(text, parse_mode="HTML")
+    except QueueFullError:
+        logger.warning("Result queue is full, rejecting CGPA request")
+        await update.message.reply_text("The results service is busy right now. Please try /cgpa again in a minute.")
+    except asyncio.TimeoutError:
+        logger.warning(f"CGPA job timed out for roll {roll}")
+        await update.message.reply_text("The results portal is taking too long to respond. Please try again later.")
+    except Exception as e:
+        logger.error(f"Error computing CGPA: {e}", exc_info=True)
+        await update.message.reply_text("Sorry, an error occurred while working out your CGPA.")
+    return ConversationHandler.END
+
+
+async def cgpa_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Cancels the /cgpa conversation."""
+    await update.message.reply_text("CGPA check cancelled. Type /cgpa to begin again.")
+    context.user_data.clear()
+    return ConversationHandler.END
+
+
+SUBSCRIBE_USAGE = (
+    "Usage: /subscribe <regulation> <year> <semester>\n"
+    "Example: /subscribe R20 3 1\n\n"
+    "You will get one message when matching results are published."
+)
+
+
+async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Subscribes the chat to a result-published notification."""
+    from subscriptions import get_subscription_store
+    store = await asyncio.to_thread(get_subscription_store)
+    chat_id = update.effective_chat.id
+
+    if len(context.args) != 3:
+        current = await asyncio.to_thread(store.subscriptions_for, chat_id)
+        text = SUBSCRIBE_USAGE
+        if current:
+            text += "\n\nCurrent subscriptions:\n" + "\n".join(f"├ {r} Year {y} Sem {s}" for r, y, s in current)
+        await update.message.reply_text(text)
+        return
+
+    regulation, year, semester = context.args[0].upper(), context.args[1], context.args[2]
+    if regulation not in ("R18", "R20", "R23") or year not in ("1", "2", "3", "4") or semester not in ("1", "2"):
+        await update.message.reply_text(SUBSCRIBE_USAGE)
+        return
+
+    await asyncio.to_thread(store.subscribe, chat_id, regulation, year, semester)
+    await update.message.reply_text(
+        f"✅ Subscribed to {regulation} Year {year} Semester {semester} results.\n"
+        f"Use /unsubscribe to stop."
+    )
+
+
+async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Removes one subscription, or all of them without arguments."""
+    from subscriptions import get_subscription_store
+    store = await asyncio.to_thread(get_subscription_store)
+    chat_id = update.effective_chat.id
+    if len(context.args) == 3:
+        removed = await asyncio.to_thread(
+            store.unsubscribe, chat_id, context.args[0].upper(), context.args[1], context.args[2]
+        )
+    else:
+        removed = await asyncio.to_thread(store.unsubscribe, chat_id)
+    await update.message.reply_text(
+        f"Removed {removed} subscription(s)." if removed else "You have no matching subscriptions."
+    )
+
+
+BULK_USAGE = (
+    "Send your class list as a CSV file of <code>roll,dob</code> rows with the caption:\n"
+    "<code>/bulk &lt;result id&gt; &lt;department&gt; [first_roll-last_roll]</code>\n\n"
+    "Sending the same file again resumes an interrupted export."
+)
+
+
+async def bulk(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Exports a whole section's results from a CSV of roll,dob rows."""
+    message = update.message
+    allowed = [u.strip() for u in os.getenv("BULK_ALLOWED_USERS", "").split(",") if u.strip()]
+    if str(update.effective_user.id) not in allowed:
+        await message.reply_text("Sorry, bulk export is only available to class representatives.")
+        return
+
+    args = (message.caption or "").split()[1:]
+    if not message.document or len(args) not in (2, 3):
+        await message.reply_text(BULK_USAGE, parse_mode="HTML")
+        return
+
+    from bulk_export import (
+        DEFAULT_MAX_SECONDS,
+        default_checkpoint_path,
+        estimate_seconds,
+        max_batch_size,
+        parse_students,
+        pending_students,
+        run_bulk_export,
+        select_students,
+        to_csv,
+    )
+    result_id, department = args[0], args[1]
+    roll_range = args[2] if len(args) == 3 else None
+
+    try:
+        file = await context.bot.get_file(message.document.file_id)
+        text = (await file.download_as_bytearray()).decode("utf-8-sig")
+        students, missing = select_students(parse_students(text), roll_range)
+    except ValueError as e:
+        await message.reply_text(f"Could not read that request: {e}")
+        return
+    if not students:
+        await message.reply_text("No roll,dob rows found in that file.")
+        return
+
+    checkpoint = default_checkpoint_path(result_id, department, f"{update.effective_chat.id}_{message.document.file_unique_id}")
+    pending = await asyncio.to_thread(pending_students, students, checkpoint)
+    # The export runs inside this webhook request, which the platform cuts off
+    if DEFAULT_MAX_SECONDS and estimate_seconds(len(pending)) > DEFAULT_MAX_SECONDS:
+        await message.reply_text(
+            f"{len(pending)} students are too many for one request. Please send the same file again "
+            f"with a roll range of at most {max_batch_size(DEFAULT_MAX_SECONDS)} students, "
+            f"e.g. /bulk {result_id} {department} first_roll-last_roll"
+        )
+        return
+
+    await message.reply_text(f"Fetching results for {len(students)} students. This may take a little while...")
+    try:
+        records = await asyncio.to_thread(run_bulk_export, result_id, department, students, checkpoint_path=checkpoint)
+    except Exception as e:
+        logger.error(f"Bulk export failed: {e}", exc_info=True)
+        await message.reply_text("Sorry, the export failed. Sending the same file again resumes it.")
+        return
+    records += [{"roll": roll, "status": "missing_dob"} for roll in missing]
+
+    ok = sum(1 for r in records if r["status"] == "ok")
+    # A re-sent class list that finished earlier yields the same CSV; reuse its upload
+    await send_document_cached(
+        context.bot,
+        update.effective_chat.id,
+        to_csv(records).encode(),
+        filename=f"results_{department}.csv",
+        caption=f"{ok} of {len(records)} results fetched."
+    )
+
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancels and ends the conversation."""
     await update.message.reply_text(
@@ -351,28 +705,60 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 def setup_handlers(application: Application) -> None:
-    """Setup all handlers for the bot."""
+    """Setup all handlers for the bot. Every callback is timed for /metrics."""
     # Setup ConversationHandler for /resultscheck
+    # With a persistence backend any instance can continue the conversation
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("resultscheck", resultscheck)],
+        entry_points=[CommandHandler("resultscheck", timed_handler(resultscheck))],
         states={
-            GET_REGULATION: [CallbackQueryHandler(get_regulation, pattern="^reg_")],
-            GET_YEAR: [CallbackQueryHandler(get_year, pattern=r"^(1|2|3|4)$")],
-            GET_SEM: [CallbackQueryHandler(get_sem, pattern=r"^(1|2)$")],
-            GET_OPTION: [CallbackQueryHandler(get_option, pattern=r"^\d+$")],
-            GET_ROLL: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_roll)],
-            CONFIRM_ROLL: [CallbackQueryHandler(confirm_roll, pattern="^roll_")],
-            GET_DOB: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_dob)],
-            CONFIRM_DOB: [CallbackQueryHandler(confirm_dob, pattern="^dob_")],
+            GET_REGULATION: [CallbackQueryHandler(timed_handler(get_regulation), pattern="^reg_")],
+            GET_YEAR: [CallbackQueryHandler(timed_handler(get_year), pattern=r"^(1|2|3|4)$")],
+            GET_SEM: [CallbackQueryHandler(timed_handler(get_sem), pattern=r"^(1|2)$")],
+            GET_OPTION: [CallbackQueryHandler(
+                timed_handler(get_option),
+                pattern="^(" + "|".join(re.escape(code) for code in DEPARTMENTS) + ")$",
+            )],
+            GET_ROLL: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler(get_roll))],
+            CONFIRM_ROLL: [CallbackQueryHandler(timed_handler(confirm_roll), pattern="^roll_")],
+            GET_DOB: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler(get_dob))],
+            CONFIRM_DOB: [CallbackQueryHandler(timed_handler(confirm_dob), pattern="^dob_")],
         },
-        fallbacks=[CommandHandler("cancel", cancel)],
+        fallbacks=[CommandHandler("cancel", timed_handler(cancel))],
+        name="resultscheck",
+        persistent=application.persistence is not None,
     )
     
     application.add_handler(conv_handler)
+
+    cgpa_handler = ConversationHandler(
+        entry_points=[CommandHandler("cgpa", timed_handler(cgpa))],
+        states={
+            CGPA_REGULATION: [CallbackQueryHandler(timed_handler(cgpa_regulation), pattern="^cgpa_reg_")],
+            CGPA_DEPARTMENT: [CallbackQueryHandler(timed_handler(cgpa_department), pattern="^cgpa_dept_")],
+            CGPA_ROLL: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler(cgpa_roll))],
+            CGPA_DOB: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler(cgpa_dob))],
+        },
+        fallbacks=[CommandHandler("cancel", timed_handler(cgpa_cancel))],
+        name="cgpa",
+        persistent=application.persistence is not None,
+    )
+    application.add_handler(cgpa_handler)
     
     # Add Simple Handlers
-    application.add_handler(CommandHandler('start', start))
-    application.add_handler(CommandHandler('examtimetable', examtimetable))
+    application.add_handler(CommandHandler('start', timed_handler(start)))
+    application.add_handler(CommandHandler('examtimetable', timed_handler(examtimetable)))
+    application.add_handler(CommandHandler('history', timed_handler(history)))
+    application.add_handler(CommandHandler('bulk', timed_handler(bulk)))
+    application.add_handler(CommandHandler('subscribe', timed_handler(subscribe)))
+    application.add_handler(CommandHandler('unsubscribe', timed_handler(unsubscribe)))
+    application.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"^/bulk\b"), timed_handler(bulk)))
     
     # Handler for /examtimetable buttons
-    application.add_handler(CallbackQueryHandler(button, pattern=r"^(R23|R20|R18)$"))
+    application.add_handler(CallbackQueryHandler(timed_handler(button), pattern=r"^(R23|R20|R18)$"))
+
+    # Poll the results listing, pre-warm lookups and notify subscribers
+    from result_watcher import result_watcher, setup_result_watcher
+    from subscriptions import on_new_results
+    if on_new_results not in result_watcher.listeners:
+        result_watcher.add_listener(on_new_results)
+    setup_result_watcher(application)
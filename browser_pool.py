@@ -0,0 +1,289 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+
+from metrics import BOT_WORK_STAGE
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+DEFAULT_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "200"))
+DEFAULT_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "768"))
+
+LAUNCH_ARGS = ["--disable-dev-shm-usage", "--disable-gpu"]
+
+
+def _process_tree_rss_mb():
+    """Return the resident memory of this process and its children in MB.
+
+    Chromium runs as child processes, so only counting our own RSS would miss
+    most of the browser. Falls back to 0 where /proc is not available.
+    """
+    try:
+        children = {}
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # The command name may contain spaces, so split after the closing paren
+            fields = stat.rsplit(')', 1)[-1].split()
+            children.setdefault(int(fields[1]), []).append(int(pid))
+
+        total_kb = 0
+        pending = [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            pending.extend(children.get(pid, []))
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total_kb += int(line.split()[1])
+                            break
+            except OSError:
+                continue
+        return total_kb / 1024
+    except Exception:
+        return 0
+
+
+class BrowserPool:
+    """A long-lived headless Chromium with a bounded pool of reusable pages.
+
+    Playwright objects are bound to the event loop that created them, so the
+    pool owns a private loop running in a daemon thread. Callers from any
+    thread hand it a coroutine function via run() and block for the result.
+
+    The browser is recycled once it has served ``max_pages`` pages or the
+    process tree grows beyond ``max_rss_mb``; recycling waits for in-flight
+    pages to be released so no request is cut off.
+    """
+
+    def __init__(self, size=None, max_pages=None, max_rss_mb=None):
+        self.size = size or DEFAULT_POOL_SIZE
+        self.max_pages = max_pages or DEFAULT_MAX_PAGES
+        self.max_rss_mb = max_rss_mb or DEFAULT_MAX_RSS_MB
+
+        self._thread_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+        # Only touched from the pool loop
+        self._playwright = None
+        self._browser = None
+        self._launch_lock = None
+        self._cond = None
+        self._idle = []
+        self._in_use = 0
+        self._draining = False
+
+        self.launches = 0
+        self.recycles = 0
+        self.pages_served = 0
+        self._browser_pages = 0
+        self._last_rss_mb = 0
+
+    # --- Loop management ---
+
+    def _ensure_loop(self):
+        with self._thread_lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                self._launch_lock = asyncio.Lock()
+                self._cond = asyncio.Condition()
+                ready.set()
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name="browser-pool", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            return loop
+
+    def run(self, fn, timeout=None):
+        """Run ``await fn(page)`` on a pooled page and return its result.
+
+        Blocks the calling thread; must not be called from the pool loop itself.
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run(fn), loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Stop the session so the page is released, not left navigating
+            future.cancel()
+            raise
+
+    def submit(self, fn):
+        """Schedule ``fn(page)`` and return a concurrent.futures.Future."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(fn), loop)
+
+    # --- Pool internals (pool loop only) ---
+
+    async def _run(self, fn):
+        with BOT_WORK_STAGE.time(stage="browser_acquire"), span("playwright.acquire_page"):
+            context, page = await self._acquire()
+        broken = True
+        try:
+            result = await fn(page)
+            broken = False
+            return result
+        finally:
+            await self._release(context, page, broken)
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                logger.warning("Browser disconnected, relaunching")
+                await self._close_browser()
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            with BOT_WORK_STAGE.time(stage="browser_launch"), span("playwright.launch"):
+                self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+            self._browser_pages = 0
+            self.launches += 1
+            logger.info(f"Launched pooled Chromium (launch #{self.launches})")
+            return self._browser
+
+    async def _acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._draining and self._in_use < self.size)
+            self._in_use += 1
+        try:
+            browser = await self._ensure_browser()
+            while self._idle:
+                context, page = self._idle.pop()
+                if not page.is_closed():
+                    return context, page
+                await self._close_context(context)
+            context = await browser.new_context()
+            page = await context.new_page()
+            return context, page
+        except BaseException:
+            async with self._cond:
+                self._in_use -= 1
+                self._cond.notify_all()
+            raise
+
+    async def _release(self, context, page, broken):
+        self.pages_served += 1
+        self._browser_pages += 1
+
+        if not broken and not self._draining and not page.is_closed():
+            try:
+                await context.clear_cookies()
+                self._idle.append((context, page))
+            except Exception:
+                await self._close_context(context)
+        else:
+            await self._close_context(context)
+
+        async with self._cond:
+            self._in_use -= 1
+            if not self._draining and self._needs_recycle():
+                self._draining = True
+            if self._draining and self._in_use == 0:
+                await self._recycle()
+            self._cond.notify_all()
+
+    def _needs_recycle(self):
+        if self._browser_pages >= self.max_pages:
+            logger.info(f"Recycling browser after {self._browser_pages} pages")
+            return True
+        self._last_rss_mb = _process_tree_rss_mb()
+        if self._last_rss_mb > self.max_rss_mb:
+            logger.info(f"Recycling browser at {self._last_rss_mb:.0f} MB RSS (limit {self.max_rss_mb} MB)")
+            return True
+        return False
+
+    async def _recycle(self):
+        async with self._launch_lock:
+            await self._close_browser()
+        self._browser_pages = 0
+        self._draining = False
+        self.recycles += 1
+
+    async def _close_context(self, context):
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _close_browser(self):
+        while self._idle:
+            context, _page = self._idle.pop()
+            await self._close_context(context)
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    async def _shutdown(self):
+        await self._close_browser()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # --- Public helpers ---
+
+    def shutdown(self):
+        """Close the browser and stop the pool loop."""
+        with self._thread_lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(10)
+        except Exception as e:
+            logger.warning(f"Error shutting down browser pool: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self):
+        """Return pool size and recycle counters for monitoring."""
+        return {
+            "pool_size": self.size,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "browser_running": self._browser is not None,
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "pages_served": self.pages_served,
+            "browser_pages": self._browser_pages,
+            "max_pages": self.max_pages,
+            "rss_mb": round(self._last_rss_mb, 1),
+            "max_rss_mb": self.max_rss_mb,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Return the process-wide BrowserPool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,285 @@
+"""Bulk result export for class representatives.
+
+Fetches a whole section's results for one result id and department and
+writes a CSV or JSON summary with SGPA and per-subject grades.
+
+    python bulk_export.py --result-id B.Tech-3-1-R20-Regular-2024 \\
+        --department CSE --students section_a.csv --out section_a_results.csv
+
+The students CSV holds ``roll,dob`` rows. ``--rolls 21691A0501-21691A0560``
+restricts the export to a roll range. Progress is checkpointed, so running
+the same command again after an interruption resumes where it stopped.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from metrics import RESULT_LOOKUPS
+from portal_health import PortalUnavailable
+from result_fetcher import ResultNotFound, PortalLayoutError, result_form_url
+from resutbot import lookup_result
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "3"))
+DEFAULT_MIN_INTERVAL = float(os.getenv("BULK_MIN_INTERVAL", "0.5"))
+# /bulk refuses batches estimated to take longer than this (0: no limit), so
+# an export finishes inside one webhook request (vercel.json maxDuration: 45)
+DEFAULT_MAX_SECONDS = float(os.getenv("BULK_MAX_SECONDS", "30"))
+# Rough duration of one portal lookup, used for that estimate
+LOOKUP_SECONDS = 2.0
+MAX_ROLL_RANGE = 500
+
+# Rolls with these statuses are not fetched again when a batch resumes
+FINAL_STATUSES = ("ok", "not_found")
+
+
+def expand_roll_range(spec):
+    """Expand '21691A0501-21691A0560' (or '21691A0501-60') into roll numbers."""
+    start, _, end = spec.partition('-')
+    start, end = start.strip().upper(), end.strip().upper()
+    match = re.fullmatch(r'(.*?)(\d+)', start)
+    if not match or not end.isalnum():
+        raise ValueError(f"Invalid roll range: {spec}")
+    prefix, first = match.groups()
+    if len(end) < len(start):
+        # Short form: only the changing tail is given
+        end = start[:len(start) - len(end)] + end
+    if not end.startswith(prefix) or not end[len(prefix):].isdigit():
+        raise ValueError(f"Invalid roll range: {spec}")
+    last = end[len(prefix):]
+    if int(last) - int(first) + 1 > MAX_ROLL_RANGE:
+        raise ValueError(f"Roll range {spec} covers more than {MAX_ROLL_RANGE} rolls")
+    width = len(first)
+    return [f"{prefix}{n:0{width}d}" for n in range(int(first), int(last) + 1)]
+
+
+def read_students(path):
+    """Read (roll, dob) pairs from a CSV file; a header row is optional."""
+    with open(path, newline='') as f:
+        return parse_students(f.read())
+
+
+def parse_students(text):
+    """Parse (roll, dob) pairs from CSV text; a header row is optional."""
+    students = []
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) < 2 or not row[0].strip():
+            continue
+        roll, dob = row[0].strip().upper(), row[1].strip()
+        if roll == 'ROLL':
+            continue
+        students.append((roll, dob))
+    return students
+
+
+def select_students(students, roll_range=None):
+    """Keep only students in the roll range; returns (selected, rolls_missing_dob)."""
+    if not roll_range:
+        return students, []
+    wanted = expand_roll_range(roll_range)
+    by_roll = dict(students)
+    selected = [(roll, by_roll[roll]) for roll in wanted if roll in by_roll]
+    missing = [roll for roll in wanted if roll not in by_roll]
+    return selected, missing
+
+
+class PolitenessLimiter:
+    """Spaces out request starts by at least ``min_interval`` seconds."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def load_checkpoint(path):
+    """Return {roll: record} from a JSON-lines checkpoint file."""
+    records = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    records[record["roll"]] = record
+    return records
+
+
+def _fetch_one(portal_url, department, roll, dob):
+    try:
+        result = lookup_result(portal_url, roll, dob, department)
+    except ResultNotFound:
+        return {"roll": roll, "status": "not_found"}
+    except (requests.RequestException, PortalLayoutError, PortalUnavailable) as e:
+        if isinstance(e, PortalLayoutError):
+            # No browser fallback here, so the lookup ends as an error
+            RESULT_LOOKUPS.inc(outcome="error")
+        return {"roll": roll, "status": "error", "error": str(e)}
+    except Exception as e:
+        # One bad roll must not abort the whole batch
+        logger.error(f"Bulk lookup of {roll} failed: {e}", exc_info=True)
+        return {"roll": roll, "status": "error", "error": str(e)}
+    return {
+        "roll": roll,
+        "status": "ok",
+        "name": result.name,
+        "sgpa": result.sgpa,
+        "subjects": result.subjects,
+    }
+
+
+def estimate_seconds(count, concurrency=None, min_interval=None):
+    """Rough wall time of ``count`` lookups at the given pacing."""
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    min_interval = DEFAULT_MIN_INTERVAL if min_interval is None else min_interval
+    return max(count * min_interval, math.ceil(count / concurrency) * LOOKUP_SECONDS)
+
+
+def max_batch_size(max_seconds, concurrency=None, min_interval=None):
+    """Largest number of lookups estimated to finish within ``max_seconds``."""
+    count = 0
+    while count < MAX_ROLL_RANGE and estimate_seconds(count + 1, concurrency, min_interval) <= max_seconds:
+        count += 1
+    return count
+
+
+def pending_students(students, checkpoint_path):
+    """Students a resumed batch still has to fetch."""
+    done = load_checkpoint(checkpoint_path)
+    return [(roll, dob) for roll, dob in students if done.get(roll, {}).get("status") not in FINAL_STATUSES]
+
+
+def run_bulk_export(result_id, department, students, concurrency=None, min_interval=None,
+                    checkpoint_path=None, progress=None):
+    """Fetch every student's result and return one record per roll.
+
+    ``result_id`` may also be a full results form URL. Lookups go over the
+    browserless HTTP engine, at most ``concurrency`` at a time and started
+    at least ``min_interval`` seconds apart. Finished rolls are appended to
+    ``checkpoint_path`` and skipped when the same batch is run again.
+    """
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    min_interval = DEFAULT_MIN_INTERVAL if min_interval is None else min_interval
+    portal_url = result_id if result_id.startswith("http") else result_form_url(result_id)
+
+    done = load_checkpoint(checkpoint_path)
+    pending = pending_students(students, checkpoint_path)
+    if done:
+        logger.info(f"Resuming bulk export: {len(students) - len(pending)} done, {len(pending)} left")
+
+    limiter = PolitenessLimiter(min_interval)
+    write_lock = threading.Lock()
+    checkpoint = open(checkpoint_path, 'a') if checkpoint_path else None
+    completed = [len(students) - len(pending)]
+
+    def work(student):
+        roll, dob = student
+        limiter.wait()
+        record = _fetch_one(portal_url, department, roll, dob)
+        with write_lock:
+            done[roll] = record
+            if checkpoint:
+                checkpoint.write(json.dumps(record) + "\n")
+                checkpoint.flush()
+            completed[0] += 1
+            if progress:
+                progress(completed[0], len(students))
+        return record
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk") as pool:
+            list(pool.map(work, pending))
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    return [done[roll] for roll, _dob in students if roll in done]
+
+
+def _subject_columns(records):
+    columns = []
+    for record in records:
+        for subject in record.get("subjects", []):
+            column = subject.get("code") or subject.get("name")
+            if column and column not in columns:
+                columns.append(column)
+    return columns
+
+
+def to_csv(records):
+    """Render records as CSV text: roll, status, name, SGPA, then one grade column per subject."""
+    columns = _subject_columns(records)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["roll", "status", "name", "sgpa"] + columns)
+    for record in records:
+        grades = {(s.get("code") or s.get("name")): s.get("grade", "") for s in record.get("subjects", [])}
+        writer.writerow([record["roll"], record["status"], record.get("name", ""), record.get("sgpa", "")]
+                        + [grades.get(column, "") for column in columns])
+    return out.getvalue()
+
+
+def to_json(records):
+    return json.dumps(records, indent=2)
+
+
+def default_checkpoint_path(result_id, department, key=""):
+    safe = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{result_id}_{department}_{key}")
+    return os.path.join(tempfile.gettempdir(), f"bulk_{safe}.jsonl")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a section's results to CSV or JSON.")
+    parser.add_argument("--result-id", required=True, help="Result id or full results form URL")
+    parser.add_argument("--department", required=True, help="Department code as on the portal form")
+    parser.add_argument("--students", required=True, help="CSV file of roll,dob rows")
+    parser.add_argument("--rolls", help="Only export this roll range, e.g. 21691A0501-21691A0560")
+    parser.add_argument("--out", required=True, help="Output file (.csv or .json)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--min-interval", type=float, default=DEFAULT_MIN_INTERVAL,
+                        help="Minimum seconds between portal requests")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: derived from the batch)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    students, missing = select_students(read_students(args.students), args.rolls)
+    for roll in missing:
+        logger.warning(f"No date of birth for {roll}, skipping")
+    checkpoint = args.checkpoint or default_checkpoint_path(args.result_id, args.department, os.path.basename(args.out))
+
+    records = run_bulk_export(
+        args.result_id, args.department, students,
+        concurrency=args.concurrency, min_interval=args.min_interval, checkpoint_path=checkpoint,
+        progress=lambda n, total: logger.info(f"{n}/{total} done"),
+    )
+    records += [{"roll": roll, "status": "missing_dob"} for roll in missing]
+
+    with open(args.out, 'w', newline='') as f:
+        f.write(to_json(records) if args.out.endswith('.json') else to_csv(records))
+    ok = sum(1 for r in records if r["status"] == "ok")
+    print(f"Wrote {len(records)} rows ({ok} with results) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
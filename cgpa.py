@@ -0,0 +1,159 @@
+import contextvars
+import html
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from metrics import BOT_WORK_STAGE, RESULT_LOOKUPS
+from portal_health import PortalUnavailable, unavailable_message
+from result_card import failed_subjects, parse_number, render_cgpa_card, semester_credits
+from result_fetcher import PortalLayoutError, ResultNotFound, result_id_from_url
+from resutbot import lookup_result
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Result pages fetched at once for one /cgpa request
+CGPA_CONCURRENCY = int(os.getenv("CGPA_CONCURRENCY", "4"))
+
+
+def regular_result_links(entries):
+    """Group Regular listing entries by (year, semester), in course order.
+
+    A semester may have several result ids (one per batch); the student's
+    is whichever the portal finds them in.
+    """
+    by_semester = {}
+    for _text, link, parts in entries:
+        if len(parts) < 5 or parts[4].lower() != "regular":
+            continue
+        if not (parts[1].isdigit() and parts[2].isdigit()):
+            continue
+        by_semester.setdefault((parts[1], parts[2]), []).append(link)
+    return sorted(by_semester.items())
+
+
+def _fetch_one(link, roll, dob, department, year, sem):
+    """Return (status, StudentResult or error) for one result id."""
+    with span("cgpa.fetch", year=year, sem=sem, result_id=result_id_from_url(link)):
+        try:
+            return "ok", lookup_result(link, roll, dob, department)
+        except ResultNotFound:
+            return "not_found", None
+        except PortalUnavailable as e:
+            return "unavailable", e
+        except (requests.RequestException, PortalLayoutError) as e:
+            logger.warning(f"CGPA lookup of {link} failed for roll {roll}: {e}")
+            if isinstance(e, PortalLayoutError):
+                # No browser fallback here, so the lookup ends as an error
+                RESULT_LOOKUPS.inc(outcome="error")
+            return "error", e
+
+
+def fetch_semesters(semesters, roll, dob, department, concurrency=None):
+    """Fetch every semester's result ids concurrently. Blocking.
+
+    Returns one record per (year, semester) with the status "ok",
+    "not_found", "unavailable" or "error" and, when found, the result.
+    """
+    jobs = [(key, link) for key, links in semesters for link in links]
+    if not jobs:
+        return []
+    workers = min(concurrency or CGPA_CONCURRENCY, len(jobs))
+    with BOT_WORK_STAGE.time(stage="cgpa_fetch"), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (key, pool.submit(contextvars.copy_context().run, _fetch_one, link, roll, dob, department, *key))
+            for key, link in jobs
+        ]
+        outcomes = {}
+        for key, future in futures:
+            outcomes.setdefault(key, []).append(future.result())
+
+    records = []
+    for (year, sem), results in outcomes.items():
+        record = {"year": year, "sem": sem, "status": "not_found", "result": None, "error": None}
+        for status, value in results:
+            if status == "ok":
+                record.update(status="ok", result=value, error=None)
+                break
+            if status in ("unavailable", "error") and record["status"] == "not_found":
+                record.update(status=status, error=value)
+        records.append(record)
+    return records
+
+
+def aggregate_cgpa(records):
+    """Return (cgpa, credit_weighted) over the semesters with a numeric SGPA.
+
+    The CGPA is weighted by each semester's credits when every page lists
+    them, and is the plain mean of the SGPAs otherwise.
+    """
+    graded = []
+    for record in records:
+        if record["status"] != "ok":
+            continue
+        sgpa = parse_number(record["result"].sgpa)
+        if sgpa is not None:
+            graded.append((sgpa, semester_credits(record["result"])))
+    if not graded:
+        return None, False
+    if all(credits for _sgpa, credits in graded):
+        total = sum(credits for _sgpa, credits in graded)
+        return round(sum(sgpa * credits for sgpa, credits in graded) / total, 2), True
+    return round(sum(sgpa for sgpa, _credits in graded) / len(graded), 2), False
+
+
+def format_cgpa_html(records, cgpa, weighted, roll):
+    """Caption listing each semester's SGPA and the aggregated CGPA."""
+    found = [record["result"] for record in records if record["status"] == "ok"]
+    name = next((result.name for result in found if result.name), "N/A")
+    lines = [
+        f"🎓 <b>CGPA: {cgpa:.2f}</b>" if cgpa is not None else "🎓 <b>CGPA: N/A</b>",
+        "",
+        f"👤 <b>Student:</b> {html.escape(name)}",
+        f"🆔 <b>Roll Number:</b> <code>{html.escape(roll)}</code>",
+        "",
+    ]
+    for record in records:
+        label = f"Year {record['year']} Sem {record['sem']}"
+        if record["status"] == "ok":
+            result = record["result"]
+            failed = len(failed_subjects(result))
+            note = f" ({failed} failed)" if failed else ""
+            lines.append(f"├ {label}: SGPA <b>{html.escape(result.sgpa or 'N/A')}</b>{note}")
+        else:
+            lines.append(f"├ {label}: could not be fetched")
+    lines.append("")
+    basis = "weighted by semester credits" if weighted else "average of semester SGPAs"
+    lines.append(f"<i>CGPA {basis}; regular examinations only.</i>")
+    return "\n".join(lines)
+
+
+def cgpa_report(regulation, semesters, roll, dob, department):
+    """Fetch every semester and build the /cgpa reply. Blocking.
+
+    Returns (card PNG bytes or None, HTML text). The card is None when no
+    semester was found, and the text then explains why.
+    """
+    records = fetch_semesters(semesters, roll, dob, department)
+    if not any(record["status"] == "ok" for record in records):
+        unavailable = [record["error"] for record in records if record["status"] == "unavailable"]
+        if unavailable:
+            return None, unavailable_message(unavailable[0])
+        if any(record["status"] == "error" for record in records):
+            return None, ("❌ <b>Error Processing Results</b>\n\n"
+                          "The results portal could not be reached. Please try /cgpa again later.")
+        return None, (f"❌ <b>Results Not Found</b>\n\n"
+                      f"No {html.escape(regulation)} results were found for roll "
+                      f"<code>{html.escape(roll)}</code> in <code>{html.escape(department)}</code> "
+                      f"with that date of birth.")
+
+    # The listing also carries semesters of other batches and ones the
+    # student has not reached yet, so only report those that apply
+    records = [record for record in records if record["status"] != "not_found"]
+    cgpa, weighted = aggregate_cgpa(records)
+    with BOT_WORK_STAGE.time(stage="card_render"), span("bot_work.card_render"):
+        card = render_cgpa_card(records, cgpa, regulation=regulation, roll=roll, department=department)
+    return card, format_cgpa_html(records, cgpa, weighted, roll)
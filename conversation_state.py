@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import ssl
+import tempfile
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+from telegram.ext import BasePersistence, ConversationHandler, PersistenceInput
+
+from tracing import TRACING_ENABLED, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+# "sqlite" or "redis"; unset keeps conversations in process memory only
+STATE_BACKEND = os.getenv("CONVERSATION_STATE", "").lower()
+STATE_PATH = os.getenv("CONVERSATION_STATE_PATH", os.path.join(tempfile.gettempdir(), "mitsbot_state.sqlite3"))
+STATE_URL = os.getenv("CONVERSATION_STATE_URL", "redis://localhost:6379/0")
+# Abandoned conversations expire after this many seconds
+STATE_TTL = int(os.getenv("CONVERSATION_STATE_TTL", str(24 * 3600)))
+STATE_PREFIX = "mitsbot:"
+# user_data keys never written to the backend; the result store keeps only
+# an HMAC of the date of birth, so the state store must not hold it either
+UNPERSISTED_USER_KEYS = ("dob",)
+
+_MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_state_updated ON state (updated_at);
+"""
+
+
+class SQLiteStateBackend:
+    """Conversation state in a SQLite file; values are JSON strings."""
+
+    name = "sqlite"
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or STATE_PATH
+        self.ttl = ttl if ttl is not None else STATE_TTL
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def get(self, kind, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE kind = ? AND key = ? AND updated_at >= ?",
+                (kind, key, time.time() - self.ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def write_batch(self, items):
+        """Apply ``[((kind, key), value or None)]`` in one transaction."""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                for (kind, key), value in items:
+                    if value is None:
+                        self._conn.execute("DELETE FROM state WHERE kind = ? AND key = ?", (kind, key))
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)", (kind, key, value, now)
+                        )
+                self._conn.execute("DELETE FROM state WHERE updated_at < ?", (now - self.ttl,))
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RespClient:
+    """Minimal blocking Redis (RESP2) client with pipelining.
+
+    Understands redis:// and rediss:// URLs with an optional password and
+    database number, which is all the state backend needs.
+    """
+
+    def __init__(self, url, timeout=5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.tls = parsed.scheme == "rediss"
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self.tls:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._roundtrip(setup)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    @staticmethod
+    def _encode(args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def _roundtrip(self, commands):
+        self._sock.sendall(b"".join(self._encode(command) for command in commands))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands):
+        """Send every command in one write and return their replies in order."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(commands)
+                except (OSError, ConnectionError):
+                    # Stale pooled connection: reconnect once
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+
+class RedisStateBackend:
+    """Conversation state in any Redis-protocol server; values expire after ``ttl``."""
+
+    name = "redis"
+
+    def __init__(self, url=None, ttl=None, prefix=STATE_PREFIX):
+        self.url = url or STATE_URL
+        self.ttl = ttl if ttl is not None else STATE_TTL
+        self.prefix = prefix
+        self.client = RespClient(self.url)
+
+    def _key(self, kind, key):
+        return f"{self.prefix}{kind}:{key}"
+
+    def get(self, kind, key):
+        return self.client.execute("GET", self._key(kind, key))
+
+    def write_batch(self, items):
+        commands = []
+        for (kind, key), value in items:
+            if value is None:
+                commands.append(("DEL", self._key(kind, key)))
+            else:
+                commands.append(("SET", self._key(kind, key), value, "EX", self.ttl))
+        if commands:
+            self.client.pipeline(commands)
+
+
+class ConversationPersistence(BasePersistence):
+    """Write-behind persistence of ``user_data`` and conversation states.
+
+    Changes handed over by Application.update_persistence() are only
+    buffered; flush() writes everything buffered in one transaction or
+    pipeline. Nothing is bulk-loaded at startup: user_data is refreshed
+    from the backend when an update is handled and conversation states
+    are reloaded by load_conversations(), so any instance can pick up a
+    conversation started on another one.
+    """
+
+    def __init__(self, backend):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=60,
+        )
+        self.backend = backend
+        self._pending = {}
+        self._flush_lock = asyncio.Lock()
+
+        self.reads = 0
+        self.read_errors = 0
+        self.flushes = 0
+        self.written = 0
+        self.write_errors = 0
+
+    # --- Buffer and backend access ---
+
+    async def _read(self, kind, key):
+        if (kind, key) in self._pending:
+            value = self._pending[(kind, key)]
+        else:
+            try:
+                value = await asyncio.to_thread(self.backend.get, kind, key)
+                self.reads += 1
+            except Exception as e:
+                self.read_errors += 1
+                logger.error(f"Could not read {kind} state: {e}")
+                return _MISSING
+        return None if value is None else json.loads(value)
+
+    def _buffer(self, kind, key, value):
+        self._pending[(kind, key)] = None if value is None else json.dumps(value)
+
+    async def flush(self):
+        """Write every buffered change to the backend in one batch."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self.backend.write_batch, list(batch.items()))
+                self.flushes += 1
+                self.written += len(batch)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"Could not write conversation state: {e}")
+                # Retry on the next flush, unless newer values arrived meanwhile
+                for item, value in batch.items():
+                    self._pending.setdefault(item, value)
+
+    async def load_conversations(self, application, update):
+        """Reload this update's state in every persistent ConversationHandler.
+
+        PTB has no public hook to reload one conversation, so this uses
+        ConversationHandler internals (_get_key, _conversations) of the
+        python-telegram-bot version pinned in requirements.txt.
+        """
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                if not (isinstance(handler, ConversationHandler) and handler.persistent):
+                    continue
+                try:
+                    key = handler._get_key(update)
+                except RuntimeError:
+                    continue
+                state = await self._read(f"conv:{handler.name}", json.dumps(list(key)))
+                if state is _MISSING:
+                    continue
+                # Bypass write tracking: this is a read, not a state change
+                if state is None:
+                    handler._conversations.data.pop(key, None)
+                else:
+                    handler._conversations.update_no_track({key: state})
+
+    # --- BasePersistence ---
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        self._buffer(f"conv:{name}", json.dumps(list(key)), new_state)
+
+    async def get_user_data(self):
+        return {}
+
+    async def update_user_data(self, user_id, data):
+        self._buffer("user", str(user_id), {k: v for k, v in data.items() if k not in UNPERSISTED_USER_KEYS})
+
+    async def refresh_user_data(self, user_id, user_data):
+        data = await self._read("user", str(user_id))
+        if data is _MISSING:
+            return
+        user_data.clear()
+        user_data.update(data or {})
+
+    async def drop_user_data(self, user_id):
+        self._buffer("user", str(user_id), None)
+
+    async def get_chat_data(self):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "pending": len(self._pending),
+            "reads": self.reads,
+            "read_errors": self.read_errors,
+            "flushes": self.flushes,
+            "written": self.written,
+            "write_errors": self.write_errors,
+        }
+
+
+def get_conversation_persistence():
+    """Build the persistence selected by CONVERSATION_STATE, or None."""
+    if STATE_BACKEND == "sqlite":
+        return ConversationPersistence(SQLiteStateBackend())
+    if STATE_BACKEND == "redis":
+        return ConversationPersistence(RedisStateBackend())
+    if STATE_BACKEND:
+        logger.warning(f"Unknown CONVERSATION_STATE '{STATE_BACKEND}'; keeping state in memory")
+    return None
+
+
+def _trace_attributes(update):
+    attributes = {"update_id": update.update_id}
+    if update.effective_chat:
+        attributes["chat_id"] = update.effective_chat.id
+    if update.callback_query:
+        attributes["callback_data"] = update.callback_query.data or ""
+    elif update.message and update.message.text and update.message.text.startswith("/"):
+        # Only commands: other texts are roll numbers and dates of birth
+        attributes["command"] = update.message.text.split()[0]
+    return attributes
+
+
+async def process_update(application, update):
+    """Process an update with its conversation state loaded and saved around it.
+
+    Each update is the root of one trace (see tracing.py).
+    """
+    attributes = _trace_attributes(update) if TRACING_ENABLED else {}
+    with start_trace("telegram.update", **attributes):
+        await _process_update(application, update)
+
+
+async def _process_update(application, update):
+    persistence = application.persistence
+    if not isinstance(persistence, ConversationPersistence):
+        await application.process_update(update)
+        return
+    with span("conversation_state.load"):
+        await persistence.load_conversations(application, update)
+    try:
+        await application.process_update(update)
+    finally:
+        # The next step may land on another instance, so write before answering
+        with span("conversation_state.save"):
+            await application.update_persistence()
+            await persistence.flush()
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from tracing import TracedRequest, span
+
+logger = logging.getLogger(__name__)
+
+# Return one Bot API call in the webhook's HTTP response instead of sending it
+WEBHOOK_INLINE_REPLY = os.getenv("WEBHOOK_INLINE_REPLY", "").lower() in ("1", "true", "yes")
+# Seconds a call may be held; slower updates (e.g. a portal lookup) send it
+# normally so a button's loading spinner is not left running
+INLINE_REPLY_MAX_HOLD = float(os.getenv("WEBHOOK_INLINE_REPLY_MAX_HOLD", "1.0"))
+
+# Telegram does not report the outcome of a call made through the webhook
+# response, so only methods whose result the handlers ignore are eligible
+INLINE_METHODS = ("answerCallbackQuery", "sendMessage", "editMessageText")
+# Calls that may run after later outbound calls without changing what the
+# user sees; any other held call is sent before a later call overtakes it
+ORDER_FREE_METHODS = ("answerCallbackQuery",)
+
+_current_slot = contextvars.ContextVar("inline_reply_slot", default=None)
+
+
+class InlineReplyStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.inlined = {}
+        self.flushed = 0
+        self.expired = 0
+        self.flush_errors = 0
+
+    def record(self, method=None, flushed=False, expired=False, flush_error=False, update=False):
+        with self._lock:
+            self.updates += int(update)
+            if method:
+                self.inlined[method] = self.inlined.get(method, 0) + 1
+            self.flushed += int(flushed)
+            self.expired += int(expired)
+            self.flush_errors += int(flush_error)
+
+    def stats(self):
+        inlined = sum(self.inlined.values())
+        return {
+            "enabled": WEBHOOK_INLINE_REPLY,
+            "updates": self.updates,
+            "inlined": inlined,
+            "inlined_by_method": dict(self.inlined),
+            "inline_ratio": round(inlined / self.updates, 3) if self.updates else 0.0,
+            "flushed": self.flushed,
+            "expired": self.expired,
+            "flush_errors": self.flush_errors,
+        }
+
+
+inline_reply_stats = InlineReplyStats()
+
+
+class InlineReplySlot:
+    """The one Bot API call an update may hand back in the webhook response."""
+
+    def __init__(self):
+        self.open = True
+        # Tasks started while processing (e.g. a broadcast) copy the context,
+        # but only the update's own task may use the slot
+        self.task = asyncio.current_task()
+        self.method = None
+        self.url = None
+        self.request_data = None
+        self.request = None
+        self._timer = None
+
+    def hold(self, request, url, method, request_data):
+        self.request, self.url, self.method, self.request_data = request, url, method, request_data
+        if INLINE_REPLY_MAX_HOLD > 0:
+            self._timer = asyncio.get_running_loop().call_later(INLINE_REPLY_MAX_HOLD, self._expire)
+
+    def _expire(self):
+        if self.open and self.method is not None:
+            inline_reply_stats.record(expired=True)
+            asyncio.ensure_future(self._send(*self._detach()))
+
+    def _release(self):
+        self.method = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _detach(self):
+        # Clear the slot before awaiting anything so a call is never sent twice
+        call = (self.request, self.url, self.request_data)
+        self._release()
+        return call
+
+    async def flush(self):
+        """Send the held call as a normal outbound request."""
+        await self._send(*self._detach())
+
+    @staticmethod
+    async def _send(request, url, request_data):
+        try:
+            await request.send(url, request_data)
+            inline_reply_stats.record(flushed=True)
+        except Exception as e:
+            # The handler that made this call has already moved on
+            inline_reply_stats.record(flush_error=True)
+            logger.error(f"Sending held Bot API call to {url.rsplit('/', 1)[-1]} failed: {e}")
+
+    def take(self):
+        """Close the slot and return the webhook response body for the held call, if any."""
+        self.open = False
+        if self.method is None:
+            return None
+        inline_reply_stats.record(method=self.method)
+        reply = {"method": self.method}
+        reply.update(self.request_data.parameters)
+        self._release()
+        return reply
+
+
+def _synthetic_result(method, parameters):
+    """What the Bot API would have answered, as far as the handlers can tell."""
+    if method == "sendMessage":
+        return {
+            "message_id": 0,
+            "date": int(time.time()),
+            "chat": {"id": parameters.get("chat_id"), "type": "private"},
+            "text": parameters.get("text", ""),
+        }
+    return True
+
+
+class InlineReplyRequest(TracedRequest):
+    """HTTPXRequest that holds back one eligible call while a slot is open.
+
+    The held call is returned in the webhook response by the caller of
+    ``inline_reply_scope``; every other call goes out as usual.
+    """
+
+    async def send(self, url, request_data, **timeouts):
+        return await super().post(url, request_data, **timeouts)
+
+    async def post(self, url, request_data=None, **timeouts):
+        slot = _current_slot.get()
+        if slot is None or not slot.open or slot.task is not asyncio.current_task():
+            return await self.send(url, request_data, **timeouts)
+
+        if slot.method is not None and slot.method not in ORDER_FREE_METHODS:
+            await slot.flush()
+
+        method = url.rsplit("/", 1)[-1]
+        if (slot.method is None and method in INLINE_METHODS
+                and request_data is not None and not request_data.contains_files):
+            slot.hold(self, url, method, request_data)
+            with span(f"telegram.{method}", inline=True):
+                return _synthetic_result(method, request_data.parameters)
+        return await self.send(url, request_data, **timeouts)
+
+
+@asynccontextmanager
+async def inline_reply_scope():
+    """Open a slot for the update processed inside the block.
+
+    Call ``slot.take()`` after the block for the webhook response body. If
+    processing raises, the held call is sent normally before re-raising.
+    """
+    slot = InlineReplySlot()
+    token = _current_slot.set(slot)
+    inline_reply_stats.record(update=True)
+    try:
+        yield slot
+    except BaseException:
+        slot.open = False
+        if slot.method is not None:
+            await slot.flush()
+        raise
+    finally:
+        _current_slot.reset(token)
@@ -0,0 +1,222 @@
+import functools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Mirror a total that another component already counts."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block, even when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", key, f'le="{_format_value(bound)}"', bucket_count))
+                samples.append((f"{self.name}_bucket", key, 'le="+Inf"', count))
+                samples.append((f"{self.name}_sum", key, None, round(total, 6)))
+                samples.append((f"{self.name}_count", key, None, count))
+        return samples
+
+
+def render():
+    """Return every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Metrics ---
+
+BOT_WORK_STAGE = Histogram(
+    "mitsbot_bot_work_stage_seconds",
+    "Time spent in each stage of a result lookup",
+    ["stage"],
+)
+SCRAPE_SECONDS = Histogram(
+    "mitsbot_scrape_seconds",
+    "Fetch and parse time of the results listing and exam timetable pages",
+    ["source", "phase"],
+)
+HANDLER_SECONDS = Histogram(
+    "mitsbot_handler_seconds",
+    "Telegram handler latency per command or conversation state",
+    ["handler"],
+)
+RESULT_LOOKUPS = Counter(
+    "mitsbot_result_lookups_total",
+    "Result lookups by outcome",
+    ["outcome"],
+)
+PORTAL_ERRORS = Counter(
+    "mitsbot_portal_errors_total",
+    "Errors talking to the results portal by kind",
+    ["kind"],
+)
+QUEUE_DEPTH = Gauge("mitsbot_queue_depth", "Items waiting in each internal queue", ["queue"])
+IN_FLIGHT = Gauge("mitsbot_in_flight", "Items currently being processed", ["component"])
+CACHE_HITS = Counter("mitsbot_cache_hits_total", "Cache hits by cache", ["cache"])
+CACHE_MISSES = Counter("mitsbot_cache_misses_total", "Cache misses by cache", ["cache"])
+CACHE_HIT_RATIO = Gauge("mitsbot_cache_hit_ratio", "Hit ratio since start by cache", ["cache"])
+PORTAL_CIRCUIT_OPEN = Gauge("mitsbot_portal_circuit_open", "1 while the portal circuit is open or half-open")
+PORTAL_CONCURRENCY = Gauge("mitsbot_portal_concurrency_limit", "Current adaptive concurrency limit for the portal")
+
+
+def timed_handler(callback, name=None):
+    """Wrap a handler callback so its latency is recorded under ``name`` and traced."""
+    label = name or callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with HANDLER_SECONDS.time(handler=label), span(f"handler.{label}"):
+            return await callback(update, context)
+    return wrapper
+
+
+def _record_cache(cache, hits, misses):
+    CACHE_HITS.set(hits, cache=cache)
+    CACHE_MISSES.set(misses, cache=cache)
+    total = hits + misses
+    CACHE_HIT_RATIO.set(round(hits / total, 4) if total else 0.0, cache=cache)
+
+
+def collect_runtime(update_processor=None):
+    """Copy queue depths, cache counters and portal state from their owners.
+
+    Only components this process has already loaded are read, so a scrape
+    never imports a scraper or opens a store. Blocking; run it in a worker
+    thread.
+    """
+    from portal_health import OPEN, HALF_OPEN, portal_health
+    from singleflight import singleflight_stats
+    from telegram_files import file_id_cache
+
+    result_jobs = sys.modules.get("result_jobs")
+    if result_jobs is not None and result_jobs._jobs is not None:
+        jobs = result_jobs._jobs.stats()
+        QUEUE_DEPTH.set(jobs["queued"], queue="result_jobs")
+        IN_FLIGHT.set(jobs["running"], component="result_jobs")
+    if update_processor is not None:
+        updates = update_processor.stats()
+        QUEUE_DEPTH.set(updates["queue_depth"], queue="updates")
+        IN_FLIGHT.set(updates["in_flight"], component="updates")
+    browser_pool = sys.modules.get("browser_pool")
+    if browser_pool is not None and browser_pool._pool is not None:
+        IN_FLIGHT.set(browser_pool._pool.stats()["in_use"], component="browser_pages")
+
+    result_store = sys.modules.get("result_store")
+    store = result_store._store if result_store is not None else None
+    if store:
+        _record_cache("result_store", store.hits, store.misses)
+    _record_cache("file_id", file_id_cache.hits, file_id_cache.misses)
+    exam_timetable = sys.modules.get("ExamTimeTable")
+    if exam_timetable is not None:
+        timetable = exam_timetable.timetable_index.stats()
+        _record_cache("timetable_etag", timetable["not_modified"], timetable["fetches"] - timetable["not_modified"])
+    for group, flight in singleflight_stats().items():
+        _record_cache(f"singleflight_{group}", flight["coalesced"], flight["calls"])
+
+    health = portal_health.stats()
+    PORTAL_CIRCUIT_OPEN.set(1 if health["state"] in (OPEN, HALF_OPEN) else 0)
+    PORTAL_CONCURRENCY.set(health["concurrency_limit"])
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Requests one host (results portal, mits.ac.in) may have in flight at once
+PORTAL_HOST_CONCURRENCY = int(os.getenv("PORTAL_HOST_CONCURRENCY", "4"))
+# Extra attempts after a connection error, timeout or 429/5xx answer
+PORTAL_RETRIES = int(os.getenv("PORTAL_RETRIES", "2"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 4.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_TIMEOUT = 20
+USER_AGENT = "Mozilla/5.0 (compatible; MITSResultsBot/1.0)"
+
+
+class _Host:
+    """Keep-alive client, concurrency cap and counters for one host."""
+
+    def __init__(self, concurrency, timeout):
+        self.loop = asyncio.get_running_loop()
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+
+class PortalClient:
+    """Asyncio HTTP client shared by the portal and timetable scrapers.
+
+    Each host gets one pooled keep-alive httpx.AsyncClient and a cap on
+    concurrent requests. Connection errors, timeouts and 429/5xx answers
+    are retried with exponential backoff and full jitter, so callers
+    retrying together do not hit a struggling server in lockstep.
+    """
+
+    def __init__(self, concurrency=None, retries=None, timeout=DEFAULT_TIMEOUT):
+        self.concurrency = concurrency or PORTAL_HOST_CONCURRENCY
+        self.retries = PORTAL_RETRIES if retries is None else retries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, url):
+        key = urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            stale = host = self._hosts.get(key)
+            # httpx clients are bound to the loop they were first used on
+            if host is None or host.loop is not loop:
+                host = self._hosts[key] = _Host(self.concurrency, self.timeout)
+            else:
+                stale = None
+        if stale is not None:
+            self._retire(stale)
+        return host
+
+    def _retire(self, host):
+        """Close the client of a host entry left behind by another event loop."""
+        if host.loop.is_closed():
+            # Nothing can run on a closed loop; its sockets are closed when
+            # the dropped transports are garbage collected
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(host.client.aclose(), host.loop)
+        except RuntimeError:
+            pass
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def get(self, url, headers=None, timeout=None):
+        """GET ``url`` with retries; returns the last httpx.Response.
+
+        Raises the last transport error if every attempt failed to connect.
+        """
+        host = self._host(url)
+        timeout = timeout or self.timeout
+        with span("portal.get", host=urlsplit(url).netloc) as current:
+            response = await self._get(host, url, headers, timeout, current)
+            if current:
+                current.set("status", response.status_code)
+            return response
+
+    async def _get(self, host, url, headers, timeout, current):
+        async with host.semaphore:
+            host.in_flight += 1
+            try:
+                for attempt in range(self.retries + 1):
+                    if current:
+                        current.set("attempts", attempt + 1)
+                    started = time.perf_counter()
+                    host.requests += 1
+                    try:
+                        response = await host.client.get(url, headers=headers, timeout=timeout)
+                    except httpx.TransportError as e:
+                        host.errors += 1
+                        if attempt >= self.retries:
+                            raise
+                        logger.warning(f"GET {url} failed ({type(e).__name__}), retrying")
+                    else:
+                        host.total_ms += (time.perf_counter() - started) * 1000
+                        if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                            return response
+                        host.errors += 1
+                        logger.warning(f"GET {url} returned {response.status_code}, retrying")
+                    host.retries += 1
+                    await asyncio.sleep(self._backoff(attempt))
+            finally:
+                host.in_flight -= 1
+
+    async def get_text(self, url, headers=None, timeout=None):
+        """GET ``url`` and return the body, raising for HTTP error statuses."""
+        response = await self.get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.text
+
+    async def aclose(self):
+        with self._lock:
+            hosts, self._hosts = list(self._hosts.values()), {}
+        for host in hosts:
+            await host.client.aclose()
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            key: {
+                "in_flight": host.in_flight,
+                "requests": host.requests,
+                "retries": host.retries,
+                "errors": host.errors,
+                "avg_ms": round(host.total_ms / max(1, host.requests - host.errors), 1),
+            }
+            for key, host in hosts.items()
+        }
+
+
+portal_client = PortalClient()
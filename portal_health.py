@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("PORTAL_MAX_CONCURRENCY", "8"))
+DEFAULT_LATENCY_TARGET = float(os.getenv("PORTAL_LATENCY_TARGET", "5"))
+DEFAULT_OPEN_SECONDS = float(os.getenv("PORTAL_OPEN_SECONDS", "30"))
+MAX_OPEN_SECONDS = 300
+# How long a caller may wait for a concurrency slot before failing fast
+ACQUIRE_TIMEOUT = 10
+WINDOW = 20
+MIN_SAMPLES = 5
+FAILURE_RATE = 0.5
+CONSECUTIVE_FAILURES = 5
+
+
+class PortalUnavailable(Exception):
+    """The circuit is open or the portal is saturated; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message, retry_after=0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _is_server_status(response):
+    return response is not None and (response.status_code >= 500 or response.status_code == 429)
+
+
+def is_portal_failure(error):
+    """Timeouts, connection errors, 5xx/429 answers and browser timeouts
+    count against the portal.
+
+    Other HTTP errors, such as a 404 for a result id that was never
+    published, mean the portal answered and say nothing about its health.
+    """
+    if isinstance(error, TimeoutError):
+        return True
+    # Only look at HTTP clients that are already loaded, so a cold start that
+    # imports this module does not pay for them
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(error, requests.RequestException):
+        if isinstance(error, requests.HTTPError):
+            return _is_server_status(error.response)
+        network = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+        return isinstance(error, network)
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.HTTPStatusError):
+        return _is_server_status(error.response)
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    return type(error).__module__.startswith("playwright") and type(error).__name__ in ("TimeoutError", "Error")
+
+
+class PortalHealth:
+    """Circuit breaker with AIMD concurrency control for the results portal.
+
+    Every portal call goes through call(), or acall() from async code.
+    Fast successes raise the concurrency limit by roughly one per window
+    of calls; slow responses and failures cut it multiplicatively. When
+    the recent failure rate or a run of consecutive failures crosses its
+    threshold the circuit opens and calls fail immediately with
+    PortalUnavailable. After the open period one probe call is let through
+    (half-open): success closes the circuit, failure opens it again for
+    twice as long.
+    """
+
+    def __init__(self, name="results_portal", max_limit=None, latency_target=None, open_seconds=None):
+        self.name = name
+        self.max_limit = max_limit or DEFAULT_MAX_CONCURRENCY
+        self.latency_target = latency_target or DEFAULT_LATENCY_TARGET
+        self.base_open_seconds = open_seconds or DEFAULT_OPEN_SECONDS
+
+        self._cond = threading.Condition()
+        self.state = CLOSED
+        self.limit = float(max(1, self.max_limit // 2))
+        self.in_flight = 0
+        self._outcomes = deque(maxlen=WINDOW)
+        self._consecutive_failures = 0
+        self._open_seconds = self.base_open_seconds
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._latency_ewma = None
+        self._last_decrease = 0.0
+
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    # --- Admission ---
+
+    def _try_admit(self, deadline):
+        """Take a slot: True for a half-open probe, False for a normal call,
+        None if the caller should wait for one. Call with the lock held."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self._open_until:
+                self.rejected += 1
+                raise PortalUnavailable("Results portal is down", retry_after=math.ceil(self._open_until - now))
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"{self.name}: circuit half-open, probing")
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise PortalUnavailable("Results portal is recovering", retry_after=5)
+            self._probe_in_flight = True
+            self.in_flight += 1
+            return True
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return False
+        if deadline - now <= 0:
+            self.rejected += 1
+            raise PortalUnavailable("Results portal is busy", retry_after=ACQUIRE_TIMEOUT)
+        return None
+
+    def _admit(self):
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+        with self._cond:
+            while True:
+                probe = self._try_admit(deadline)
+                if probe is not None:
+                    return probe
+                self._cond.wait(deadline - time.monotonic())
+
+    async def _admit_async(self):
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+        while True:
+            with self._cond:
+                probe = self._try_admit(deadline)
+            if probe is not None:
+                return probe
+            # Slots are freed by threads as well as tasks, so poll instead of
+            # waiting on the condition from the event loop
+            await asyncio.sleep(0.05)
+
+    def call(self, fn, *args, latency_feedback=True, **kwargs):
+        """Run a portal call under the circuit breaker and concurrency limit.
+
+        With ``latency_feedback=False`` the call's duration does not steer
+        the limit, for calls such as browser sessions that are slow by design.
+        """
+        probe = self._admit()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_portal_failure(e):
+                self._record(False, time.monotonic() - started, probe, latency_feedback)
+            else:
+                # Parse errors or 'not found' pages mean the portal answered
+                self._record(True, time.monotonic() - started, probe, latency_feedback)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self._record(True, time.monotonic() - started, probe, latency_feedback)
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        """Await a portal coroutine function under the breaker and concurrency limit."""
+        probe = await self._admit_async()
+        started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self._record(not is_portal_failure(e), time.monotonic() - started, probe)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self._record(True, time.monotonic() - started, probe)
+        return result
+
+    def _release(self, probe):
+        with self._cond:
+            self.in_flight -= 1
+            if probe:
+                self._probe_in_flight = False
+            self._cond.notify_all()
+
+    # --- Feedback ---
+
+    def _record(self, ok, latency, probe, latency_feedback=True):
+        with self._cond:
+            self.in_flight -= 1
+            self._outcomes.append(ok)
+            if latency_feedback:
+                self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+            now = time.monotonic()
+
+            if ok:
+                self.successes += 1
+                self._consecutive_failures = 0
+                if latency_feedback and latency <= self.latency_target:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                elif latency_feedback and now - self._last_decrease > latency:
+                    self.limit = max(1.0, self.limit * 0.7)
+                    self._last_decrease = now
+            else:
+                self.failures += 1
+                self._consecutive_failures += 1
+                if now - self._last_decrease > 1:
+                    self.limit = max(1.0, self.limit * 0.5)
+                    self._last_decrease = now
+
+            if probe:
+                self._probe_in_flight = False
+                if ok:
+                    self.state = CLOSED
+                    self._open_seconds = self.base_open_seconds
+                    self._outcomes.clear()
+                    logger.info(f"{self.name}: probe succeeded, circuit closed")
+                else:
+                    self._open(now, min(MAX_OPEN_SECONDS, self._open_seconds * 2))
+            elif self.state == CLOSED and not ok and self._should_open():
+                self._open(now, self._open_seconds)
+            self._cond.notify_all()
+
+    def _should_open(self):
+        if self._consecutive_failures >= CONSECUTIVE_FAILURES:
+            return True
+        if len(self._outcomes) < MIN_SAMPLES:
+            return False
+        return self._outcomes.count(False) / len(self._outcomes) >= FAILURE_RATE
+
+    def _open(self, now, seconds):
+        self.state = OPEN
+        self._open_seconds = seconds
+        self._open_until = now + seconds
+        self.opened += 1
+        logger.warning(f"{self.name}: circuit open for {seconds:.0f}s")
+
+    # --- Reporting ---
+
+    def retry_after(self):
+        if self.state != OPEN:
+            return 0
+        return max(0, math.ceil(self._open_until - time.monotonic()))
+
+    def stats(self):
+        with self._cond:
+            outcomes = list(self._outcomes)
+        return {
+            "state": self.state,
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "latency_ewma_s": round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+            "error_rate": round(outcomes.count(False) / len(outcomes), 3) if outcomes else 0.0,
+            "retry_after": self.retry_after(),
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+portal_health = PortalHealth()
+
+
+def unavailable_message(error):
+    """User-facing explanation for a PortalUnavailable error."""
+    wait = f" in about {error.retry_after} seconds" if error.retry_after else " in a little while"
+    return (f"⚠️ <b>Results portal unavailable</b>\n\n"
+            f"The college results server is not responding right now ({error}).\n\n"
+            f"💡 <i>Please try again{wait}.</i>")
@@ -0,0 +1,287 @@
+import html
+import struct
+import zlib
+
+# Classic 5x8 column font for ASCII 32-126: five columns per glyph, bit 0 is
+# the top row and bit 7 the descender row.
+_FONT = bytes.fromhex(
+    "0000000000" "00005f0000" "0007000700" "147f147f14" "242a7f2a12" "2313086462"
+    "3649562050" "0008070300" "001c224100" "0041221c00" "2a1c7f1c2a" "08083e0808"
+    "0080703000" "0808080808" "0000606000" "2010080402" "3e5149453e" "00427f4000"
+    "7249494946" "2141494d33" "1814127f10" "2745454539" "3c4a494931" "4121110907"
+    "3649494936" "464949291e" "0000140000" "0040340000" "0008142241" "1414141414"
+    "0041221408" "0201590906" "3e415d594e" "7c1211127c" "7f49494936" "3e41414122"
+    "7f4141413e" "7f49494941" "7f09090901" "3e41415173" "7f0808087f" "00417f4100"
+    "2040413f01" "7f08142241" "7f40404040" "7f021c027f" "7f0408107f" "3e4141413e"
+    "7f09090906" "3e4151215e" "7f09192946" "2649494932" "03017f0103" "3f4040403f"
+    "1f2040201f" "3f4038403f" "6314081463" "0304780403" "6159494d43" "007f414141"
+    "0204081020" "004141417f" "0402010204" "4040404040" "0003070800" "2054547840"
+    "7f28444438" "3844444428" "384444287f" "3854545418" "00087e0902" "18a4a49c78"
+    "7f08040478" "00447d4000" "2040403d00" "7f10284400" "00417f4000" "7c04780478"
+    "7c08040478" "3844444438" "fc18242418" "18242418fc" "7c08040408" "4854545424"
+    "04043f4424" "3c4040207c" "1c2040201c" "3c4030403c" "4428102844" "4c9090907c"
+    "4464544c44" "0008364100" "0000770000" "0041360800" "0201020402"
+)
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 8
+CELL_WIDTH = GLYPH_WIDTH + 1
+
+# Palette indices
+WHITE, INK, ACCENT, STRIPE, FAIL, MUTED = range(6)
+PALETTE = [
+    (255, 255, 255),
+    (33, 37, 41),
+    (25, 84, 166),
+    (236, 240, 245),
+    (200, 35, 51),
+    (108, 117, 125),
+]
+
+SCALE = 2
+MARGIN = 16
+LINE_HEIGHT = (GLYPH_HEIGHT + 2) * SCALE
+CARD_COLUMNS = 60
+FAIL_GRADES = ("F", "AB", "ABSENT", "FAIL")
+
+
+class Canvas:
+    """Palette-indexed bitmap with just enough drawing for a result card."""
+
+    def __init__(self, width, height, background=WHITE):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray([background]) * (width * height)
+
+    def fill_rect(self, x, y, w, h, color):
+        x0, x1 = max(0, x), min(self.width, x + w)
+        if x1 <= x0:
+            return
+        run = bytes([color]) * (x1 - x0)
+        for row in range(max(0, y), min(self.height, y + h)):
+            start = row * self.width
+            self.pixels[start + x0:start + x1] = run
+
+    def text(self, x, y, text, color=INK, scale=SCALE, bold=False):
+        """Draw ``text`` with its top-left corner at (x, y); returns the end x."""
+        for char in text:
+            code = ord(char)
+            if not 32 <= code <= 126:
+                code = ord("?")
+            offset = (code - 32) * GLYPH_WIDTH
+            for col in range(GLYPH_WIDTH):
+                bits = _FONT[offset + col]
+                for row in range(GLYPH_HEIGHT):
+                    if bits >> row & 1:
+                        self.fill_rect(x + col * scale, y + row * scale, scale + (1 if bold else 0), scale, color)
+            x += CELL_WIDTH * scale
+        return x
+
+    def to_png(self):
+        raw = bytearray()
+        for row in range(self.height):
+            raw.append(0)  # filter type: none
+            raw += self.pixels[row * self.width:(row + 1) * self.width]
+        return b"".join([
+            b"\x89PNG\r\n\x1a\n",
+            _chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 3, 0, 0, 0)),
+            _chunk(b"PLTE", b"".join(bytes(color) for color in PALETTE)),
+            _chunk(b"IDAT", zlib.compress(bytes(raw), 9)),
+            _chunk(b"IEND", b""),
+        ])
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def _fit(text, width):
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= width else text[:width - 2] + ".."
+
+
+def _is_fail(subject):
+    return (subject.get("grade") or "").strip().upper() in FAIL_GRADES or \
+        (subject.get("result") or "").strip().upper() in ("F", "FAIL")
+
+
+def failed_subjects(result):
+    """Subjects of a StudentResult with a failing grade or result."""
+    return [subject for subject in result.subjects or [] if _is_fail(subject)]
+
+
+def render_result_card(result, columns=CARD_COLUMNS):
+    """Draw a StudentResult as a compact PNG result card and return the bytes.
+
+    The card has a header with the result id, the student details, one
+    striped row per subject (failed subjects in red) and the SGPA.
+    """
+    char_width = CELL_WIDTH * SCALE
+    width = MARGIN * 2 + columns * char_width
+    subjects = result.subjects or []
+    show_credits = any(subject.get("credits") for subject in subjects)
+
+    # Column layout in characters: code | subject | grade | credits
+    code_width = min(10, max([len(subject.get("code") or "") for subject in subjects] + [4]))
+    grade_width = 6
+    credits_width = 7 if show_credits else 0
+    name_width = columns - code_width - grade_width - credits_width - 2
+
+    header_lines = 2
+    detail_lines = 3
+    # Header, details, table header, subjects, rule and SGPA line
+    height = MARGIN * 3 + (header_lines + detail_lines + len(subjects) + 3) * LINE_HEIGHT
+    canvas = Canvas(width, height)
+    pad = (LINE_HEIGHT - GLYPH_HEIGHT * SCALE) // 2
+
+    # Header band
+    canvas.fill_rect(0, 0, width, MARGIN + header_lines * LINE_HEIGHT, ACCENT)
+    y = MARGIN // 2 + pad
+    canvas.text(MARGIN, y, "MITS RESULTS", WHITE, bold=True)
+    canvas.text(MARGIN, y + LINE_HEIGHT, _fit(result.result_id or "", columns), WHITE)
+
+    y = MARGIN + header_lines * LINE_HEIGHT + MARGIN // 2
+    for label, value in (("Name", result.name or "N/A"), ("Roll", result.roll),
+                         ("Branch", result.department or "")):
+        x = canvas.text(MARGIN, y + pad, f"{label}:", MUTED)
+        canvas.text(x + char_width, y + pad, _fit(value, columns - len(label) - 2), INK, bold=label == "Name")
+        y += LINE_HEIGHT
+
+    # Subject table
+    y += MARGIN // 2
+    columns_x = [MARGIN]
+    for span in (code_width + 1, name_width + 1, grade_width, credits_width):
+        columns_x.append(columns_x[-1] + span * char_width)
+    canvas.fill_rect(MARGIN - 4, y, width - 2 * MARGIN + 8, LINE_HEIGHT, INK)
+    canvas.text(columns_x[0], y + pad, "Code", WHITE, bold=True)
+    canvas.text(columns_x[1], y + pad, "Subject", WHITE, bold=True)
+    canvas.text(columns_x[2], y + pad, "Grade", WHITE, bold=True)
+    if show_credits:
+        canvas.text(columns_x[3], y + pad, "Credits", WHITE, bold=True)
+    y += LINE_HEIGHT
+    for index, subject in enumerate(subjects):
+        if index % 2:
+            canvas.fill_rect(MARGIN - 4, y, width - 2 * MARGIN + 8, LINE_HEIGHT, STRIPE)
+        color = FAIL if _is_fail(subject) else INK
+        canvas.text(columns_x[0], y + pad, _fit(subject.get("code"), code_width), MUTED)
+        canvas.text(columns_x[1], y + pad, _fit(subject.get("name") or subject.get("code"), name_width), color)
+        canvas.text(columns_x[2], y + pad, _fit(subject.get("grade"), grade_width), color, bold=True)
+        if show_credits:
+            canvas.text(columns_x[3], y + pad, _fit(subject.get("credits"), credits_width), INK)
+        y += LINE_HEIGHT
+
+    y += LINE_HEIGHT // 2
+    canvas.fill_rect(MARGIN - 4, y, width - 2 * MARGIN + 8, 2, MUTED)
+    y += LINE_HEIGHT // 2
+    x = canvas.text(MARGIN, y + pad, "SGPA:", MUTED)
+    canvas.text(x + char_width, y + pad, result.sgpa or "N/A", ACCENT, bold=True)
+    return canvas.to_png()
+
+
+def render_cgpa_card(records, cgpa, regulation="", roll="", department="", columns=CARD_COLUMNS):
+    """Draw every semester of a /cgpa lookup and the CGPA as one PNG card.
+
+    ``records`` are cgpa.fetch_semesters() records. Semesters with a failed
+    subject are drawn in red, ones that could not be fetched muted.
+    """
+    char_width = CELL_WIDTH * SCALE
+    width = MARGIN * 2 + columns * char_width
+    found = [record["result"] for record in records if record["status"] == "ok"]
+    name = next((result.name for result in found if result.name), "N/A")
+    credits = {}
+    for record in records:
+        if record["status"] == "ok":
+            total = semester_credits(record["result"])
+            credits[(record["year"], record["sem"])] = f"{total:g}" if total else ""
+    show_credits = any(credits.values())
+
+    # Column layout in characters: semester | exam | credits | SGPA
+    sem_width = 9
+    sgpa_width = 6
+    credits_width = 8 if show_credits else 0
+    exam_width = columns - sem_width - credits_width - sgpa_width - 1
+
+    header_lines = 2
+    detail_lines = 3
+    height = MARGIN * 3 + (header_lines + detail_lines + len(records) + 3) * LINE_HEIGHT
+    canvas = Canvas(width, height)
+    pad = (LINE_HEIGHT - GLYPH_HEIGHT * SCALE) // 2
+
+    canvas.fill_rect(0, 0, width, MARGIN + header_lines * LINE_HEIGHT, ACCENT)
+    y = MARGIN // 2 + pad
+    canvas.text(MARGIN, y, "MITS CGPA", WHITE, bold=True)
+    canvas.text(MARGIN, y + LINE_HEIGHT, _fit(f"{regulation} - all semesters", columns), WHITE)
+
+    y = MARGIN + header_lines * LINE_HEIGHT + MARGIN // 2
+    for label, value in (("Name", name), ("Roll", roll), ("Branch", department)):
+        x = canvas.text(MARGIN, y + pad, f"{label}:", MUTED)
+        canvas.text(x + char_width, y + pad, _fit(value, columns - len(label) - 2), INK, bold=label == "Name")
+        y += LINE_HEIGHT
+
+    y += MARGIN // 2
+    columns_x = [MARGIN]
+    for span in (sem_width, exam_width + 1, credits_width):
+        columns_x.append(columns_x[-1] + span * char_width)
+    canvas.fill_rect(MARGIN - 4, y, width - 2 * MARGIN + 8, LINE_HEIGHT, INK)
+    canvas.text(columns_x[0], y + pad, "Semester", WHITE, bold=True)
+    canvas.text(columns_x[1], y + pad, "Exam", WHITE, bold=True)
+    if show_credits:
+        canvas.text(columns_x[2], y + pad, "Credits", WHITE, bold=True)
+    canvas.text(columns_x[3], y + pad, "SGPA", WHITE, bold=True)
+    y += LINE_HEIGHT
+    for index, record in enumerate(records):
+        if index % 2:
+            canvas.fill_rect(MARGIN - 4, y, width - 2 * MARGIN + 8, LINE_HEIGHT, STRIPE)
+        canvas.text(columns_x[0], y + pad, f"{record['year']}-{record['sem']}", MUTED)
+        if record["status"] == "ok":
+            result = record["result"]
+            color = FAIL if failed_subjects(result) else INK
+            canvas.text(columns_x[1], y + pad, _fit(result.result_id, exam_width), color)
+            if show_credits:
+                canvas.text(columns_x[2], y + pad, credits[(record["year"], record["sem"])], INK)
+            canvas.text(columns_x[3], y + pad, _fit(result.sgpa or "N/A", sgpa_width), color, bold=True)
+        else:
+            canvas.text(columns_x[1], y + pad, "could not be fetched", MUTED)
+        y += LINE_HEIGHT
+
+    y += LINE_HEIGHT // 2
+    canvas.fill_rect(MARGIN - 4, y, width - 2 * MARGIN + 8, 2, MUTED)
+    y += LINE_HEIGHT // 2
+    x = canvas.text(MARGIN, y + pad, "CGPA:", MUTED)
+    canvas.text(x + char_width, y + pad, f"{cgpa:.2f}" if cgpa is not None else "N/A", ACCENT, bold=True)
+    return canvas.to_png()
+
+
+def parse_number(value):
+    """Parse a grade point or credit cell, or return None when it is not a number."""
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def semester_credits(result):
+    """Sum of the subjects' credits, or None when any subject lacks them.
+
+    A partial sum would under-weight the semester, so the card leaves the
+    cell blank and the CGPA falls back to a plain mean instead.
+    """
+    credits = [parse_number(subject.get("credits")) for subject in result.subjects]
+    if not credits or any(credit is None for credit in credits):
+        return None
+    return sum(credits)
+
+
+def format_result_html(result):
+    """Format a StudentResult as a Telegram HTML message."""
+    lines = ["✅ <b>Results Found!</b>", ""]
+    lines.append(f"🎓 <b>Student:</b> {html.escape(result.name or 'N/A')}")
+    lines.append(f"🆔 <b>Roll Number:</b> <code>{html.escape(result.roll)}</code>")
+    if result.subjects:
+        lines.append("")
+        lines.append("📚 <b>Subjects:</b>")
+        for subject in result.subjects:
+            label = subject.get('name') or subject.get('code') or '-'
+            lines.append(f"├ {html.escape(label)}: <b>{html.escape(subject.get('grade', ''))}</b>")
+    lines.append("")
+    lines.append(f"📊 <b>SGPA:</b> {html.escape(result.sgpa or 'N/A')}")
+    return "\n".join(lines)
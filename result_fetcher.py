@@ -0,0 +1,273 @@
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PORTAL_BASE = os.getenv("RESULTS_PORTAL_BASE", "http://125.16.54.154/mitsresults/resultug")
+FORM_CACHE_TTL = 3600
+REQUEST_TIMEOUT = 20
+
+
+class _SharedAdapter(HTTPAdapter):
+    """HTTPAdapter that outlives the sessions it is mounted on.
+
+    Session.close() closes its adapters, which would clear the shared pool
+    after every lookup.
+    """
+
+    def close(self):
+        pass
+
+
+# One connection pool shared by every lookup; each lookup still gets its own
+# cookie jar so concurrent students never share a portal session.
+_adapter = _SharedAdapter(pool_connections=4, pool_maxsize=16)
+
+_form_cache = {}
+_form_cache_lock = threading.Lock()
+
+
+class ResultNotFound(Exception):
+    """The portal answered with its 'not found' / 'invalid' page."""
+
+
+class PortalLayoutError(Exception):
+    """The form or results page did not look like we expect."""
+
+
+@dataclass
+class StudentResult:
+    roll: str
+    department: str
+    name: str = ""
+    sgpa: str = ""
+    subjects: list = field(default_factory=list)
+    result_id: str = ""
+    url: str = ""
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def default_result_id(regulation, year, semester, year_of_exam=None):
+    """Build the regular-exam result id used when no listing link is known."""
+    year_of_exam = year_of_exam or time.localtime().tm_year
+    return f"B.Tech-{year}-{semester}-{regulation}-Regular-{year_of_exam}"
+
+
+def result_form_url(result_id):
+    return f"{PORTAL_BASE}/myresultug?resultid={result_id}"
+
+
+def result_id_from_url(url):
+    """Return the resultid query parameter of a results form URL."""
+    return parse_qs(urlparse(url).query).get("resultid", [""])[0]
+
+
+def is_not_found(text):
+    """Mirror of the check bot_work applies to the rendered page body."""
+    text = text.lower()
+    return 'not found' in text or 'invalid' in text
+
+
+def new_session():
+    """Return a requests session backed by the shared connection pool."""
+    session = requests.Session()
+    session.mount('http://', _adapter)
+    session.mount('https://', _adapter)
+    return session
+
+
+def _cell_text(cell):
+    return " ".join(cell.get_text(" ", strip=True).split())
+
+
+def parse_form(page_html, url):
+    """Extract the results form: action, method, hidden fields and departments."""
+    soup = BeautifulSoup(page_html, "lxml")
+    select = soup.find('select', attrs={'name': 'department1'})
+    form = select.find_parent('form') if select else None
+    if not form:
+        raise PortalLayoutError("Results form with department1 not found")
+
+    fields = {}
+    for inp in form.find_all('input'):
+        name = inp.get('name')
+        if not name or name in ('usn', 'dateofbirth'):
+            continue
+        input_type = (inp.get('type') or 'text').lower()
+        if input_type in ('hidden', 'submit'):
+            fields[name] = inp.get('value', '')
+
+    departments = [opt.get('value') for opt in select.find_all('option') if opt.get('value')]
+    return {
+        "action": urljoin(url, form.get('action') or url),
+        "method": (form.get('method') or 'post').lower(),
+        "fields": fields,
+        "departments": departments,
+        "fetched_at": time.time(),
+    }
+
+
+def _header_columns(cells):
+    """Map a subjects header row to column indexes, or None if it is not one."""
+    labels = [c.lower() for c in cells]
+    if not any('grade' in l for l in labels):
+        return None
+    if not any(k in l for l in labels for k in ('subject', 'course', 'code', 'title')):
+        return None
+    columns = {}
+    for i, label in enumerate(labels):
+        if 'code' in label:
+            columns.setdefault('code', i)
+        elif any(k in label for k in ('subject', 'course', 'title', 'name')):
+            columns.setdefault('name', i)
+        elif 'grade' in label and 'point' not in label:
+            columns.setdefault('grade', i)
+        elif 'credit' in label:
+            columns.setdefault('credits', i)
+        elif 'result' in label or 'status' in label:
+            columns.setdefault('result', i)
+    return columns if 'grade' in columns else None
+
+
+def parse_result_page(page_html, roll="", department=""):
+    """Parse a results page into a StudentResult.
+
+    Raises ResultNotFound for the portal's error page and PortalLayoutError
+    when no student name or subject rows could be found.
+    """
+    soup = BeautifulSoup(page_html, "lxml")
+    body = soup.body or soup
+    if soup.find('table') is None and is_not_found(body.get_text(" ")):
+        raise ResultNotFound(roll)
+
+    result = StudentResult(roll=roll, department=department)
+    columns = None
+    for row in soup.find_all('tr'):
+        cells = [_cell_text(c) for c in row.find_all(['td', 'th'])]
+        if not cells:
+            continue
+
+        header = _header_columns(cells)
+        if header:
+            columns = header
+            continue
+
+        if columns and len(cells) > max(columns.values()):
+            subject = {key: cells[idx] for key, idx in columns.items()}
+            if subject.get('grade'):
+                result.subjects.append(subject)
+                continue
+
+        # Label/value pairs such as "Name | John" or "SGPA | 8.2"
+        for label, value in zip(cells, cells[1:]):
+            key = label.lower().rstrip(' :')
+            if not result.name and key in ('name', 'student name', 'name of the student'):
+                result.name = value
+            elif not result.sgpa and key == 'sgpa':
+                result.sgpa = value
+
+    if not result.sgpa:
+        match = re.search(r'SGPA\s*[:\-]?\s*(\d+(?:\.\d+)?)', body.get_text(" "))
+        if match:
+            result.sgpa = match.group(1)
+
+    if not result.name and not result.subjects:
+        if is_not_found(body.get_text(" ")):
+            raise ResultNotFound(roll)
+        raise PortalLayoutError("No student details found in results page")
+    return result
+
+
+def _get_form(session, url, refresh=False):
+    with _form_cache_lock:
+        cached = _form_cache.get(url)
+    if cached and not refresh and time.time() - cached["fetched_at"] < FORM_CACHE_TTL:
+        return cached
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    form = parse_form(response.text, response.url)
+    with _form_cache_lock:
+        _form_cache[url] = form
+    return form
+
+
+def get_form_metadata(url):
+    """Return the (cached) form metadata for a results form URL."""
+    with new_session() as session:
+        return _get_form(session, url)
+
+
+def refresh_form_metadata(url):
+    """Re-read a results form, replacing the cached copy."""
+    with new_session() as session:
+        return _get_form(session, url, refresh=True)
+
+
+def export_forms():
+    """Return the cached form metadata by URL for a snapshot."""
+    with _form_cache_lock:
+        return {url: dict(form) for url, form in _form_cache.items()}
+
+
+def restore_forms(forms):
+    """Seed the form cache from a snapshot; returns how many forms were added.
+
+    Restored forms are used right away and marked so they get re-read;
+    fetch_result already re-reads a form whose layout no longer matches.
+    """
+    restored = 0
+    now = time.time()
+    with _form_cache_lock:
+        for url, form in forms.items():
+            if url.startswith(PORTAL_BASE) and url not in _form_cache:
+                _form_cache[url] = dict(form, fetched_at=now, restored=True)
+                restored += 1
+    return restored
+
+
+def fetch_result(portal_url, roll, dob, department_code):
+    """Look up one student's result over plain HTTP.
+
+    Posts the same department1/usn/dateofbirth form bot_work fills in the
+    browser. The form layout is cached per URL, so a warm lookup is a
+    single POST.
+    """
+    with new_session() as session:
+        for attempt in range(2):
+            # A cached form may carry stale hidden fields; re-read it once on failure
+            form = _get_form(session, portal_url, refresh=attempt > 0)
+            payload = dict(form["fields"])
+            payload.update({
+                "department1": department_code,
+                "usn": roll,
+                "dateofbirth": dob,
+            })
+            if form["method"] == "get":
+                response = session.get(form["action"], params=payload, timeout=REQUEST_TIMEOUT)
+            else:
+                response = session.post(form["action"], data=payload, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            try:
+                result = parse_result_page(response.text, roll=roll, department=department_code)
+            except PortalLayoutError:
+                if attempt == 0:
+                    continue
+                raise
+            result.url = response.url
+            result.result_id = result_id_from_url(portal_url)
+            return result
@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import BOT_WORK_STAGE
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv("RESULT_JOB_CONCURRENCY", "2"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("RESULT_JOB_QUEUE_SIZE", "20"))
+DEFAULT_JOB_TIMEOUT = float(os.getenv("RESULT_JOB_TIMEOUT", "40"))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class ResultJobQueue:
+    """Bounded async queue that runs blocking result jobs in worker threads.
+
+    Handlers await run() and the event loop keeps serving other updates while
+    the job executes. At most ``concurrency`` jobs run at once; up to
+    ``max_queue`` more may wait, after which submissions are rejected with
+    QueueFullError so callers can tell the user to retry.
+
+    A job's timeout starts when a worker picks it up, and a job that exceeds
+    it is reported as asyncio.TimeoutError to the caller. The worker thread
+    cannot be interrupted, so its slot stays taken until the job returns;
+    the pooled browser page it uses has its own navigation timeouts. Jobs
+    whose caller stopped waiting before they started are skipped.
+    """
+
+    def __init__(self, worker_fn, concurrency=None, max_queue=None, job_timeout=None):
+        self.worker_fn = worker_fn
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.max_queue = max_queue or DEFAULT_QUEUE_SIZE
+        self.job_timeout = job_timeout or DEFAULT_JOB_TIMEOUT
+
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="result-job")
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._running = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First use, or the previous loop went away (e.g. a fresh serverless loop)
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def submit(self, *args, timeout=None, fn=None):
+        """Queue a job and return an asyncio.Future for its result.
+
+        The job calls ``fn(*args)``, or the queue's worker_fn when no fn is
+        given, so other blocking lookups share the same slots. Cancelling the future drops the job if it has not started yet.
+        Raises QueueFullError when the queue is at capacity.
+        """
+        self._ensure_workers()
+        future = self._loop.create_future()
+        # The job runs in the submitter's context, so it joins the update's trace
+        ctx = contextvars.copy_context()
+        try:
+            self._queue.put_nowait((future, fn or self.worker_fn, args, timeout or self.job_timeout, time.monotonic(), ctx))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"Result queue is full ({self.max_queue} waiting)")
+        self.submitted += 1
+        return future
+
+    async def run(self, *args, timeout=None, fn=None):
+        """Submit a job and wait for its result."""
+        return await self.submit(*args, timeout=timeout, fn=fn)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            future, fn, args, timeout, queued_at, ctx = await self._queue.get()
+            try:
+                if future.cancelled():
+                    self.cancelled += 1
+                    continue
+                wait = time.monotonic() - queued_at
+                BOT_WORK_STAGE.observe(wait, stage="queue_wait")
+
+                self._running += 1
+                call = loop.run_in_executor(self._executor, ctx.run, self._call, wait, fn, args)
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(call), timeout)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    if not future.done():
+                        future.set_exception(asyncio.TimeoutError())
+                    # Hold this slot until the thread is free, so the next job's
+                    # budget does not run out while it waits for one
+                    await asyncio.gather(call, return_exceptions=True)
+                except Exception as e:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if future.done():
+                        self.cancelled += 1
+                    else:
+                        self.completed += 1
+                        future.set_result(result)
+                finally:
+                    self._running -= 1
+            finally:
+                self._queue.task_done()
+
+    def _call(self, wait, fn, args):
+        with span("result_job", queue_wait_ms=round(wait * 1000, 1)):
+            return fn(*args)
+
+    def stats(self):
+        """Return queue depth and job counters for monitoring."""
+        return {
+            "concurrency": self.concurrency,
+            "running": self._running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+        }
+
+
+_jobs = None
+
+
+def get_result_jobs():
+    """Return the process-wide queue that runs bot_work and other result jobs."""
+    global _jobs
+    if _jobs is None:
+        from resutbot import bot_work
+        _jobs = ResultJobQueue(bot_work)
+    return _jobs
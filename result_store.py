@@ -0,0 +1,164 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+from result_fetcher import StudentResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(tempfile.gettempdir(), "mitsbot_results.sqlite3"))
+DEFAULT_TTL = int(os.getenv("RESULT_STORE_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_ROWS = int(os.getenv("RESULT_STORE_MAX_ROWS", "5000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    result_id TEXT NOT NULL,
+    department TEXT NOT NULL,
+    roll TEXT NOT NULL,
+    dob_hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (result_id, department, roll)
+);
+CREATE INDEX IF NOT EXISTS idx_results_roll ON results (roll, dob_hash);
+CREATE INDEX IF NOT EXISTS idx_results_fetched ON results (fetched_at);
+CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at);
+"""
+
+
+class ResultStore:
+    """SQLite store of fetched results so repeat lookups skip the portal.
+
+    Rows are keyed by (result_id, department, roll). The date of birth is
+    never written to disk: only an HMAC of it is kept and a lookup must
+    present a matching DOB. The HMAC key comes from RESULT_STORE_SECRET, or
+    a random key generated once and kept in the database.
+
+    Entries older than ``ttl`` seconds are ignored and purged; beyond
+    ``max_rows`` the least recently read rows are evicted.
+    """
+
+    def __init__(self, path=None, ttl=None, max_rows=None, secret=None):
+        self.path = path or DEFAULT_PATH
+        self.ttl = ttl if ttl is not None else DEFAULT_TTL
+        self.max_rows = max_rows or DEFAULT_MAX_ROWS
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            self._conn.executescript(SCHEMA)
+            self._key = (secret or os.getenv("RESULT_STORE_SECRET") or self._stored_key()).encode()
+            self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _stored_key(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dob_key'").fetchone()
+        if row:
+            return row[0]
+        key = secrets.token_hex(32)
+        self._conn.execute("INSERT INTO meta (key, value) VALUES ('dob_key', ?)", (key,))
+        return key
+
+    @staticmethod
+    def _normalize_roll(roll):
+        return roll.strip().upper()
+
+    def _dob_hash(self, roll, dob):
+        message = f"{roll}|{dob.strip()}".encode()
+        return hmac.new(self._key, message, hashlib.sha256).hexdigest()
+
+    def get(self, result_id, department, roll, dob):
+        """Return the stored StudentResult, or None on a miss or expired row."""
+        roll = self._normalize_roll(roll)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM results WHERE result_id = ? AND department = ? AND roll = ?"
+                " AND dob_hash = ? AND fetched_at >= ?",
+                (result_id, department, roll, self._dob_hash(roll, dob), now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE result_id = ? AND department = ? AND roll = ?",
+                (now, result_id, department, roll),
+            )
+            self._conn.commit()
+        self.hits += 1
+        return StudentResult.from_dict(json.loads(row[0]))
+
+    def put(self, result, dob):
+        """Store a StudentResult fetched with the given DOB."""
+        roll = self._normalize_roll(result.roll)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results"
+                " (result_id, department, roll, dob_hash, payload, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (result.result_id, result.department, roll, self._dob_hash(roll, dob),
+                 json.dumps(result.to_dict()), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM results WHERE fetched_at < ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count > self.max_rows:
+            self._conn.execute(
+                "DELETE FROM results WHERE rowid IN"
+                " (SELECT rowid FROM results ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_rows,),
+            )
+
+    def history(self, roll, dob):
+        """Return every stored semester for a student, newest result id first."""
+        roll = self._normalize_roll(roll)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM results WHERE roll = ? AND dob_hash = ? AND fetched_at >= ?"
+                " ORDER BY result_id DESC",
+                (roll, self._dob_hash(roll, dob), time.time() - self.ttl),
+            ).fetchall()
+        return [StudentResult.from_dict(json.loads(row[0])) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"rows": rows, "hits": self.hits, "misses": self.misses, "ttl": self.ttl, "max_rows": self.max_rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Return the process-wide ResultStore, or None if it cannot be opened."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ResultStore()
+            except sqlite3.Error as e:
+                logger.error(f"Could not open result store at {DEFAULT_PATH}: {e}")
+                return None
+        return _store
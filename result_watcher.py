@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WATCH_INTERVAL = int(os.getenv("RESULT_WATCH_INTERVAL", "120"))
+WATCH_STATE_PATH = os.getenv("RESULT_WATCH_STATE", os.path.join(tempfile.gettempdir(), "mitsbot_watcher.json"))
+WATCH_WARM_BROWSER = os.getenv("RESULT_WATCH_WARM_BROWSER", "").lower() in ("1", "true", "yes")
+
+
+class ResultWatcher:
+    """Polls the results listing and pre-warms lookups for new entries.
+
+    The first poll only records what is already published. Every entry that
+    appears later is recorded with its detection time, its form metadata is
+    fetched (which also opens pooled portal connections) and, optionally,
+    the shared browser is launched, before the first student asks.
+    Listeners registered with add_listener() are awaited with the new
+    entries after each poll.
+    """
+
+    def __init__(self, state_path=None, warm_browser=None):
+        self.state_path = state_path or WATCH_STATE_PATH
+        self.warm_browser = WATCH_WARM_BROWSER if warm_browser is None else warm_browser
+        self._lock = threading.Lock()
+        self._known = None
+        self.detections = {}
+        self.listeners = []
+        self.polls = 0
+        self.last_poll_at = None
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            self._known = set(state.get("known", []))
+            self.detections = state.get("detections", {})
+        except (OSError, ValueError):
+            pass
+
+    def _save_state(self):
+        try:
+            tmp = f"{self.state_path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({"known": sorted(self._known or []), "detections": self.detections}, f)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logger.warning(f"Could not save watcher state: {e}")
+
+    def add_listener(self, callback):
+        """Register ``async callback(bot, new_entries)``."""
+        self.listeners.append(callback)
+
+    def _prewarm(self, link):
+        from result_fetcher import get_form_metadata
+        from warmup import warm_browser
+        started = time.perf_counter()
+        try:
+            get_form_metadata(link)
+            if self.warm_browser:
+                warm_browser()
+        except Exception as e:
+            logger.warning(f"Pre-warming {link} failed: {e}")
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    def poll(self):
+        """Refresh the listing and return entries not seen before. Blocking."""
+        from bot_handlers import get_results_checker
+        checker = get_results_checker()
+        if checker is None:
+            return []
+        checker.refresh(force=True)
+        entries = checker.entries()
+        if not entries or checker.from_snapshot:
+            # Portal down, empty page or an unconfirmed snapshot: never treat
+            # that as the baseline or diff against it
+            return []
+
+        with self._lock:
+            self.polls += 1
+            self.last_poll_at = time.time()
+            links = {link for _text, link, _parts in entries}
+            if self._known is None:
+                # First run: everything already published is the baseline
+                self._known = links
+                self._save_state()
+                logger.info(f"Result watcher primed with {len(links)} entries")
+                return []
+            new_entries = [entry for entry in entries if entry[1] not in self._known]
+            self._known |= links
+
+        for text, link, _parts in new_entries:
+            detected_at = time.time()
+            logger.info(f"New result published: {text}")
+            prewarm_ms = self._prewarm(link)
+            self.detections[link] = {
+                "text": text,
+                "detected_at": detected_at,
+                "listing_changed_at": checker.changed_at,
+                "prewarm_ms": prewarm_ms,
+            }
+        if new_entries:
+            with self._lock:
+                self._save_state()
+        return new_entries
+
+    async def check(self, context=None, bot=None):
+        """Job-queue callback: poll off the event loop, then notify listeners."""
+        bot = bot or (context.bot if context else None)
+        try:
+            new_entries = await asyncio.to_thread(self.poll)
+        except Exception as e:
+            logger.error(f"Result watcher poll failed: {e}", exc_info=True)
+            return []
+        for listener in self.listeners:
+            try:
+                await listener(bot, new_entries)
+            except Exception as e:
+                logger.error(f"Result watcher listener failed: {e}", exc_info=True)
+        return new_entries
+
+    def stats(self):
+        return {
+            "polls": self.polls,
+            "last_poll_at": self.last_poll_at,
+            "known_entries": len(self._known or []),
+            "detections": self.detections,
+        }
+
+
+result_watcher = ResultWatcher()
+
+
+def setup_result_watcher(application, interval=None):
+    """Schedule the watcher on the Application's job queue."""
+    interval = WATCH_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return
+    if application.job_queue is None:
+        logger.warning("Job queue is not available; result watcher disabled")
+        return
+    application.job_queue.run_repeating(result_watcher.check, interval=interval, first=10, name="result-watcher")
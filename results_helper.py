@@ -1,12 +1,39 @@
+import asyncio
+import hashlib
 import logging
+import os
+import re
+import threading
+import time
 from urllib.parse import urljoin
 import requests
 from bs4 import BeautifulSoup
+from metrics import SCRAPE_SECONDS
+from portal_health import portal_health
+from result_fetcher import PORTAL_BASE
+from singleflight import get_singleflight
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
+RESULTS_INDEX_TTL = int(os.getenv("RESULTS_INDEX_TTL", "300"))
+# After a failed refresh, wait this long before scraping again
+RESULTS_INDEX_RETRY_AFTER = 60
+
+listing_flight = get_singleflight("results_listing")
+
+
 class ResultsChecking:
-    BASE_URL = "http://125.16.54.154/mitsresults/resultug"
+    """Index of every entry on the results portal listing.
+
+    The listing is scraped once into a single index keyed by
+    (regulation, year, semester); every lookup is served from it. The index
+    is refreshed every ``refresh_interval`` seconds in the background and is
+    only rebuilt when the listing actually changed. Concurrent refreshes are
+    coalesced into a single scrape, whether they come from threads or from
+    async callers, whose aentries()/alookup() wait for it in a worker thread.
+    """
+    BASE_URL = PORTAL_BASE
     ROMAN = {
         "I": "1",
         "II": "2",
@@ -14,15 +41,39 @@ class ResultsChecking:
         "IV": "4",
     }
 
-    def __init__(self):
-        self._cache = {}
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = refresh_interval or RESULTS_INDEX_TTL
+        self._entries = []
+        self._index = {}
+        self._fingerprint = None
+        self._loaded = False
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+        # True while serving a restored snapshot that no scrape has confirmed
+        self.from_snapshot = False
+
+        self.version = 0
+        self.fetches = 0
+        self.errors = 0
+        self.changed_at = None
 
     def _fetch_all(self):
         """Fetch and normalize all result entries from the results portal.
         Returns a list of tuples: (display_text, full_link, parts)
         where parts is the normalized split list of text elements.
         """
-        html = requests.get(self.BASE_URL, timeout=20).text
+        def _get():
+            response = requests.get(self.BASE_URL, timeout=20)
+            # A 5xx from the portal counts against its health
+            response.raise_for_status()
+            return response.text
+        with SCRAPE_SECONDS.time(source="results_listing", phase="fetch"), span("results_listing.fetch"):
+            html = portal_health.call(_get)
+        with SCRAPE_SECONDS.time(source="results_listing", phase="parse"), span("results_listing.parse"):
+            return self._parse_listing(html)
+
+    def _parse_listing(self, html):
         soup = BeautifulSoup(html, "lxml")
         wrapper = soup.find('div', class_='wrapper')
         if not wrapper:
@@ -48,37 +99,215 @@ class ResultsChecking:
             entries.append((text_norm, full_link, parts))
         return entries
 
+    @staticmethod
+    def _build_index(entries):
+        index = {}
+        for entry in entries:
+            _text, _link, parts = entry
+            for reg in {p for p in parts if re.fullmatch(r'R\d{2}', p)}:
+                index.setdefault((reg, parts[1], parts[2]), []).append(entry)
+        return index
+
+    def refresh(self, force=False):
+        """Re-scrape the listing; returns True if it changed.
+
+        Concurrent refreshes share one scrape. Without ``force`` a fresh
+        index is returned as is.
+        """
+        if not force and self._loaded and not self.is_stale():
+            return False
+        return listing_flight.do(self.BASE_URL, self._refresh)
+
+    def _refresh(self):
+        try:
+            entries = self._fetch_all()
+        except Exception as e:
+            return self._failed(e)
+        return self._update(entries)
+
+    def _failed(self, error):
+        self.errors += 1
+        logger.error(f"Error fetching results listing: {error}")
+        self._fetched_at = time.monotonic() - self.refresh_interval + RESULTS_INDEX_RETRY_AFTER
+        return False
+
+    @staticmethod
+    def _fingerprint_of(entries):
+        return hashlib.sha256(
+            "\n".join(f"{text}|{link}" for text, link, _parts in entries).encode()
+        ).hexdigest()
+
+    def _update(self, entries):
+        """Swap in a freshly scraped listing; returns True if it changed."""
+        self.fetches += 1
+        fingerprint = self._fingerprint_of(entries)
+        changed = fingerprint != self._fingerprint
+        if changed:
+            index = self._build_index(entries)
+            with self._lock:
+                self._entries = entries
+                self._index = index
+                self._fingerprint = fingerprint
+                self.version += 1
+                self.changed_at = time.time()
+            logger.info(f"Results listing changed: {len(entries)} entries (version {self.version})")
+        self._loaded = True
+        self.from_snapshot = False
+        self._fetched_at = time.monotonic()
+        return changed
+
+    async def arefresh(self, force=False):
+        """Async refresh(); joins the same scrape as threaded callers."""
+        if not force and self._loaded and not self.is_stale():
+            return False
+        return await asyncio.to_thread(self.refresh, force)
+
+    def is_stale(self):
+        return time.monotonic() - self._fetched_at >= self.refresh_interval
+
+    def _schedule_refresh(self):
+        if self._timer is not None:
+            return
+
+        def _run():
+            try:
+                self.refresh()
+            finally:
+                self._timer = None
+                self._schedule_refresh()
+
+        self._timer = threading.Timer(self.refresh_interval, _run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _ensure_index(self):
+        if not self._loaded:
+            self.refresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+        self._schedule_refresh()
+
+    def _refresh_in_background(self):
+        # The timer may not have fired (e.g. a frozen serverless instance);
+        # keep serving the current index while it refreshes
+        if not listing_flight.in_flight(self.BASE_URL):
+            threading.Thread(target=self.refresh, name="results-refresh", daemon=True).start()
+
+    def entries(self):
+        """Return every (display_text, full_link, parts) entry in the listing."""
+        self._ensure_index()
+        with self._lock:
+            return list(self._entries)
+
+    async def aentries(self):
+        """Async entries(): never blocks the event loop on the network or lxml."""
+        if not self._loaded:
+            await self.arefresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+        with self._lock:
+            return list(self._entries)
+
+    def lookup(self, reg=None, year=None, sem=None, exam_type=None):
+        """Return listing entries matching any combination of filters."""
+        with span("results_listing.lookup", regulation=reg or "", year=year or "", sem=sem or "") as current:
+            self._ensure_index()
+            matches = self._match(reg, year, sem, exam_type)
+            if current:
+                current.set("matches", len(matches))
+            return matches
+
+    async def alookup(self, reg=None, year=None, sem=None, exam_type=None):
+        """Async lookup()."""
+        with span("results_listing.lookup", regulation=reg or "", year=year or "", sem=sem or "") as current:
+            await self.aentries()
+            matches = self._match(reg, year, sem, exam_type)
+            if current:
+                current.set("matches", len(matches))
+            return matches
+
+    def _match(self, reg, year, sem, exam_type):
+        with self._lock:
+            if reg and year and sem:
+                candidates = self._index.get((reg, str(year), str(sem)), [])
+            else:
+                candidates = self._entries
+        matches = []
+        for entry in candidates:
+            _text, _link, parts = entry
+            if reg and reg not in parts:
+                continue
+            if year and parts[1] != str(year):
+                continue
+            if sem and parts[2] != str(sem):
+                continue
+            if exam_type and (len(parts) < 5 or parts[4].lower() != exam_type.lower()):
+                continue
+            matches.append(entry)
+        return matches
+
     def get_results_link(self, collected):
         """Return a list of option display texts for given [reg, year, sem]."""
         if len(collected) < 3:
             return []
         reg, year, sem = collected[:3]
-        key = (reg, year, sem)
-        if key not in self._cache:
-            all_entries = self._fetch_all()
-            filtered = []
-            for text, link, parts in all_entries:
-                try:
-                    if parts[1] == str(year) and parts[2] == str(sem) and reg in parts:
-                        filtered.append((text, link))
-                except Exception:
-                    continue
-            # Save filtered list
-            self._cache[key] = filtered
-        return [t for (t, _link) in self._cache[key]]
+        return [text for (text, _link, _parts) in self.lookup(reg, year, sem)]
 
     def print_options(self, collected):
         """Given [reg, year, sem, option_index] return the final link URL."""
         if len(collected) < 4:
             return None
         reg, year, sem, idx = collected[:4]
-        key = (reg, year, sem)
-        if key not in self._cache:
-            # Populate if not present
-            self.get_results_link([reg, year, sem])
-        items = self._cache.get(key, [])
+        items = self.lookup(reg, year, sem)
         if not items:
             return None
         if not (0 <= int(idx) < len(items)):
             return None
         return items[int(idx)][1]
+
+    def export_state(self):
+        """Return the listing as plain data for a snapshot, or None if not loaded."""
+        with self._lock:
+            if not self._loaded:
+                return None
+            return {
+                "base_url": self.BASE_URL,
+                # parts are the "-"-separated pieces of the normalized text
+                "entries": [[text, link] for text, link, _parts in self._entries],
+                "changed_at": self.changed_at,
+            }
+
+    def restore_state(self, state):
+        """Serve a snapshot's listing until the first refresh; returns True if applied.
+
+        The restored index counts as stale, so the first lookup answers from
+        it and re-scrapes in the background.
+        """
+        if state.get("base_url") != self.BASE_URL:
+            return False
+        entries = [(text, link, text.split("-")) for text, link in state["entries"]]
+        index = self._build_index(entries)
+        with self._lock:
+            if self._loaded:
+                return False
+            self._entries = entries
+            self._index = index
+            self._fingerprint = self._fingerprint_of(entries)
+            self.version += 1
+            self.changed_at = state.get("changed_at")
+            self._fetched_at = time.monotonic() - self.refresh_interval
+            self._loaded = True
+            self.from_snapshot = True
+        logger.info(f"Results listing restored from snapshot: {len(entries)} entries")
+        return True
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "version": self.version,
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._loaded else None,
+            "changed_at": self.changed_at,
+            "from_snapshot": self.from_snapshot,
+        }
@@ -1,87 +1,241 @@
 import logging
 import os
-import tempfile
-from playwright.sync_api import sync_playwright
+import requests
+from browser_pool import get_browser_pool
+from metrics import BOT_WORK_STAGE, PORTAL_ERRORS, RESULT_LOOKUPS
+from portal_health import PortalUnavailable, portal_health, unavailable_message
+from result_fetcher import (
+    PortalLayoutError,
+    ResultNotFound,
+    default_result_id,
+    fetch_result,
+    is_not_found,
+    parse_result_page,
+    result_form_url,
+    result_id_from_url,
+)
+from result_card import format_result_html, render_result_card
+from result_store import get_result_store
+from screenshots import capture_element
+from singleflight import get_singleflight
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for one pooled page session: goto + submit timeouts plus slack
+PAGE_SESSION_TIMEOUT = 60
+# Reply with a rendered result card image instead of HTML text
+RESULT_CARD_IMAGE = os.getenv("RESULT_CARD_IMAGE", "").lower() in ("1", "true", "yes")
+
+lookup_flight = get_singleflight("result_lookup")
+capture_flight = get_singleflight("result_capture")
+
+
+def _not_found_message(department_code, roll, dob):
+    return (f"❌ <b>Results Not Found</b>\n\n"
+            f"📋 <b>Details:</b>\n"
+            f"├ Department: <code>{department_code}</code>\n"
+            f"├ Roll Number: <code>{roll}</code>\n"
+            f"├ Date of Birth: <code>{dob}</code>\n\n"
+            f"💡 <i>Please check your details and try again. The portal reported they are invalid.</i>")
+
+
+def _result_reply(result):
+    """Reply for a parsed result: a PNG card (bytes) or HTML text."""
+    if RESULT_CARD_IMAGE:
+        with BOT_WORK_STAGE.time(stage="card_render"), span("bot_work.card_render"):
+            return render_result_card(result)
+    return format_result_html(result)
+
+
+def _error_message():
+    return (f"❌ <b>Error Processing Results</b>\n\n"
+            f"An error occurred while trying to fetch the results from the portal.\n\n"
+            f"💡 <i>Please try again later.</i>")
+
+
+async def _capture_results(page, portal_url, roll, dob, department_code):
+    """Drive the results form on a pooled page and return the bot_work reply."""
+    logger.info(f"Navigating to {portal_url} for roll {roll}")
+    with BOT_WORK_STAGE.time(stage="page_goto"), span("playwright.goto"):
+        await page.goto(portal_url, wait_until='networkidle', timeout=20000)
+
+    # Fill the form
+    with BOT_WORK_STAGE.time(stage="form_fill"):
+        with span("playwright.select_option", field="department1"):
+            await page.select_option('select[name="department1"]', department_code)
+        with span("playwright.fill", field="usn"):
+            await page.fill('input[name="usn"]', roll)
+        with span("playwright.fill", field="dateofbirth"):
+            await page.fill('input[name="dateofbirth"]', dob)
+
+    # Submit the form and wait for navigation
+    with BOT_WORK_STAGE.time(stage="form_submit"), span("playwright.submit"):
+        async with page.expect_navigation(wait_until='networkidle', timeout=20000):
+            await page.click('input[type="submit"]')
+
+    # Check for error messages
+    body_text = await page.inner_text('body')
+    if is_not_found(body_text):
+        logger.warning(f"Portal returned 'not found' or 'invalid' for roll {roll}")
+        return _not_found_message(department_code, roll, dob)
+
+    # When the rows parse, keep them and draw the reply without a screenshot
+    try:
+        with BOT_WORK_STAGE.time(stage="page_parse"), span("bot_work.page_parse"):
+            result = parse_result_page(await page.content(), roll=roll, department=department_code)
+        result.result_id = result_id_from_url(portal_url)
+        result.url = page.url
+        store = get_result_store()
+        if store:
+            store.put(result, dob)
+        return _result_reply(result)
+    except (PortalLayoutError, ResultNotFound):
+        pass
+
+    # Screenshot the results table straight into memory
+    results_table = await page.query_selector('table')
+    if results_table:
+        logger.info(f"Found results table, taking screenshot for roll {roll}")
+        with BOT_WORK_STAGE.time(stage="screenshot"), span("playwright.screenshot"):
+            return await capture_element(results_table)
+
+    # Fallback if screenshot fails
+    logger.warning("Screenshot failed, returning a text summary.")
+    student_name_element = await page.query_selector('td:has-text("Name") + td')
+    student_name = await student_name_element.inner_text() if student_name_element else "N/A"
+    sgpa_element = await page.query_selector('td:has-text("SGPA") + td')
+    sgpa = await sgpa_element.inner_text() if sgpa_element else "N/A"
+
+    return (f"✅ <b>Results Found!</b> (Screenshot failed)\n\n"
+            f"🎓 <b>Student:</b> {student_name}\n"
+            f"📊 <b>SGPA:</b> {sgpa}\n\n"
+            f"🔗 <a href='{page.url}'>View Detailed Results</a>")
+
+
 def bot_work(data):
     """
-    Capture screenshot of results page using Playwright.
-    
+    Fetch results over HTTP, falling back to a screenshot from the browser pool.
+
     Args:
         data: [link, roll, dob, department_code, regulation, year, semester]
-    
+
     Returns:
-        Path to PNG screenshot file or message with link
+        HTML results message, image bytes (result card or table screenshot)
+        or message with link
     """
     if not data or len(data) < 7:
         return "Invalid data provided"
-    
+
     link, roll, dob, department_code, regulation, year, semester = data
 
-    if not link:
-        return "No results link available"
-
-    with sync_playwright() as p:
-        browser = None
-        try:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            result_id = f"B.Tech-{year}-{semester}-{regulation}-Regular-{datetime.now().year}"
-            portal_url = f"http://125.16.54.154/mitsresults/resultug/myresultug?resultid={result_id}"
-            
-            logger.info(f"Navigating to {portal_url} for roll {roll}")
-            page.goto(portal_url, wait_until='networkidle', timeout=20000)
-
-            # Fill the form
-            page.select_option('select[name="department1"]', department_code)
-            page.fill('input[name="usn"]', roll)
-            page.fill('input[name="dateofbirth"]', dob)
-
-            # Submit the form and wait for navigation
-            with page.expect_navigation(wait_until='networkidle', timeout=20000):
-                page.click('input[type="submit"]')
-
-            # Check for error messages
-            body_text = page.inner_text('body')
-            if 'not found' in body_text.lower() or 'invalid' in body_text.lower():
-                logger.warning(f"Portal returned 'not found' or 'invalid' for roll {roll}")
-                return (f"❌ <b>Results Not Found</b>\n\n"
-                        f"📋 <b>Details:</b>\n"
-                        f"├ Department: <code>{department_code}</code>\n"
-                        f"├ Roll Number: <code>{roll}</code>\n"
-                        f"├ Date of Birth: <code>{dob}</code>\n\n"
-                        f"💡 <i>Please check your details and try again. The portal reported they are invalid.</i>")
-
-            # Take a screenshot of the results table
-            results_table = page.query_selector('table')
-            if results_table:
-                logger.info(f"Found results table, taking screenshot for roll {roll}")
-                temp_dir = tempfile.gettempdir()
-                screenshot_path = os.path.join(temp_dir, f"result_{roll}.png")
-                results_table.screenshot(path=screenshot_path)
-                logger.info(f"Screenshot saved to: {screenshot_path}")
-                return screenshot_path
-            
-            # Fallback if screenshot fails
-            logger.warning("Screenshot failed, returning a text summary.")
-            student_name_element = page.query_selector('td:has-text("Name") + td')
-            student_name = student_name_element.inner_text() if student_name_element else "N/A"
-            sgpa_element = page.query_selector('td:has-text("SGPA") + td')
-            sgpa = sgpa_element.inner_text() if sgpa_element else "N/A"
-
-            return (f"✅ <b>Results Found!</b> (Screenshot failed)\n\n"
-                    f"🎓 <b>Student:</b> {student_name}\n"
-                    f"📊 <b>SGPA:</b> {sgpa}\n\n"
-                    f"🔗 <a href='{page.url}'>View Detailed Results</a>")
-
-        except Exception as e:
-            logger.error(f"Error in bot_work with Playwright: {e}", exc_info=True)
-            return (f"❌ <b>Error Processing Results</b>\n\n"
-                    f"An error occurred while trying to fetch the results from the portal.\n\n"
-                    f"💡 <i>Please try again later.</i>")
-        finally:
-            if browser:
-                browser.close()
+    # The conversation no longer collects a listing link, so build the form URL
+    # from the selections when none is passed in
+    if link:
+        portal_url = link
+    else:
+        portal_url = result_form_url(default_result_id(regulation, year, semester))
+
+    try:
+        result = lookup_result(portal_url, roll, dob, department_code)
+    except ResultNotFound:
+        logger.warning(f"Portal returned 'not found' or 'invalid' for roll {roll}")
+        return _not_found_message(department_code, roll, dob)
+    except PortalUnavailable as e:
+        logger.warning(f"Skipping lookup for roll {roll}: {e}")
+        return unavailable_message(e)
+    except requests.RequestException as e:
+        logger.error(f"HTTP lookup failed for roll {roll}: {e}")
+        return _error_message()
+    except PortalLayoutError as e:
+        logger.warning(f"HTTP lookup could not parse the portal ({e}), falling back to Playwright")
+        key = lookup_key(portal_url, roll, dob, department_code)
+        return capture_flight.do(key, _browser_lookup, portal_url, roll, dob, department_code)
+    return _result_reply(result)
+
+
+def lookup_key(portal_url, roll, dob, department_code):
+    """Singleflight key shared by every lookup of one student's result id."""
+    return (portal_url, department_code, roll.strip().upper(), dob)
+
+
+def lookup_result(portal_url, roll, dob, department_code):
+    """Return one StudentResult from the result store or the portal. Blocking.
+
+    Identical lookups already in flight (e.g. a roll shared in a group chat,
+    or /cgpa and /resultscheck at once) wait for that one instead of hitting
+    the portal again. Counts RESULT_LOOKUPS and PORTAL_ERRORS and raises
+    ResultNotFound, PortalUnavailable, requests.RequestException or
+    PortalLayoutError; the outcome of a layout error is left to the caller,
+    which may fall back to the browser.
+    """
+    roll = roll.strip().upper()
+
+    # Results do not change once published, so answer repeats from the store
+    store = get_result_store()
+    if store:
+        with BOT_WORK_STAGE.time(stage="store_lookup"), span("bot_work.store_lookup"):
+            result = store.get(result_id_from_url(portal_url), department_code, roll, dob)
+        if result is not None:
+            logger.info(f"Serving stored results for roll {roll}")
+            RESULT_LOOKUPS.inc(outcome="stored")
+            return result
+
+    key = lookup_key(portal_url, roll, dob, department_code)
+    return lookup_flight.do(key, _fetch_and_store, portal_url, roll, dob, department_code)
+
+
+def _fetch_and_store(portal_url, roll, dob, department_code):
+    # The form is plain HTML, so try a browserless lookup first. Portal calls
+    # go through the health controller, which fails fast while it is down
+    try:
+        with BOT_WORK_STAGE.time(stage="http_fetch"), span("bot_work.http_fetch"):
+            result = portal_health.call(fetch_result, portal_url, roll, dob, department_code)
+    except ResultNotFound:
+        RESULT_LOOKUPS.inc(outcome="not_found")
+        raise
+    except PortalUnavailable:
+        RESULT_LOOKUPS.inc(outcome="unavailable")
+        raise
+    except requests.RequestException as e:
+        if isinstance(e, requests.Timeout):
+            PORTAL_ERRORS.inc(kind="timeout")
+        elif isinstance(e, requests.ConnectionError):
+            PORTAL_ERRORS.inc(kind="connection")
+        else:
+            PORTAL_ERRORS.inc(kind="http")
+        RESULT_LOOKUPS.inc(outcome="error")
+        raise
+    except PortalLayoutError:
+        PORTAL_ERRORS.inc(kind="layout")
+        raise
+    logger.info(f"Fetched results over HTTP for roll {roll}")
+    store = get_result_store()
+    if store:
+        store.put(result, dob)
+    RESULT_LOOKUPS.inc(outcome="http")
+    return result
+
+
+def _browser_lookup(portal_url, roll, dob, department_code):
+    """Capture the result with the browser pool and return the bot_work reply."""
+    try:
+        with BOT_WORK_STAGE.time(stage="browser_session"), span("bot_work.browser_session"):
+            reply = portal_health.call(
+                get_browser_pool().run,
+                lambda page: _capture_results(page, portal_url, roll, dob, department_code),
+                timeout=PAGE_SESSION_TIMEOUT,
+                # A healthy browser session outlasts PORTAL_LATENCY_TARGET
+                latency_feedback=False,
+            )
+        RESULT_LOOKUPS.inc(outcome="browser")
+        return reply
+    except PortalUnavailable as e:
+        logger.warning(f"Skipping browser lookup for roll {roll}: {e}")
+        RESULT_LOOKUPS.inc(outcome="unavailable")
+        return unavailable_message(e)
+    except Exception as e:
+        logger.error(f"Error in bot_work with Playwright: {e}", exc_info=True)
+        PORTAL_ERRORS.inc(kind="browser")
+        RESULT_LOOKUPS.inc(outcome="error")
+        return _error_message()
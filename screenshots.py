@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Screenshots larger than this are re-encoded as JPEG and, if needed,
+# downscaled until they fit; 0 sends the PNG as captured
+SCREENSHOT_MAX_BYTES = int(os.getenv("SCREENSHOT_MAX_BYTES", "200000"))
+# (JPEG quality, CSS zoom) steps tried in order until the budget is met
+ENCODE_STEPS = ((85, 1.0), (70, 1.0), (60, 0.8), (45, 0.65))
+
+
+class ScreenshotStats:
+    """Byte-size and encode-time counters for captured screenshots."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.captures = 0
+        self.reencoded = 0
+        self.over_budget = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.max_sent_bytes = 0
+        self.encode_ms = 0.0
+        self.max_encode_ms = 0.0
+
+    def record(self, raw_size, sent_size, elapsed_ms, reencoded, over_budget):
+        with self._lock:
+            self.captures += 1
+            self.reencoded += int(reencoded)
+            self.over_budget += int(over_budget)
+            self.raw_bytes += raw_size
+            self.sent_bytes += sent_size
+            self.max_sent_bytes = max(self.max_sent_bytes, sent_size)
+            self.encode_ms += elapsed_ms
+            self.max_encode_ms = max(self.max_encode_ms, elapsed_ms)
+
+    def stats(self):
+        captures = self.captures or 1
+        return {
+            "captures": self.captures,
+            "reencoded": self.reencoded,
+            "over_budget": self.over_budget,
+            "avg_raw_bytes": round(self.raw_bytes / captures),
+            "avg_sent_bytes": round(self.sent_bytes / captures),
+            "max_sent_bytes": self.max_sent_bytes,
+            "avg_encode_ms": round(self.encode_ms / captures, 1),
+            "max_encode_ms": round(self.max_encode_ms, 1),
+        }
+
+
+screenshot_stats = ScreenshotStats()
+
+
+async def _zoomed_jpeg(element, quality, zoom):
+    if zoom == 1.0:
+        return await element.screenshot(type="jpeg", quality=quality)
+    previous = await element.evaluate("(el, zoom) => { const old = el.style.zoom; el.style.zoom = zoom; return old; }", zoom)
+    try:
+        return await element.screenshot(type="jpeg", quality=quality)
+    finally:
+        await element.evaluate("(el, old) => { el.style.zoom = old; }", previous)
+
+
+async def capture_element(element, max_bytes=None):
+    """Screenshot an element into memory and return the image bytes.
+
+    The PNG is returned as captured when it fits in ``max_bytes``;
+    otherwise it is re-captured as JPEG at decreasing quality and size
+    until it fits, or the smallest attempt is returned.
+    """
+    max_bytes = SCREENSHOT_MAX_BYTES if max_bytes is None else max_bytes
+    started = time.perf_counter()
+    image = await element.screenshot(type="png")
+    raw_size = len(image)
+
+    reencoded = False
+    if max_bytes and raw_size > max_bytes:
+        reencoded = True
+        for quality, zoom in ENCODE_STEPS:
+            candidate = await _zoomed_jpeg(element, quality, zoom)
+            if len(candidate) < len(image):
+                image = candidate
+            if len(image) <= max_bytes:
+                break
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    over_budget = bool(max_bytes) and len(image) > max_bytes
+    screenshot_stats.record(raw_size, len(image), elapsed_ms, reencoded, over_budget)
+    if reencoded:
+        logger.info(f"Screenshot re-encoded from {raw_size} to {len(image)} bytes in {elapsed_ms:.0f} ms")
+    return image
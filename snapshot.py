@@ -0,0 +1,191 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout below changes; snapshots of another format are ignored
+SNAPSHOT_FORMAT = 1
+# Writable snapshot, saved after each revalidation; empty disables it
+INDEX_SNAPSHOT_PATH = os.getenv("INDEX_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "mitsbot_snapshot.json.gz"))
+# Read-only snapshot shipped with the deployment (python snapshot.py --bundle)
+BUNDLED_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_snapshot.json.gz")
+# Older snapshots are not worth serving, even for a moment
+INDEX_SNAPSHOT_MAX_AGE = int(os.getenv("INDEX_SNAPSHOT_MAX_AGE", str(7 * 86400)))
+
+
+class SnapshotStats:
+    def __init__(self):
+        self.restored_from = None
+        self.restored_age_seconds = None
+        self.restored = {}
+        self.saves = 0
+        self.save_errors = 0
+        self.last_saved_at = None
+        self.last_size = None
+
+    def stats(self):
+        return {
+            "path": INDEX_SNAPSHOT_PATH or None,
+            "restored_from": self.restored_from,
+            "restored_age_seconds": self.restored_age_seconds,
+            "restored": dict(self.restored),
+            "saves": self.saves,
+            "save_errors": self.save_errors,
+            "last_saved_at": self.last_saved_at,
+            "last_size_bytes": self.last_size,
+        }
+
+
+snapshot_stats = SnapshotStats()
+_restore_lock = threading.Lock()
+_restore_started = False
+
+
+def build_snapshot():
+    """Collect the listing, timetable and form metadata as plain data."""
+    from bot_handlers import get_results_checker
+    from ExamTimeTable import timetable_index
+    from result_fetcher import export_forms
+    checker = get_results_checker()
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": time.time(),
+        "results_listing": checker.export_state() if checker else None,
+        "timetable": timetable_index.export_state(),
+        "forms": export_forms(),
+    }
+
+
+def save_snapshot(path=None):
+    """Write a snapshot atomically; returns its size in bytes, or None if skipped."""
+    path = path or INDEX_SNAPSHOT_PATH
+    if not path:
+        return None
+    from bot_handlers import get_results_checker
+    checker = get_results_checker()
+    if checker is not None and checker.from_snapshot:
+        # Re-saving data no scrape has confirmed would reset its age
+        return None
+    snapshot = build_snapshot()
+    if not snapshot["results_listing"] and not snapshot["timetable"]:
+        return None
+    data = gzip.compress(json.dumps(snapshot, separators=(",", ":")).encode(), mtime=0)
+    try:
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        snapshot_stats.save_errors += 1
+        logger.warning(f"Could not write index snapshot to {path}: {e}")
+        return None
+    snapshot_stats.saves += 1
+    snapshot_stats.last_saved_at = snapshot["created_at"]
+    snapshot_stats.last_size = len(data)
+    logger.info(f"Index snapshot written to {path} ({len(data)} bytes)")
+    return len(data)
+
+
+def load_snapshot(path):
+    """Return the snapshot at ``path`` if it is readable, current and recent enough."""
+    try:
+        with gzip.open(path, "rb") as f:
+            snapshot = json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable index snapshot {path}: {e}")
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        logger.info(f"Ignoring index snapshot {path} of another format")
+        return None
+    if time.time() - snapshot.get("created_at", 0) > INDEX_SNAPSHOT_MAX_AGE:
+        logger.info(f"Ignoring index snapshot {path} older than {INDEX_SNAPSHOT_MAX_AGE} s")
+        return None
+    return snapshot
+
+
+def restore_snapshot():
+    """Seed the indices from the newest usable snapshot; returns what was restored.
+
+    Components that already loaded from the portal keep their data.
+    """
+    from bot_handlers import get_results_checker
+    from ExamTimeTable import timetable_index
+    from result_fetcher import restore_forms
+    candidates = [(path, load_snapshot(path)) for path in (INDEX_SNAPSHOT_PATH, BUNDLED_SNAPSHOT_PATH) if path]
+    candidates = [(path, snapshot) for path, snapshot in candidates if snapshot]
+    if not candidates:
+        return {}
+    path, snapshot = max(candidates, key=lambda candidate: candidate[1]["created_at"])
+
+    checker = get_results_checker()
+    restored = {}
+    if snapshot.get("results_listing") and checker is not None:
+        restored["results_listing"] = checker.restore_state(snapshot["results_listing"])
+    if snapshot.get("timetable"):
+        restored["timetable"] = timetable_index.restore_state(snapshot["timetable"])
+    restored["forms"] = restore_forms(snapshot.get("forms") or {})
+
+    snapshot_stats.restored_from = path
+    snapshot_stats.restored_age_seconds = round(time.time() - snapshot["created_at"], 1)
+    snapshot_stats.restored = restored
+    logger.info(f"Restored index snapshot from {path} "
+                f"({snapshot_stats.restored_age_seconds} s old): {restored}")
+    return restored
+
+
+def revalidate():
+    """Refresh stale indices and restored forms, then save a new snapshot. Blocking."""
+    from bot_handlers import get_results_checker
+    from ExamTimeTable import timetable_index
+    from result_fetcher import export_forms, refresh_form_metadata
+    checker = get_results_checker()
+    if checker is not None:
+        checker.refresh()
+    if timetable_index.is_stale():
+        timetable_index.refresh()
+    for url, form in export_forms().items():
+        if form.get("restored"):
+            try:
+                refresh_form_metadata(url)
+            except Exception as e:
+                logger.warning(f"Revalidating form {url} failed: {e}")
+    return save_snapshot()
+
+
+def restore_in_background():
+    """Restore the snapshot and revalidate it in a worker thread, once per process."""
+    global _restore_started
+    with _restore_lock:
+        if _restore_started:
+            return
+        _restore_started = True
+
+    def _run():
+        try:
+            if restore_snapshot():
+                revalidate()
+        except Exception as e:
+            logger.error(f"Index snapshot restore failed: {e}", exc_info=True)
+
+    threading.Thread(target=_run, name="snapshot-restore", daemon=True).start()
+
+
+if __name__ == "__main__":
+    import argparse
+    from warmup import warm_up
+
+    parser = argparse.ArgumentParser(description="Scrape the portals and write an index snapshot")
+    parser.add_argument("--bundle", action="store_true", help=f"Write {BUNDLED_SNAPSHOT_PATH} for deployment")
+    parser.add_argument("--output", help="Snapshot path (default INDEX_SNAPSHOT_PATH)")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    warm_up()
+    size = save_snapshot(BUNDLED_SNAPSHOT_PATH if args.bundle else args.output)
+    print(f"Snapshot written ({size} bytes)" if size else "Nothing to snapshot: the portals could not be reached")
@@ -0,0 +1,256 @@
+import asyncio
+import html
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv("SUBSCRIPTIONS_PATH", os.path.join(tempfile.gettempdir(), "mitsbot_subscriptions.sqlite3"))
+# Telegram allows about 30 messages/s overall and 1 message/s per chat
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+PER_CHAT_INTERVAL = 1.0
+BROADCAST_BATCH = int(os.getenv("BROADCAST_BATCH", "25"))
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id INTEGER NOT NULL,
+    regulation TEXT NOT NULL,
+    year TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, regulation, year, semester)
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_match ON subscriptions (regulation, year, semester);
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    link TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    broadcast_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (broadcast_id, chat_id)
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_status ON deliveries (broadcast_id, status);
+"""
+
+
+class SubscriptionStore:
+    """SQLite-backed subscriptions and broadcast progress.
+
+    A broadcast and one delivery row per subscriber are written before any
+    message is sent, and each delivery is marked as it completes, so a
+    restart resumes with exactly the chats that have not been notified.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def subscribe(self, chat_id, regulation, year, semester):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO subscriptions VALUES (?, ?, ?, ?, ?)",
+                (chat_id, regulation, str(year), str(semester), time.time()),
+            )
+            self._conn.commit()
+
+    def unsubscribe(self, chat_id, regulation=None, year=None, semester=None):
+        with self._lock:
+            if regulation:
+                cursor = self._conn.execute(
+                    "DELETE FROM subscriptions WHERE chat_id = ? AND regulation = ? AND year = ? AND semester = ?",
+                    (chat_id, regulation, str(year), str(semester)),
+                )
+            else:
+                cursor = self._conn.execute("DELETE FROM subscriptions WHERE chat_id = ?", (chat_id,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def subscriptions_for(self, chat_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT regulation, year, semester FROM subscriptions WHERE chat_id = ?"
+                " ORDER BY regulation, year, semester",
+                (chat_id,),
+            ).fetchall()
+
+    def create_broadcast(self, link, text, regulation, year, semester):
+        """Record a broadcast for every matching subscriber; idempotent per link."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO broadcasts (link, text, created_at) VALUES (?, ?, ?)",
+                (link, text, time.time()),
+            )
+            if cursor.rowcount == 0:
+                return None
+            broadcast_id = cursor.lastrowid
+            self._conn.execute(
+                "INSERT INTO deliveries (broadcast_id, chat_id)"
+                " SELECT ?, chat_id FROM subscriptions WHERE regulation = ? AND year = ? AND semester = ?",
+                (broadcast_id, regulation, str(year), str(semester)),
+            )
+            self._conn.commit()
+            return broadcast_id
+
+    def unfinished_broadcasts(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, text FROM broadcasts WHERE finished_at IS NULL ORDER BY id"
+            ).fetchall()
+
+    def pending_deliveries(self, broadcast_id, limit):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT chat_id FROM deliveries WHERE broadcast_id = ? AND status = 'pending' LIMIT ?",
+                (broadcast_id, limit),
+            )]
+
+    def mark_delivery(self, broadcast_id, chat_id, status):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE deliveries SET status = ?, attempts = attempts + 1 WHERE broadcast_id = ? AND chat_id = ?",
+                (status, broadcast_id, chat_id),
+            )
+            self._conn.commit()
+
+    def record_attempt(self, broadcast_id, chat_id):
+        """Count a failed attempt; returns True once the delivery has given up."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE deliveries SET attempts = attempts + 1,"
+                " status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END"
+                " WHERE broadcast_id = ? AND chat_id = ?",
+                (MAX_ATTEMPTS, broadcast_id, chat_id),
+            )
+            self._conn.commit()
+            row = self._conn.execute(
+                "SELECT status FROM deliveries WHERE broadcast_id = ? AND chat_id = ?",
+                (broadcast_id, chat_id),
+            ).fetchone()
+            return row is not None and row[0] == 'failed'
+
+    def finish_broadcast(self, broadcast_id):
+        with self._lock:
+            self._conn.execute("UPDATE broadcasts SET finished_at = ? WHERE id = ?", (time.time(), broadcast_id))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            subscribers = self._conn.execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0]
+            statuses = dict(self._conn.execute("SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall())
+            running = self._conn.execute("SELECT COUNT(*) FROM broadcasts WHERE finished_at IS NULL").fetchone()[0]
+        return {"subscriptions": subscribers, "deliveries": statuses, "unfinished_broadcasts": running}
+
+
+class SendRateLimiter:
+    """Paces sends under a global rate and a minimum interval per chat."""
+
+    def __init__(self, rate=None, per_chat_interval=PER_CHAT_INTERVAL):
+        self.interval = 1.0 / (rate or BROADCAST_RATE)
+        self.per_chat_interval = per_chat_interval
+        self._next_global = 0.0
+        self._next_chat = {}
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        """Hold every send for ``seconds``, e.g. after a 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, chat_id):
+        now = time.monotonic()
+        start = max(now, self._next_global, self._next_chat.get(chat_id, 0.0), self._paused_until)
+        self._next_global = start + self.interval
+        self._next_chat[chat_id] = start + self.per_chat_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+_store = None
+_broadcast_lock = None
+limiter = SendRateLimiter()
+
+
+def get_subscription_store():
+    global _store
+    if _store is None:
+        _store = SubscriptionStore()
+    return _store
+
+
+async def _deliver(bot, store, broadcast_id, chat_id, text):
+    while True:
+        await limiter.acquire(chat_id)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+            await asyncio.to_thread(store.mark_delivery, broadcast_id, chat_id, 'sent')
+            return True
+        except RetryAfter as e:
+            # Telegram says how long to back off; hold all sends, then retry
+            logger.warning(f"Broadcast rate limited, retrying in {e.retry_after}s")
+            limiter.pause(e.retry_after)
+        except Forbidden:
+            # The user blocked the bot or left the chat
+            await asyncio.to_thread(store.mark_delivery, broadcast_id, chat_id, 'failed')
+            await asyncio.to_thread(store.unsubscribe, chat_id)
+            return False
+        except TelegramError as e:
+            logger.warning(f"Broadcast to {chat_id} failed: {e}")
+            if await asyncio.to_thread(store.record_attempt, broadcast_id, chat_id):
+                return False
+            return None
+
+
+async def run_broadcasts(bot, store=None):
+    """Send every unfinished broadcast, batch by batch. Safe to call repeatedly."""
+    global _broadcast_lock
+    store = store or await asyncio.to_thread(get_subscription_store)
+    if _broadcast_lock is None:
+        _broadcast_lock = asyncio.Lock()
+    if _broadcast_lock.locked():
+        return
+    async with _broadcast_lock:
+        for broadcast_id, text in await asyncio.to_thread(store.unfinished_broadcasts):
+            while True:
+                batch = await asyncio.to_thread(store.pending_deliveries, broadcast_id, BROADCAST_BATCH)
+                if not batch:
+                    break
+                await asyncio.gather(*(_deliver(bot, store, broadcast_id, chat_id, text) for chat_id in batch))
+            await asyncio.to_thread(store.finish_broadcast, broadcast_id)
+            logger.info(f"Broadcast {broadcast_id} finished")
+
+
+def _entry_key(parts):
+    regulation = next((p for p in parts if len(p) == 3 and p.startswith('R') and p[1:].isdigit()), None)
+    return regulation, parts[1], parts[2]
+
+
+async def on_new_results(bot, new_entries):
+    """Result-watcher listener: queue a broadcast per new entry, then send them."""
+    store = await asyncio.to_thread(get_subscription_store)
+    for text, link, parts in new_entries:
+        regulation, year, semester = _entry_key(parts)
+        if not regulation:
+            continue
+        message = (f"🎉 <b>New results published!</b>\n\n"
+                   f"{html.escape(text)}\n\n"
+                   f"Use /resultscheck to get yours.")
+        await asyncio.to_thread(store.create_broadcast, link, message, regulation, year, semester)
+    if bot is not None:
+        # Also resumes broadcasts left unfinished by a restart
+        await run_broadcasts(bot, store)
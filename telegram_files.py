@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("FILE_ID_CACHE_SIZE", "2000"))
+
+
+class FileIdCache:
+    """Maps a file's content hash to the Telegram file_id of its first upload.
+
+    Telegram keeps every uploaded file, so sending the file_id again delivers
+    the same photo or document without re-uploading the bytes.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            file_id = self._entries.get(key)
+            if file_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return file_id
+
+    def put(self, key, file_id):
+        with self._lock:
+            self._entries[key] = file_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+file_id_cache = FileIdCache()
+
+
+def _read_content(content):
+    """Accept raw bytes or a file path and return the bytes."""
+    if isinstance(content, (bytes, bytearray)):
+        return bytes(content)
+    with open(content, 'rb') as f:
+        return f.read()
+
+
+async def _send_cached(send, kind, content, filename=None, **kwargs):
+    data = _read_content(content)
+    key = f"{kind}:{hashlib.sha256(data).hexdigest()}"
+
+    file_id = file_id_cache.get(key)
+    if file_id:
+        try:
+            return await send(file_id, **kwargs)
+        except BadRequest as e:
+            # The file_id is no longer valid for this bot; upload again
+            logger.warning(f"Cached file_id rejected ({e}), re-uploading")
+            file_id_cache.discard(key)
+
+    if filename is None and isinstance(content, str):
+        filename = os.path.basename(content)
+    message = await send(data, filename=filename, **kwargs)
+    if kind == "photo" and message.photo:
+        file_id_cache.put(key, message.photo[-1].file_id)
+    elif kind == "document" and message.document:
+        file_id_cache.put(key, message.document.file_id)
+    return message
+
+
+async def send_photo_cached(bot, chat_id, photo, **kwargs):
+    """send_photo that reuses the file_id of an identical earlier upload.
+
+    ``photo`` may be PNG bytes or a path; files are read and closed here.
+    """
+    async def send(payload, filename=None, **kw):
+        return await bot.send_photo(chat_id=chat_id, photo=payload, filename=filename, **kw)
+    return await _send_cached(send, "photo", photo, **kwargs)
+
+
+async def send_document_cached(bot, chat_id, document, filename=None, **kwargs):
+    """send_document that reuses the file_id of an identical earlier upload."""
+    async def send(payload, filename=None, **kw):
+        return await bot.send_document(chat_id=chat_id, document=payload, filename=filename, **kw)
+    return await _send_cached(send, "document", document, filename=filename, **kwargs)
@@ -0,0 +1,40 @@
+import asyncio
+import concurrent.futures
+import time
+
+import pytest
+
+from browser_pool import BrowserPool
+
+
+class FakePool(BrowserPool):
+    """Pool whose pages are plain objects, so no browser is launched."""
+
+    def __init__(self):
+        super().__init__(size=1)
+        self.released = []
+
+    async def _acquire(self):
+        return object(), object()
+
+    async def _release(self, context, page, broken):
+        self.released.append(broken)
+
+
+def test_timed_out_session_is_cancelled_and_released():
+    pool = FakePool()
+    steps = []
+
+    async def navigate(page):
+        steps.append("started")
+        await asyncio.sleep(5)
+        steps.append("finished")
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        pool.run(navigate, timeout=0.1)
+
+    deadline = time.monotonic() + 2
+    while not pool.released and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert steps == ["started"]
+    assert pool.released == [True]
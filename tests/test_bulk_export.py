@@ -0,0 +1,33 @@
+import pytest
+
+import bulk_export
+import resutbot
+from result_fetcher import StudentResult
+
+
+def test_roll_range_is_capped():
+    assert len(bulk_export.expand_roll_range("21691A0001-0500")) == 500
+    with pytest.raises(ValueError):
+        bulk_export.expand_roll_range("21691A0001-21691A9999")
+
+
+def test_unexpected_lookup_error_is_recorded(monkeypatch, tmp_path):
+    def fetch_result(url, roll, dob, department):
+        if roll.endswith("2"):
+            raise ValueError("unparseable date")
+        return StudentResult(roll=roll, department=department, sgpa="8.0")
+
+    monkeypatch.setattr(resutbot, "get_result_store", lambda: None)
+    monkeypatch.setattr(resutbot, "fetch_result", fetch_result)
+    students = [("21691A0501", "2003-01-01"), ("21691A0502", "2003-01-02")]
+    records = bulk_export.run_bulk_export("B.Tech-3-1-R20-Regular-2024", "CSE", students,
+                                          min_interval=0, checkpoint_path=str(tmp_path / "checkpoint.jsonl"))
+
+    assert [r["status"] for r in records] == ["ok", "error"]
+    assert "unparseable date" in records[1]["error"]
+
+
+def test_batches_over_the_budget_are_refused():
+    size = bulk_export.max_batch_size(30, concurrency=3, min_interval=0.5)
+    assert bulk_export.estimate_seconds(size, 3, 0.5) <= 30
+    assert bulk_export.estimate_seconds(size + 1, 3, 0.5) > 30
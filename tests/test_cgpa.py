@@ -0,0 +1,32 @@
+import cgpa
+import resutbot
+from result_card import semester_credits
+from result_fetcher import StudentResult, result_form_url
+
+LINK = result_form_url("B.Tech-1-1-R20-Regular-2021")
+
+
+def test_missing_credits_fall_back_to_the_plain_mean():
+    listed = StudentResult("21691A0501", "CSE", sgpa="8.0", subjects=[{"credits": "3"}, {"credits": "1.5"}])
+    partial = StudentResult("21691A0501", "CSE", sgpa="6.0", subjects=[{"credits": "3"}, {"credits": ""}])
+    assert semester_credits(listed) == 4.5
+    assert semester_credits(partial) is None
+
+    records = [{"status": "ok", "result": listed}, {"status": "ok", "result": partial}]
+    assert cgpa.aggregate_cgpa(records) == (7.0, False)
+    assert cgpa.aggregate_cgpa(records[:1]) == (8.0, True)
+
+
+def test_semester_lookups_share_the_result_lookup_path(monkeypatch):
+    calls = []
+
+    def fetch_result(url, roll, dob, department):
+        calls.append(roll)
+        return StudentResult(roll=roll, department=department, sgpa="8.0")
+
+    monkeypatch.setattr(resutbot, "get_result_store", lambda: None)
+    monkeypatch.setattr(resutbot, "fetch_result", fetch_result)
+    status, result = cgpa._fetch_one(LINK, "21691a0501", "2003-01-01", "CSE", "1", "1")
+
+    assert status == "ok" and result.sgpa == "8.0"
+    assert calls == ["21691A0501"]
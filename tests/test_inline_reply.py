@@ -0,0 +1,87 @@
+import asyncio
+
+import inline_reply
+from inline_reply import InlineReplyRequest, inline_reply_scope
+
+API = "https://api.telegram.org/botTOKEN"
+
+
+class FakeData:
+    contains_files = False
+
+    def __init__(self, **parameters):
+        self.parameters = parameters
+
+
+class RecordingRequest(InlineReplyRequest):
+    """Records the calls that would go out to the Bot API."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, url, request_data, **timeouts):
+        self.sent.append((url.rsplit("/", 1)[-1], request_data.parameters.get("text")))
+        return True
+
+
+def _post(request, method, **parameters):
+    return request.post(f"{API}/{method}", FakeData(**parameters))
+
+
+def test_answer_stays_held_while_later_calls_go_out():
+    async def handle():
+        request = RecordingRequest()
+        async with inline_reply_scope() as slot:
+            assert await _post(request, "answerCallbackQuery", callback_query_id="1") is True
+            await _post(request, "editMessageText", chat_id=1, text="confirmed")
+        return request.sent, slot.take()
+
+    sent, reply = asyncio.run(handle())
+    assert sent == [("editMessageText", "confirmed")]
+    assert reply == {"method": "answerCallbackQuery", "callback_query_id": "1"}
+
+
+def test_held_message_is_sent_before_a_later_one():
+    async def handle():
+        request = RecordingRequest()
+        async with inline_reply_scope() as slot:
+            message = await _post(request, "sendMessage", chat_id=1, text="first")
+            await _post(request, "sendMessage", chat_id=1, text="second")
+        return request.sent, slot.take(), message
+
+    sent, reply, message = asyncio.run(handle())
+    assert sent == [("sendMessage", "first")]
+    assert reply["text"] == "second"
+    # Handlers get a plausible message back for the held call
+    assert message["text"] == "first"
+
+
+def test_call_held_too_long_is_sent_normally(monkeypatch):
+    monkeypatch.setattr(inline_reply, "INLINE_REPLY_MAX_HOLD", 0.05)
+
+    async def handle():
+        request = RecordingRequest()
+        async with inline_reply_scope() as slot:
+            await _post(request, "sendMessage", chat_id=1, text="slow")
+            # e.g. a portal lookup after the first reply
+            await asyncio.sleep(0.2)
+        return request.sent, slot.take()
+
+    sent, reply = asyncio.run(handle())
+    assert sent == [("sendMessage", "slow")]
+    assert reply is None
+
+
+def test_held_call_is_sent_when_the_handler_fails():
+    async def handle():
+        request = RecordingRequest()
+        try:
+            async with inline_reply_scope():
+                await _post(request, "sendMessage", chat_id=1, text="partial")
+                raise RuntimeError("handler failed")
+        except RuntimeError:
+            pass
+        return request.sent
+
+    assert asyncio.run(handle()) == [("sendMessage", "partial")]
@@ -0,0 +1,55 @@
+import time
+
+import requests
+
+from portal_health import PortalHealth, is_portal_failure
+
+
+def slow_call():
+    time.sleep(0.05)
+    return "ok"
+
+
+def test_slow_calls_cut_the_limit():
+    health = PortalHealth(max_limit=8, latency_target=0.01)
+    health.call(slow_call)
+    assert health.stats()["concurrency_limit"] == 2
+
+
+def test_calls_without_latency_feedback_keep_the_limit():
+    health = PortalHealth(max_limit=8, latency_target=0.01)
+    for _ in range(3):
+        assert health.call(slow_call, latency_feedback=False) == "ok"
+    stats = health.stats()
+    assert stats["concurrency_limit"] == 4
+    assert stats["successes"] == 3
+    assert stats["latency_ewma_s"] is None
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def test_only_server_side_errors_count_against_the_portal():
+    assert is_portal_failure(_http_error(503))
+    assert is_portal_failure(_http_error(429))
+    assert is_portal_failure(requests.ConnectionError("refused"))
+    assert is_portal_failure(requests.Timeout("slow"))
+    assert not is_portal_failure(_http_error(404))
+    assert not is_portal_failure(ValueError("layout"))
+
+
+def test_unpublished_result_ids_do_not_open_the_circuit():
+    health = PortalHealth(max_limit=8)
+
+    def missing():
+        raise _http_error(404)
+
+    for _ in range(10):
+        try:
+            health.call(missing)
+        except requests.HTTPError:
+            pass
+    assert health.stats()["state"] == "closed"
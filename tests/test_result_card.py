@@ -0,0 +1,65 @@
+import struct
+import zlib
+
+from result_card import format_result_html, render_cgpa_card, render_result_card
+from result_fetcher import StudentResult
+
+RESULT = StudentResult(
+    roll="21691A0501",
+    department="CSE",
+    name="A <Student> & Co",
+    sgpa="8.5",
+    subjects=[
+        {"code": "20CSE101", "name": "Data <Structures>", "grade": "A", "credits": "3"},
+        {"code": "20CSE102", "name": "Networks", "grade": "F", "credits": "3"},
+    ],
+    result_id="B.Tech-3-1-R20-Regular-2024",
+)
+
+
+def _chunks(png):
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks, offset = [], 8
+    while offset < len(png):
+        length, kind = struct.unpack(">I4s", png[offset:offset + 8])
+        data = png[offset + 8:offset + 8 + length]
+        (crc,) = struct.unpack(">I", png[offset + 8 + length:offset + 12 + length])
+        assert crc == zlib.crc32(kind + data) & 0xFFFFFFFF
+        chunks.append((kind, data))
+        offset += 12 + length
+    return chunks
+
+
+def _assert_valid_png(png):
+    chunks = _chunks(png)
+    kinds = [kind for kind, _data in chunks]
+    assert kinds[0] == b"IHDR" and kinds[-1] == b"IEND" and b"PLTE" in kinds
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[0][1][:10])
+    assert (depth, color_type) == (8, 3)
+    palette = len(dict(chunks)[b"PLTE"]) // 3
+    raw = zlib.decompress(b"".join(data for kind, data in chunks if kind == b"IDAT"))
+    # One filter byte per row, then one palette index per pixel
+    assert len(raw) == height * (width + 1)
+    assert all(raw[row * (width + 1)] == 0 for row in range(height))
+    assert max(b for row in range(height) for b in raw[row * (width + 1) + 1:(row + 1) * (width + 1)]) < palette
+    return width, height
+
+
+def test_result_card_is_a_valid_png():
+    width, height = _assert_valid_png(render_result_card(RESULT))
+    assert width > 0 and height > 0
+
+
+def test_cgpa_card_is_a_valid_png():
+    records = [
+        {"year": "1", "sem": "1", "status": "ok", "result": RESULT},
+        {"year": "1", "sem": "2", "status": "error", "result": None},
+    ]
+    _assert_valid_png(render_cgpa_card(records, 8.5, regulation="R20", roll="21691A0501", department="CSE"))
+
+
+def test_result_html_escapes_portal_text():
+    text = format_result_html(RESULT)
+    assert "A &lt;Student&gt; &amp; Co" in text
+    assert "Data &lt;Structures&gt;" in text
+    assert "<Student>" not in text and "<Structures>" not in text
@@ -0,0 +1,28 @@
+import pytest
+
+import result_fetcher
+from standins import PORTAL_PATH, PortalStandIn
+
+
+@pytest.fixture
+def portal():
+    portal = PortalStandIn().start()
+    yield portal
+    portal.stop()
+
+
+def test_lookups_reuse_pooled_connection(portal):
+    url = f"{portal.url}{PORTAL_PATH}/myresultug?resultid=B.Tech-III-I-R20-Regular-December-2024"
+    first = result_fetcher.fetch_result(url, "20691A0501", "2003-05-17", "CSE")
+    second = result_fetcher.fetch_result(url, "20691A0502", "2003-05-17", "CSE")
+
+    assert first.roll != second.roll
+    # Form GET and two POSTs over one kept-alive connection
+    assert sum(portal.stats()["requests"].values()) == 3
+    assert portal.stats()["connections"] == 1
+
+
+def test_lookups_do_not_share_cookies():
+    with result_fetcher.new_session() as first, result_fetcher.new_session() as second:
+        first.cookies.set("PHPSESSID", "student-a")
+        assert "PHPSESSID" not in second.cookies
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from result_jobs import QueueFullError, ResultJobQueue
+
+
+def test_full_queue_rejects_new_jobs():
+    release = threading.Event()
+
+    async def main():
+        jobs = ResultJobQueue(lambda: release.wait(5), concurrency=1, max_queue=1, job_timeout=10)
+        running = jobs.submit()
+        await asyncio.sleep(0.05)
+        queued = jobs.submit()
+        with pytest.raises(QueueFullError):
+            jobs.submit()
+        release.set()
+        await asyncio.gather(running, queued)
+        return jobs.stats()
+
+    stats = asyncio.run(main())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+
+
+def test_timeout_counts_run_time_not_queue_wait():
+    def work(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    async def main():
+        jobs = ResultJobQueue(work, concurrency=1, max_queue=5, job_timeout=0.3)
+        slow = jobs.submit(0.6)
+        # Queued behind the slow job for longer than its own budget
+        quick = jobs.submit(0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await slow
+        assert await quick == 0.1
+        return jobs.stats()
+
+    stats = asyncio.run(main())
+    assert stats["timed_out"] == 1
+    assert stats["completed"] == 1
+
+
+def test_cancelled_job_is_skipped():
+    release = threading.Event()
+    calls = []
+
+    def work(name):
+        calls.append(name)
+        release.wait(5)
+
+    async def main():
+        jobs = ResultJobQueue(work, concurrency=1, max_queue=5, job_timeout=10)
+        first = jobs.submit("first")
+        await asyncio.sleep(0.05)
+        second = jobs.submit("second")
+        second.cancel()
+        release.set()
+        await first
+        await asyncio.sleep(0.05)
+        return jobs.stats()
+
+    stats = asyncio.run(main())
+    assert calls == ["first"]
+    assert stats["cancelled"] == 1
@@ -0,0 +1,13 @@
+from result_fetcher import StudentResult
+from result_store import ResultStore
+
+
+def test_roll_case_shares_one_row(tmp_path):
+    store = ResultStore(path=str(tmp_path / "results.sqlite3"), secret="test")
+    result = StudentResult(roll="20691a0501", department="CSE", sgpa="8.5", result_id="B.Tech-III-I-R20-Regular-2024")
+    store.put(result, "2003-05-17")
+    store.put(StudentResult(**dict(result.to_dict(), roll=" 20691A0501 ")), "2003-05-17")
+
+    assert store.stats()["rows"] == 1
+    assert store.get(result.result_id, "CSE", "20691A0501", "2003-05-17") is not None
+    assert len(store.history("20691a0501", "2003-05-17")) == 1
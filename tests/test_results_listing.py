@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import time
+
+import portal_client
+import results_helper
+
+ENTRIES = [("B.Tech-3-1-R20-Regular-2024", "http://portal/result?id=1", ["B.Tech", "3", "1", "R20", "Regular", "2024"])]
+
+
+def test_threaded_and_async_refreshes_share_one_scrape(monkeypatch):
+    checker = results_helper.ResultsChecking(refresh_interval=300)
+    scrapes = []
+
+    def fetch_all():
+        scrapes.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return ENTRIES
+
+    monkeypatch.setattr(checker, "_fetch_all", fetch_all)
+    thread = threading.Thread(target=checker.refresh)
+    thread.start()
+    time.sleep(0.05)
+    entries = asyncio.run(checker.aentries())
+    thread.join()
+
+    assert entries == ENTRIES
+    assert len(scrapes) == 1
+
+
+def test_client_of_another_loop_is_closed():
+    client = portal_client.PortalClient()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def host():
+        return client._host("http://portal/")
+
+    try:
+        old = asyncio.run_coroutine_threadsafe(host(), loop).result(5)
+        new = asyncio.run(host())
+        time.sleep(0.1)
+        assert new is not old
+        assert old.client.is_closed
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+def _race(flight, fn, release, followers=4):
+    """Run ``fn`` in a leader, join it with followers, then let it finish."""
+    outcomes = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            value = ("ok", flight.do("key", fn))
+        except Exception as e:
+            value = ("error", e)
+        with lock:
+            outcomes.append(value)
+
+    threads = [threading.Thread(target=call) for _ in range(followers + 1)]
+    threads[0].start()
+    while not flight.in_flight("key"):
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.coalesced < followers:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_followers_receive_the_leaders_result():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return object()
+
+    outcomes = _race(flight, fn, release)
+
+    assert len(runs) == 1
+    assert [status for status, _value in outcomes] == ["ok"] * 5
+    assert len({id(value) for _status, value in outcomes}) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    error = RuntimeError("portal down")
+
+    def fn():
+        release.wait(5)
+        raise error
+
+    outcomes = _race(flight, fn, release)
+
+    assert [status for status, _value in outcomes] == ["error"] * 5
+    assert all(value is error for _status, value in outcomes)
+    # Nothing is cached once the call finishes
+    assert flight.do("key", lambda: "again") == "again"
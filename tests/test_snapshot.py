@@ -0,0 +1,57 @@
+import gzip
+import json
+import time
+
+import bot_handlers
+import snapshot
+from results_helper import ResultsChecking
+
+LINK = f"{ResultsChecking.BASE_URL}/result?id=B.Tech-3-1-R20-Regular-2024"
+ENTRIES = [("B.Tech-3-1-R20-Regular-May-2024", LINK, ["B.Tech", "3", "1", "R20", "Regular", "May", "2024"])]
+
+
+def _use_checker(monkeypatch, checker):
+    monkeypatch.setattr(bot_handlers, "get_results_checker", lambda: checker)
+
+
+def test_listing_survives_a_snapshot_round_trip(monkeypatch, tmp_path):
+    path = str(tmp_path / "snapshot.json.gz")
+    scraped = ResultsChecking()
+    scraped._update(ENTRIES)
+    _use_checker(monkeypatch, scraped)
+    assert snapshot.save_snapshot(path)
+
+    loaded = snapshot.load_snapshot(path)
+    assert loaded["format"] == snapshot.SNAPSHOT_FORMAT
+
+    restored = ResultsChecking()
+    assert restored.restore_state(loaded["results_listing"])
+    assert restored._entries == ENTRIES
+    assert restored._index == scraped._index
+    # Served at once, but stale so the first lookup re-scrapes
+    assert restored.from_snapshot and restored.is_stale()
+
+
+def test_snapshot_of_restored_data_is_not_saved(monkeypatch, tmp_path):
+    restored = ResultsChecking()
+    restored.restore_state({"base_url": ResultsChecking.BASE_URL, "entries": [[ENTRIES[0][0], LINK]]})
+    _use_checker(monkeypatch, restored)
+    assert snapshot.save_snapshot(str(tmp_path / "snapshot.json.gz")) is None
+
+
+def _write(path, created_at, fmt=snapshot.SNAPSHOT_FORMAT):
+    with gzip.open(path, "wb") as f:
+        f.write(json.dumps({"format": fmt, "created_at": created_at, "results_listing": None}).encode())
+
+
+def test_old_or_foreign_snapshots_are_rejected(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot, "INDEX_SNAPSHOT_MAX_AGE", 3600)
+    path = str(tmp_path / "snapshot.json.gz")
+
+    _write(path, time.time() - 60)
+    assert snapshot.load_snapshot(path) is not None
+    _write(path, time.time() - 7200)
+    assert snapshot.load_snapshot(path) is None
+    _write(path, time.time(), fmt=snapshot.SNAPSHOT_FORMAT + 1)
+    assert snapshot.load_snapshot(path) is None
+    assert snapshot.load_snapshot(str(tmp_path / "missing.json.gz")) is None
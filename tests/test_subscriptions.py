@@ -0,0 +1,25 @@
+import asyncio
+
+import subscriptions
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+
+def test_broadcast_escapes_listing_text(tmp_path, monkeypatch):
+    store = subscriptions.SubscriptionStore(path=str(tmp_path / "subscriptions.sqlite3"))
+    store.subscribe(1, "R20", "3", "1")
+    monkeypatch.setattr(subscriptions, "_store", store)
+    bot = FakeBot()
+
+    entry = ("B.Tech III-I R20 Regular <Revised> & Final", "http://portal/a", ["B.Tech", "3", "1", "R20", "Regular"])
+    asyncio.run(subscriptions.on_new_results(bot, [entry]))
+
+    assert len(bot.sent) == 1
+    assert "&lt;Revised&gt; &amp; Final" in bot.sent[0][1]
+    assert store.stats()["deliveries"] == {"sent": 1}
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import tracing
+from tracing import span, start_trace
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """Enable tracing with no exporter thread; returns the exported batches."""
+    batches = []
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 0.0)
+    monkeypatch.setattr(tracing, "_export", lambda spans: batches.append(spans) if spans else None)
+    return batches
+
+
+def test_head_sampling_follows_the_rate(monkeypatch, exported):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.5)
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.7)
+    with start_trace("update") as root, span("child") as child:
+        assert root is None and child is None
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.3)
+    with start_trace("update") as root:
+        assert root is not None
+    assert [[s.name for s in batch] for batch in exported] == [["update"]]
+
+
+def test_unsampled_traces_are_kept_only_when_slow(monkeypatch, exported):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_SECONDS", 0.05)
+    with start_trace("fast"), span("lookup"):
+        pass
+    with start_trace("slow"), span("lookup"):
+        time.sleep(0.06)
+    assert [[s.name for s in batch] for batch in exported] == [["lookup", "slow"]]
+
+
+def test_spans_nest_under_the_current_span(exported):
+    with start_trace("update", update_id=1) as root:
+        with span("bot_work") as work:
+            with span("http_fetch") as fetch:
+                fetch.set("status", 200)
+        with pytest.raises(ValueError), span("render"):
+            raise ValueError("bad card")
+    with span("outside") as outside:
+        assert outside is None
+
+    (batch,) = exported
+    by_name = {s.name: s for s in batch}
+    assert [s.name for s in batch] == ["http_fetch", "bot_work", "render", "update"]
+    assert {s.trace.trace_id for s in batch} == {root.trace.trace_id}
+    assert root.parent_id is None
+    assert work.parent_id == root.span_id
+    assert fetch.parent_id == work.span_id
+    assert by_name["render"].parent_id == root.span_id
+    assert by_name["render"].error == "ValueError: bad card"
+    assert fetch.to_dict()["attributes"] == {"status": 200}
+    assert root.attributes == {"update_id": 1}
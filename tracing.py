@@ -0,0 +1,279 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Share of updates traced (0 to 1); 0 turns head sampling off
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# Also keep any unsampled trace that took at least this long (0: off). Spans of
+# every update are then recorded in memory, but only slow ones are exported
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "0"))
+# Append finished spans to this JSONL file
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Send spans to an OpenTelemetry collector, e.g. http://localhost:4318/v1/traces
+TRACE_OTLP_URL = os.getenv("TRACE_OTLP_URL", "")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "mitsbot")
+
+TRACING_ENABLED = bool((TRACE_SAMPLE_RATE > 0 or TRACE_SLOW_SECONDS > 0) and (TRACE_FILE or TRACE_OTLP_URL))
+
+EXPORT_QUEUE_SIZE = 10000
+EXPORT_BATCH = 256
+EXPORT_INTERVAL = 2.0
+
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "_started", "duration_ns", "error")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.duration_ns = None
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def _end(self):
+        self.duration_ns = time.perf_counter_ns() - self._started
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ns / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Trace:
+    def __init__(self, sampled):
+        self.trace_id = os.urandom(16).hex()
+        self.sampled = sampled
+        self.spans = []
+        self.exported = False
+        self._lock = threading.Lock()
+
+    def finish(self, span):
+        """Record an ended span; returns spans that are ready to export."""
+        with self._lock:
+            if self.exported:
+                # A task started by the update outlived it; send its span alone
+                return [span] if self.sampled else []
+            self.spans.append(span)
+            return []
+
+    def close(self, root):
+        with self._lock:
+            self.spans.append(root)
+            keep = self.sampled or (TRACE_SLOW_SECONDS > 0 and root.duration_ns >= TRACE_SLOW_SECONDS * 1e9)
+            self.sampled = keep
+            self.exported = True
+            spans, self.spans = self.spans, []
+        return spans if keep else []
+
+
+class TraceStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.traces = 0
+        self.exported_traces = 0
+        self.exported_spans = 0
+        self.dropped_spans = 0
+        self.export_errors = 0
+
+    def record(self, traces=0, exported_traces=0, exported_spans=0, dropped_spans=0, export_errors=0):
+        with self._lock:
+            self.traces += traces
+            self.exported_traces += exported_traces
+            self.exported_spans += exported_spans
+            self.dropped_spans += dropped_spans
+            self.export_errors += export_errors
+
+    def stats(self):
+        return {
+            "enabled": TRACING_ENABLED,
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "slow_seconds": TRACE_SLOW_SECONDS,
+            "exporters": [name for name, target in (("file", TRACE_FILE), ("otlp", TRACE_OTLP_URL)) if target],
+            "traces": self.traces,
+            "exported_traces": self.exported_traces,
+            "exported_spans": self.exported_spans,
+            "dropped_spans": self.dropped_spans,
+            "export_errors": self.export_errors,
+            "queued_spans": _exporter.queue.qsize() if _exporter else 0,
+        }
+
+
+trace_stats = TraceStats()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_payload(spans):
+    """Encode spans as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": span.trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.start_ns + span.duration_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        encoded.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "mitsbot.tracing"}, "spans": encoded}],
+        }],
+    }
+
+
+class SpanExporter:
+    """Ships finished spans from a daemon thread so request paths never wait on I/O."""
+
+    def __init__(self, path=TRACE_FILE, otlp_url=TRACE_OTLP_URL):
+        self.path = path
+        self.otlp_url = otlp_url
+        self.queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._session = None
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, spans):
+        for span in spans:
+            try:
+                self.queue.put_nowait(span)
+            except queue.Full:
+                trace_stats.record(dropped_spans=1)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch):
+        try:
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(span.to_dict(), default=str) + "\n" for span in batch)
+            if self.otlp_url:
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+                response = self._session.post(self.otlp_url, json=_otlp_payload(batch), timeout=10)
+                response.raise_for_status()
+            trace_stats.record(exported_spans=len(batch))
+        except Exception as e:
+            trace_stats.record(export_errors=1, dropped_spans=len(batch))
+            logger.warning(f"Exporting {len(batch)} spans failed: {e}")
+
+
+_exporter = SpanExporter() if TRACING_ENABLED else None
+
+
+def _export(spans):
+    if spans:
+        _exporter.submit(spans)
+
+
+@contextmanager
+def start_trace(name, **attributes):
+    """Open the root span of a new trace, subject to sampling.
+
+    Yields the root span, or None when the trace is not recorded.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled and TRACE_SLOW_SECONDS <= 0:
+        yield None
+        return
+    trace = _Trace(sampled)
+    trace_stats.record(traces=1)
+    root = Span(trace, name, attributes=attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        root._end()
+        spans = trace.close(root)
+        if spans:
+            trace_stats.record(exported_traces=1)
+            _export(spans)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a child of the current span; a no-op outside a recorded trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    current = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current._end()
+        _export(parent.trace.finish(current))
+
+
+def current_span():
+    return _current_span.get()
+
+
+class TracedRequest(HTTPXRequest):
+    """HTTPXRequest that records each Bot API call as a span."""
+
+    async def post(self, url, request_data=None, **timeouts):
+        with span(f"telegram.{url.rsplit('/', 1)[-1]}"):
+            return await super().post(url, request_data, **timeouts)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from conversation_state import process_update
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "8"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "500"))
+LATENCY_WINDOW = 500
+
+
+class UpdateProcessor:
+    """Processes Telegram updates in the background after the webhook acks.
+
+    Up to ``concurrency`` updates are handled at once. Updates from the same
+    chat are still handled one at a time and in order, so a quick double tap
+    cannot race the conversation state. enqueue() returns False when
+    ``max_queue`` updates are already waiting.
+    """
+
+    def __init__(self, application, concurrency=None, max_queue=None):
+        self.application = application
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.max_queue = max_queue or DEFAULT_QUEUE_SIZE
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._chat_locks = {}
+        self._in_flight = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._chat_locks = {}
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def enqueue(self, update):
+        """Queue an update for processing; returns False if the queue is full."""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((update, time.monotonic()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Update queue full, rejecting update {update.update_id}")
+            return False
+        self.enqueued += 1
+        return True
+
+    def _acquire_chat_lock(self, update):
+        chat = update.effective_chat
+        key = chat.id if chat else None
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return key, entry
+
+    def _release_chat_lock(self, key, entry):
+        entry[1] -= 1
+        if entry[1] == 0 and self._chat_locks.get(key) is entry:
+            del self._chat_locks[key]
+
+    async def _worker(self):
+        while True:
+            update, queued_at = await self._queue.get()
+            key, entry = self._acquire_chat_lock(update)
+            self._in_flight += 1
+            try:
+                async with entry[0]:
+                    await process_update(self.application, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+            finally:
+                self._in_flight -= 1
+                self._latencies.append(time.monotonic() - queued_at)
+                self._release_chat_lock(key, entry)
+                self._queue.task_done()
+
+    async def drain(self):
+        """Wait until every queued update has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight": self._in_flight,
+            "concurrency": self.concurrency,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p95": percentile(0.95),
+            "latency_ms_max": round(latencies[-1] * 1000, 1) if latencies else None,
+        }
@@ -0,0 +1,73 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(timings, name, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        logger.warning(f"Warm-up step {name} failed: {e}")
+        timings[name] = f"error: {e}"
+
+
+def warm_results_index():
+    from bot_handlers import get_results_checker
+    checker = get_results_checker()
+    if checker:
+        checker.entries()
+
+
+def warm_timetable_index():
+    from ExamTimeTable import timetable_index
+    timetable_index.get("R20")
+
+
+def warm_result_form():
+    """Open a pooled connection to the results portal and cache the newest form."""
+    from bot_handlers import get_results_checker
+    from result_fetcher import get_form_metadata
+    checker = get_results_checker()
+    entries = checker.entries() if checker else []
+    if entries:
+        get_form_metadata(entries[0][1])
+
+
+def warm_result_store():
+    from result_store import get_result_store
+    get_result_store()
+
+
+def warm_snapshot():
+    """Revalidate anything still stale and save the index snapshot."""
+    from snapshot import revalidate
+    revalidate()
+
+
+def warm_browser():
+    from browser_pool import get_browser_pool
+
+    async def _noop(page):
+        return None
+
+    get_browser_pool().run(_noop, timeout=60)
+
+
+def warm_up(browser=False):
+    """Pre-initialize the indices, HTTP pools and stores a lookup needs.
+
+    Blocking; run it in a worker thread. Returns per-step timings in ms.
+    The browser is only launched when asked for since it costs hundreds of MB.
+    """
+    timings = {}
+    _timed(timings, "results_index", warm_results_index)
+    _timed(timings, "timetable_index", warm_timetable_index)
+    _timed(timings, "result_form", warm_result_form)
+    _timed(timings, "result_store", warm_result_store)
+    _timed(timings, "snapshot", warm_snapshot)
+    if browser:
+        _timed(timings, "browser", warm_browser)
+    return timings